@@ -0,0 +1,74 @@
+import numpy as np
+
+class AppearanceCache:
+    """Rolling jersey color of every player track.
+
+    Every measurement moves a track's embedding towards the new color by
+    smoothing (an exponential moving average), so one bad crop barely moves
+    it. A track is measured again every refresh_interval frames, and its
+    team only needs deciding again once the embedding drifted more than
+    drift_threshold from where it was when the team was last decided (an
+    ID switch, or a bad first crop). Tracks unseen for max_age frames are
+    forgotten.
+    """
+
+    def __init__(self, smoothing=0.3, refresh_interval=10, drift_threshold=40.0, max_age=300):
+        self.smoothing = smoothing
+        self.refresh_interval = refresh_interval
+        self.drift_threshold = drift_threshold
+        self.max_age = max_age
+        self.reset()
+
+    def reset(self):
+        self.entries = {}
+        self.last_prune = 0
+
+    def get_due(self, track_ids, frame_num):
+        """Tracks of a frame that are new or due for a new color measurement."""
+        due_ids = []
+        for track_id in track_ids:
+            entry = self.entries.get(track_id)
+            if entry is None:
+                due_ids.append(track_id)
+                continue
+            entry["seen"] = frame_num
+            if frame_num - entry["measured"] >= self.refresh_interval:
+                due_ids.append(track_id)
+
+        if frame_num - self.last_prune >= self.max_age:
+            self.prune(frame_num)
+        return due_ids
+
+    def prune(self, frame_num):
+        self.last_prune = frame_num
+        for track_id in [track_id for track_id, entry in self.entries.items() if frame_num - entry["seen"] > self.max_age]:
+            del self.entries[track_id]
+
+    def update(self, track_ids, colors, frame_num):
+        """Add measured colors (NaN rows are skipped) and return the tracks whose team needs deciding."""
+        changed_ids = []
+        for track_id, color in zip(track_ids, np.asarray(colors, dtype=float)):
+            if np.isnan(color).any():
+                continue
+            entry = self.entries.get(track_id)
+            if entry is None:
+                entry = self.entries[track_id] = {"embedding": color, "labelled": None}
+            else:
+                entry["embedding"] = entry["embedding"] + self.smoothing * (color - entry["embedding"])
+            entry["measured"] = entry["seen"] = frame_num
+
+            if entry["labelled"] is None or np.linalg.norm(entry["embedding"] - entry["labelled"]) > self.drift_threshold:
+                changed_ids.append(track_id)
+        return changed_ids
+
+    def get_embeddings(self, track_ids):
+        return np.array([self.entries[track_id]["embedding"] for track_id in track_ids]).reshape(-1, 3)
+
+    def set_labelled(self, track_ids):
+        # Drift is measured from the embedding the team was decided on
+        for track_id in track_ids:
+            entry = self.entries[track_id]
+            entry["labelled"] = entry["embedding"].copy()
+
+    def labelled_ids(self):
+        return [track_id for track_id, entry in self.entries.items() if entry["labelled"] is not None]
\ No newline at end of file
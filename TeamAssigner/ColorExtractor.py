@@ -1,35 +1,89 @@
-from sklearn.cluster import KMeans
+import numpy as np
 
 class ColorExtractor:
+    def __init__(self, max_iterations=10):
+        self.max_iterations = max_iterations
+
     def get_clustering_model(self,image):
         # Reshape the image to 2D array
         image_2d = image.reshape(-1,3)
 
-        # Preform K-means with 2 clusters
+        # Preform K-means with 2 clusters, sklearn is only imported once it is needed
+        from sklearn.cluster import KMeans
         kmeans = KMeans(n_clusters=2, init="k-means++",n_init=1)
         kmeans.fit(image_2d)
 
         return kmeans
 
     def get_player_color(self,frame,bbox):
+        return self.get_player_colors(frame,[bbox])[0]
+
+    def get_player_colors(self,frame,bboxes):
+        return self.get_crop_colors([self.get_crop(frame,bbox) for bbox in bboxes])
+
+    def get_crop(self,frame,bbox):
         image = frame[int(bbox[1]):int(bbox[3]),int(bbox[0]):int(bbox[2])]
 
         top_half_image = image[0:int(image.shape[0]/2),:]
 
-        # Get Clustering model
-        kmeans = self.get_clustering_model(top_half_image)
+        return top_half_image
+
+    def get_crop_colors(self,crops):
+        """Player color of every crop from one vectorized 2-means pass.
+
+        Crops may come from any number of frames. Each crop's pixels are split
+        into two clusters; the cluster owning most of the four corner pixels
+        is background and the other one is the player. Empty crops get NaN.
+        """
+        colors = np.full((len(crops),3), np.nan)
+        valid = [i for i, crop in enumerate(crops) if crop.shape[0] > 0 and crop.shape[1] > 0]
+        if not valid:
+            return colors
+
+        heights = np.array([crops[i].shape[0] for i in valid])
+        widths = np.array([crops[i].shape[1] for i in valid])
+        sizes = heights * widths
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        num_crops = len(valid)
+
+        # All pixels of all crops in one array, with the crop each belongs to
+        pixels = np.concatenate([crops[i].reshape(-1,3) for i in valid]).astype(np.float32)
+        segment = np.repeat(np.arange(num_crops), sizes)
+
+        corners = np.stack([
+            offsets,
+            offsets + widths - 1,
+            offsets + (heights - 1) * widths,
+            offsets + sizes - 1,
+        ], axis=1)
 
-        # Get the cluster labels forr each pixel
-        labels = kmeans.labels_
+        # Start background at the corner mean and player at the pixel furthest from it
+        centers_0 = pixels[corners].mean(axis=1)
+        distance = ((pixels - centers_0[segment]) ** 2).sum(axis=1)
+        furthest = np.lexsort((distance, segment))[np.cumsum(sizes) - 1]
+        centers_1 = pixels[furthest]
 
-        # Reshape the labels to the image shape
-        clustered_image = labels.reshape(top_half_image.shape[0],top_half_image.shape[1])
+        labels = None
+        for _ in range(self.max_iterations):
+            distance_0 = ((pixels - centers_0[segment]) ** 2).sum(axis=1)
+            distance_1 = ((pixels - centers_1[segment]) ** 2).sum(axis=1)
+            new_labels = distance_1 < distance_0
+            if labels is not None and np.array_equal(labels, new_labels):
+                break
+            labels = new_labels
 
-        # Get the player cluster
-        corner_clusters = [clustered_image[0,0],clustered_image[0,-1],clustered_image[-1,0],clustered_image[-1,-1]]
-        non_player_cluster = max(set(corner_clusters),key=corner_clusters.count)
-        player_cluster = 1 - non_player_cluster
+            count_1 = np.bincount(segment, weights=labels, minlength=num_crops)
+            count_0 = sizes - count_1
+            for channel in range(3):
+                sum_1 = np.bincount(segment, weights=pixels[:,channel] * labels, minlength=num_crops)
+                sum_0 = np.bincount(segment, weights=pixels[:,channel], minlength=num_crops) - sum_1
+                centers_1[:,channel] = np.where(count_1 > 0, sum_1 / np.maximum(count_1, 1), centers_1[:,channel])
+                centers_0[:,channel] = np.where(count_0 > 0, sum_0 / np.maximum(count_0, 1), centers_0[:,channel])
 
-        player_color = kmeans.cluster_centers_[player_cluster]
+        # Get the player cluster, ties between corners go to cluster 0 as background
+        corner_ones = labels[corners].sum(axis=1)
+        non_player_is_1 = corner_ones > 2
+        player_color = np.where(non_player_is_1[:,None], centers_0, centers_1)
 
-        return player_color
\ No newline at end of file
+        colors[valid] = player_color
+        return colors
\ No newline at end of file
@@ -1,19 +1,65 @@
+import numpy as np
+from .AppearanceCache import AppearanceCache
+
 class PlayerTeamPredictor:
-    def __init__(self):
+    """Team of every player track, decided from its cached jersey color.
+
+    Only new tracks and tracks due for a refresh are measured in a frame.
+    A team is decided again when a track's color drifts or when the team
+    centers moved by more than the drift threshold since teams were last
+    decided. team_overrides ({player_id: team}) pins tracks to a team.
+    """
+
+    def __init__(self, team_overrides=None, appearance_cache=None):
         self.player_team_dict = {}
+        self.team_overrides = dict(team_overrides or {})
+        self.appearance_cache = appearance_cache if appearance_cache is not None else AppearanceCache()
+        self.frame_num = -1
+        self.labelled_centers = None
 
     def get_player_team(self,frame,player_bbox,player_id, color_extractor, team_color_assigner):
-        if player_id in self.player_team_dict:
-            return self.player_team_dict[player_id]
+        if player_id not in self.player_team_dict:
+            self.update_teams(frame, {player_id: {"bbox": player_bbox}}, [player_id], color_extractor, team_color_assigner)
+        return self.player_team_dict.get(player_id)
+
+    def get_player_teams(self,frame,player_track, color_extractor, team_color_assigner):
+        self.frame_num += 1
+        due_ids = self.appearance_cache.get_due(list(player_track), self.frame_num)
+
+        if due_ids:
+            # One color pass and one predict call for every player due in the frame
+            self.update_teams(frame, player_track, due_ids, color_extractor, team_color_assigner)
+        self.check_centers(team_color_assigner)
+
+        return {player_id: self.player_team_dict[player_id] for player_id in player_track if player_id in self.player_team_dict}
 
-        player_color = color_extractor.get_player_color(frame,player_bbox)
+    def update_teams(self, frame, player_track, player_ids, color_extractor, team_color_assigner):
+        bboxes = [player_track[player_id]["bbox"] for player_id in player_ids]
+        player_colors = color_extractor.get_player_colors(frame,bboxes)
 
-        team_id = team_color_assigner.kmeans.predict(player_color.reshape(1,-1))[0]
-        team_id+=1
+        # The measured colors are also a sample to refine the team colors with
+        team_color_assigner.update_colors(player_colors)
+        self.assign_colors(player_ids, player_colors, team_color_assigner)
 
-        if player_id ==91:
-            team_id=1
+    def assign_colors(self,player_ids,player_colors, team_color_assigner):
+        # Players whose color could not be measured stay unassigned
+        changed_ids = self.appearance_cache.update(player_ids, player_colors, max(self.frame_num, 0))
+        self.assign_embeddings(changed_ids, team_color_assigner)
 
-        self.player_team_dict[player_id] = team_id
+    def assign_embeddings(self, player_ids, team_color_assigner):
+        if not player_ids:
+            return
+        team_ids = team_color_assigner.predict(self.appearance_cache.get_embeddings(player_ids))
+        for player_id, team_id in zip(player_ids, team_ids):
+            self.player_team_dict[player_id] = int(self.team_overrides.get(player_id, team_id))
+        self.appearance_cache.set_labelled(player_ids)
 
-        return team_id
+    def check_centers(self, team_color_assigner):
+        # Re-decide every cached track once the team centers moved noticeably, without measuring again
+        centers = team_color_assigner.centers
+        if self.labelled_centers is not None and (
+            np.linalg.norm(centers - self.labelled_centers, axis=1).max() <= self.appearance_cache.drift_threshold
+        ):
+            return
+        self.labelled_centers = centers.copy()
+        self.assign_embeddings(self.appearance_cache.labelled_ids(), team_color_assigner)
\ No newline at end of file
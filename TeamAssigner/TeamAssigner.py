@@ -3,12 +3,13 @@ from .TeamColorAssigner import TeamColorAssigner
 from .PlayerTeamPredictor import PlayerTeamPredictor
 
 class TeamAssigner:
-    def __init__(self):
+    def __init__(self, team_overrides=None):
         self.team_colors = {}
         self.player_team_dict = {}
+        self.team_overrides = team_overrides
         self.color_extractor = ColorExtractor()
         self.team_color_assigner = TeamColorAssigner()
-        self.player_team_predictor = PlayerTeamPredictor()
+        self.player_team_predictor = PlayerTeamPredictor(team_overrides)
     
     def get_clustering_model(self,image):
         return self.color_extractor.get_clustering_model(image)
@@ -23,4 +24,44 @@ class TeamAssigner:
     def get_player_team(self,frame,player_bbox,player_id):
         team_id = self.player_team_predictor.get_player_team(frame,player_bbox,player_id, self.color_extractor, self.team_color_assigner)
         self.player_team_dict = self.player_team_predictor.player_team_dict
-        return team_id
\ No newline at end of file
+        return team_id
+
+    def get_player_teams(self,frame,player_track):
+        # Fit team colors on the first frame that has enough players
+        if self.team_color_assigner.kmeans is None:
+            if not player_track:
+                return {}
+            self.assign_team_color(frame, player_track)
+            if self.team_color_assigner.kmeans is None:
+                return {}
+
+        team_ids = self.player_team_predictor.get_player_teams(frame,player_track, self.color_extractor, self.team_color_assigner)
+        self.player_team_dict = self.player_team_predictor.player_team_dict
+        return team_ids
+
+    def assign_track_colors(self, track_colors):
+        """Fit team colors on one color per player track ({player_id: color}) and assign every track."""
+        player_ids = list(track_colors)
+        if not player_ids:
+            return {}
+        player_colors = [track_colors[player_id] for player_id in player_ids]
+
+        self.team_color_assigner.fit_colors(player_colors)
+        self.team_colors = self.team_color_assigner.team_colors
+        if self.team_color_assigner.kmeans is None:
+            return {}
+
+        self.player_team_predictor.assign_colors(player_ids, player_colors, self.team_color_assigner)
+        self.player_team_dict = self.player_team_predictor.player_team_dict
+        return {player_id: self.player_team_dict[player_id] for player_id in player_ids if player_id in self.player_team_dict}
+
+    def reset(self):
+        self.team_colors = {}
+        self.player_team_dict = {}
+        self.team_color_assigner = TeamColorAssigner()
+        self.player_team_predictor = PlayerTeamPredictor(self.team_overrides)
+
+    def assign_frame(self, frame, player_track):
+        for player_id, team in self.get_player_teams(frame, player_track).items():
+            player_track[player_id]["team"] = team
+            player_track[player_id]["team_color"] = self.team_colors[team]
\ No newline at end of file
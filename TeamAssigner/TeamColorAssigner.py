@@ -1,25 +1,72 @@
-from sklearn.cluster import KMeans
+import numpy as np
 
 class TeamColorAssigner:
-    def __init__(self):
+    """Two team colors, fitted with KMeans and then refined with mini-batch updates.
+
+    Each center moves towards the colors assigned to it at a rate of one
+    over the number of colors it has seen, capped at memory so the centers
+    keep following slow changes such as lighting.
+    """
+
+    def __init__(self, memory=500):
         self.team_colors = {}
         self.kmeans = None
+        self.centers = None
+        self.counts = None
+        self.memory = memory
 
     def assign_team_color(self, frame, player_detections, color_extractor):
         
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection["bbox"]
-            player_color = color_extractor.get_player_color(frame, bbox)
-            player_colors.append(player_color)
+        bboxes = [player_detection["bbox"] for player_detection in player_detections.values()]
+        player_colors = color_extractor.get_player_colors(frame, bboxes)
+        self.fit_colors(player_colors)
+
+    def fit_colors(self, player_colors):
+        player_colors = np.asarray(player_colors, dtype=float)
+        player_colors = player_colors[~np.isnan(player_colors).any(axis=1)]
         
         if len(player_colors) < 2:
             return  
         
+        from sklearn.cluster import KMeans
+
         kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10)
         kmeans.fit(player_colors)
 
         self.kmeans = kmeans
+        self.centers = kmeans.cluster_centers_.astype(float)
+        self.counts = np.bincount(kmeans.labels_, minlength=2).astype(float)
+        self.set_team_colors()
+
+    def set_team_colors(self):
+        self.team_colors[1] = self.centers[0].copy()
+        self.team_colors[2] = self.centers[1].copy()
+
+    def predict(self, player_colors):
+        """Team (1 or 2) of every color, from the nearest center."""
+        player_colors = np.asarray(player_colors, dtype=float).reshape(-1, 3)
+        distances = ((player_colors[:, None] - self.centers[None]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1) + 1
+
+    def update_colors(self, player_colors):
+        """Mini-batch k-means step with the colors of one sampled frame."""
+        if self.centers is None:
+            return
+        player_colors = np.asarray(player_colors, dtype=float).reshape(-1, 3)
+        player_colors = player_colors[~np.isnan(player_colors).any(axis=1)]
+
+        # Colors further from both teams than the teams are apart (keepers, bad crops) are left out
+        labels = self.predict(player_colors) - 1
+        separation = np.linalg.norm(self.centers[0] - self.centers[1])
+        near = np.linalg.norm(player_colors - self.centers[labels], axis=1) <= separation
+        player_colors, labels = player_colors[near], labels[near]
+        if len(player_colors) == 0:
+            return
 
-        self.team_colors[1] = kmeans.cluster_centers_[0]
-        self.team_colors[2] = kmeans.cluster_centers_[1]
\ No newline at end of file
+        for team in range(2):
+            members = player_colors[labels == team]
+            if len(members) == 0:
+                continue
+            self.counts[team] = min(self.counts[team] + len(members), self.memory)
+            self.centers[team] += (members.sum(axis=0) - len(members) * self.centers[team]) / self.counts[team]
+        self.set_team_colors()
\ No newline at end of file
@@ -0,0 +1,3 @@
+from .batch_runner import BatchRunner, VIDEO_EXTENSIONS
+from .model_pool import ModelPool, ModelSet, PoolExhausted, get_shared_pool
+from .job_queue import JobQueue, Job, JobCancelled
\ No newline at end of file
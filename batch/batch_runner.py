@@ -0,0 +1,293 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+
+# Models of the current worker process, built once by _init_worker
+_worker_runner = None
+
+
+def _init_worker(runner_options):
+    global _worker_runner
+    _worker_runner = BatchRunner(**runner_options)
+    _worker_runner.load_models()
+
+
+def _process_in_worker(video_path, job_dir):
+    return _worker_runner.process_file(video_path, job_dir)
+
+
+class BatchRunner:
+    """Analyzes many videos headlessly with models that are loaded once.
+
+    Every video gets its own folder under output_dir with the annotated
+    video, the tracks (TrackStore .npy + .json), every player's distance
+    and speeds in meters (speeds.json) and a job.json status file.
+    A video whose job.json says "done" for the same input file and settings
+    is skipped, so an interrupted run picks up where it stopped. With
+    num_workers > 1 videos are spread over processes that each load the
+    models once. With auto_batch, the detector's batch size is timed on
+    the first frames instead of taken from tracker_options.
+    """
+
+    def __init__(self, model_path="models/best.pt", output_dir="outputs", num_workers=1, tracker_options=None,
+                 skip_frames=1, resize_width=None, max_frames=None, start_time=None, end_time=None, encoder_options=None,
+                 concurrent=False, auto_batch=False):
+        self.model_path = model_path
+        self.output_dir = output_dir
+        self.num_workers = num_workers
+        self.tracker_options = dict(tracker_options or {})
+        self.skip_frames = skip_frames
+        self.resize_width = resize_width
+        self.max_frames = max_frames
+        self.start_time = start_time
+        self.end_time = end_time
+        self.encoder_options = dict(encoder_options or {})
+        self.concurrent = concurrent
+        self.auto_batch = auto_batch
+
+        self.tracker = None
+        self.batch_tuned = False
+        self.team_assigner = None
+        self.player_ball_assigner = None
+
+    def get_options(self):
+        return {
+            "model_path": self.model_path,
+            "output_dir": self.output_dir,
+            "num_workers": self.num_workers,
+            "tracker_options": self.tracker_options,
+            "skip_frames": self.skip_frames,
+            "resize_width": self.resize_width,
+            "max_frames": self.max_frames,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "encoder_options": self.encoder_options,
+            "concurrent": self.concurrent,
+            "auto_batch": self.auto_batch,
+        }
+
+    def get_settings(self):
+        # Everything that changes the outputs of a video (thread counts don't)
+        return {
+            "model_path": os.path.abspath(self.model_path),
+            "tracker_options": {key: value for key, value in self.tracker_options.items() if key != "threads"},
+            "skip_frames": self.skip_frames,
+            "resize_width": self.resize_width,
+            "max_frames": self.max_frames,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "encoder_options": self.encoder_options,
+        }
+
+    def load_models(self):
+        # Imported here so the runner can be created without loading torch
+        from trackers import Tracker
+        from TeamAssigner import TeamAssigner
+        from player_ball_assigner import PlayerBallAssigner
+
+        if self.tracker is None:
+            self.tracker = Tracker(self.model_path, **self.tracker_options)
+            self.team_assigner = TeamAssigner()
+            self.player_ball_assigner = PlayerBallAssigner()
+
+    def find_videos(self, paths):
+        """{video_path: job_dir} for the video files in paths, searching directories recursively.
+
+        Job folders mirror the layout below each input directory, so videos
+        with the same name in different folders don't overwrite each other.
+        """
+        videos = {}
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    for name in files:
+                        if name.lower().endswith(VIDEO_EXTENSIONS):
+                            video_path = os.path.join(root, name)
+                            videos[video_path] = self.get_job_dir(os.path.relpath(video_path, path))
+            else:
+                videos[path] = self.get_job_dir(os.path.basename(path))
+        return dict(sorted(videos.items()))
+
+    # Job state
+
+    def get_job_dir(self, relative_path):
+        return os.path.join(self.output_dir, os.path.splitext(relative_path)[0])
+
+    def get_source_info(self, video_path):
+        stat = os.stat(video_path)
+        return {"path": os.path.abspath(video_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def read_job(self, job_dir):
+        job_path = os.path.join(job_dir, "job.json")
+        if not os.path.exists(job_path):
+            return None
+        try:
+            with open(job_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_job(self, job_dir, job):
+        os.makedirs(job_dir, exist_ok=True)
+        job_path = os.path.join(job_dir, "job.json")
+        with open(job_path + ".tmp", "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(job_path + ".tmp", job_path)
+
+    def is_done(self, video_path, job_dir):
+        job = self.read_job(job_dir)
+        return (
+            job is not None
+            and job.get("status") == "done"
+            and job.get("source") == self.get_source_info(video_path)
+            and job.get("settings") == json.loads(json.dumps(self.get_settings()))
+        )
+
+    # Processing
+
+    def process_file(self, video_path, job_dir, progress=None, metrics=None):
+        """Analyze one video into job_dir. Returns the final job record.
+
+        progress is passed to the pipeline (see process_video_stream). The
+        per-stage metrics (a new PipelineMetrics unless one is given) are
+        written to metrics.json and metrics.prom next to the tracks.
+        """
+        from utils import process_video_stream, process_video_concurrent, tune_batch_size
+        from trackers import TrackStore
+        from pipeline import PipelineMetrics
+        from speed_and_distance_estimator import SpeedAndDistanceEstimator
+        from view_transformer import ViewTransformer
+
+        self.load_models()
+        base_name = os.path.basename(job_dir)
+        video_output = os.path.join(job_dir, f"{base_name}_analyzed.mp4")
+        tracks_output = os.path.join(job_dir, "tracks.npy")
+        speeds_output = os.path.join(job_dir, "speeds.json")
+        metrics_output = os.path.join(job_dir, "metrics.json")
+        if metrics is None:
+            metrics = PipelineMetrics()
+
+        job = {
+            "status": "running",
+            "source": self.get_source_info(video_path),
+            "settings": self.get_settings(),
+            "started": time.time(),
+        }
+        self.write_job(job_dir, job)
+
+        # Encode under a temporary name so a crash never leaves a video that looks finished
+        tmp_video_output = os.path.join(job_dir, f"{base_name}_analyzed.tmp.mp4")
+        try:
+            tracks = TrackStore()
+            self.tracker.reset()
+            if self.auto_batch and not self.batch_tuned:
+                # Once per runner, on the first frames of its first video
+                tune_batch_size(video_path, self.tracker, skip_frames=self.skip_frames,
+                                resize_width=self.resize_width, start_time=self.start_time)
+                self.batch_tuned = True
+
+            # Positions on the pitch, for possession and speeds in meters
+            view_transformer = ViewTransformer()
+            process = process_video_concurrent if self.concurrent else process_video_stream
+            result = process(
+                video_path,
+                self.tracker,
+                self.team_assigner,
+                self.player_ball_assigner,
+                tmp_video_output,
+                max_frames=self.max_frames,
+                skip_frames=self.skip_frames,
+                resize_width=self.resize_width,
+                start_time=self.start_time,
+                end_time=self.end_time,
+                encoder_options=self.encoder_options,
+                tracks=tracks,
+                progress=progress,
+                metrics=metrics,
+                view_transformer=view_transformer,
+            )
+            frame_count = result[0] if self.concurrent else result
+
+            tracks.save(tracks_output)
+            estimator = SpeedAndDistanceEstimator(position_transform=view_transformer.transform_points)
+            with open(speeds_output, "w") as f:
+                json.dump(estimator.estimate(tracks).summary(), f, indent=2)
+            os.replace(tmp_video_output, video_output)
+            metrics.to_json(metrics_output)
+            with open(os.path.join(job_dir, "metrics.prom"), "w") as f:
+                f.write(metrics.to_prometheus(labels={"video": base_name}))
+
+            job.update({
+                "status": "done",
+                "frames": frame_count,
+                "seconds": round(time.time() - job["started"], 2),
+                "video": video_output,
+                "tracks": tracks_output,
+                "speeds": speeds_output,
+                "metrics": metrics_output,
+            })
+        except Exception as e:
+            job.update({"status": "failed", "error": str(e), "traceback": traceback.format_exc()})
+            if os.path.exists(tmp_video_output):
+                os.remove(tmp_video_output)
+
+        self.write_job(job_dir, job)
+        return job
+
+    def run(self, paths, retry_failed=True):
+        """Process every video in paths that isn't done yet. Returns {video_path: job}."""
+        videos = self.find_videos(paths)
+        pending = []
+        for video_path, job_dir in videos.items():
+            if self.is_done(video_path, job_dir):
+                print(f"Skipping {video_path} (already done)")
+                continue
+            job = self.read_job(job_dir)
+            if not retry_failed and job is not None and job.get("status") == "failed":
+                print(f"Skipping {video_path} (failed before)")
+                continue
+            pending.append(video_path)
+
+        print(f"{len(pending)} of {len(videos)} videos to process")
+        jobs = {}
+        if self.num_workers <= 1 or len(pending) <= 1:
+            for video_path in pending:
+                jobs[video_path] = self.process_file(video_path, videos[video_path])
+                self.print_job(video_path, jobs[video_path])
+            return jobs
+
+        # Split the cores between workers so they don't oversubscribe each other
+        num_processes = min(self.num_workers, len(pending))
+        options = self.get_options()
+        options["tracker_options"] = dict(self.tracker_options)
+        options["tracker_options"].setdefault("threads", max(1, (os.cpu_count() or 1) // num_processes))
+
+        with ProcessPoolExecutor(
+            max_workers=num_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(options,),
+        ) as executor:
+            futures = {executor.submit(_process_in_worker, video_path, videos[video_path]): video_path for video_path in pending}
+            for future in as_completed(futures):
+                video_path = futures[future]
+                try:
+                    jobs[video_path] = future.result()
+                except Exception as e:
+                    # The worker died, record it so the next run retries the file
+                    jobs[video_path] = {"status": "failed", "error": str(e)}
+                    self.write_job(videos[video_path], dict(jobs[video_path], source=self.get_source_info(video_path)))
+                self.print_job(video_path, jobs[video_path])
+        return jobs
+
+    def print_job(self, video_path, job):
+        if job["status"] == "done":
+            print(f"✅ {video_path}: {job['frames']} frames in {job['seconds']}s")
+        else:
+            print(f"❌ {video_path}: {job.get('error')}")
\ No newline at end of file
@@ -0,0 +1,262 @@
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pipeline import PipelineMetrics
+from .batch_runner import BatchRunner
+from .model_pool import get_shared_pool
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """One queued analysis: its options, status, per-stage progress and live stage metrics."""
+
+    def __init__(self, job_id, video_path, job_dir, options, name=None, owns_input=False):
+        self.id = job_id
+        self.video_path = video_path
+        self.job_dir = job_dir
+        self.options = options
+        self.name = name or os.path.basename(video_path)
+        self.owns_input = owns_input
+
+        self.status = "queued"
+        self.progress = {}
+        self.total_frames = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.metrics = PipelineMetrics()
+
+        self.cancel_event = threading.Event()
+        self.changed = threading.Condition()
+        self.version = 0
+
+    def update(self, **fields):
+        with self.changed:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            self.changed.notify_all()
+
+    def update_progress(self, stage, done, total):
+        # Called by the pipeline for every frame, so this is where cancelling takes effect
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        with self.changed:
+            self.progress[stage] = done
+            self.total_frames = total
+            self.version += 1
+            self.changed.notify_all()
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        with self.changed:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "total_frames": self.total_frames,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "result": self.result,
+                "error": self.error,
+                "metrics": self.metrics.to_dict() if self.started else None,
+            }
+
+
+class JobQueue:
+    """Runs video analyses in background threads, at most max_concurrent at a time.
+
+    submit() returns a job id right away. Progress can be polled with
+    status() or followed with stream(), and cancel() stops a job between
+    frames. Jobs lease their models from a ModelPool, so concurrent jobs
+    share the detector weights but never a Tracker. Results stay on
+    disk under output_dir/<job id> until max_finished newer jobs have
+    finished.
+    """
+
+    def __init__(self, output_dir="cache/jobs", max_concurrent=2, model_path="models/best.pt", max_finished=20):
+        self.output_dir = output_dir
+        self.max_concurrent = max_concurrent
+        self.model_path = model_path
+        self.max_finished = max_finished
+
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._workers = []
+        for i in range(max_concurrent):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, video_file, name=None, **options):
+        """Queue a video (path or file-like object) for analysis and return its job id.
+
+        options are BatchRunner options (tracker_options, skip_frames,
+        resize_width, max_frames, start_time, end_time, encoder_options,
+        concurrent, auto_batch). File-like inputs are copied into the job folder first,
+        so the caller's object can go away.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.output_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        if isinstance(video_file, (str, os.PathLike)):
+            video_path, owns_input = os.fspath(video_file), False
+        else:
+            extension = os.path.splitext(name or "")[1] or ".mp4"
+            video_path, owns_input = os.path.join(job_dir, "input" + extension), True
+            with open(video_path, "wb") as f:
+                if hasattr(video_file, "getbuffer"):
+                    f.write(video_file.getbuffer())
+                else:
+                    shutil.copyfileobj(video_file, f, 1024 * 1024)
+
+        job = Job(job_id, video_path, job_dir, options, name=name, owns_input=owns_input)
+        with self._lock:
+            self.jobs[job_id] = job
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return None if job is None else job.to_dict()
+
+    def list_jobs(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id):
+        """Stop a queued or running job. Returns False if it already finished."""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel_event.set()
+        with job.changed:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished = time.time()
+            job.version += 1
+            job.changed.notify_all()
+        return True
+
+    def stream(self, job_id, timeout=None):
+        """Yield a status snapshot every time the job changes, until it finishes."""
+        job = self.get(job_id)
+        if job is None:
+            return
+        version = -1
+        while True:
+            with job.changed:
+                if job.version == version:
+                    job.changed.wait(timeout)
+                version = job.version
+            snapshot = job.to_dict()
+            yield snapshot
+            if snapshot["status"] in FINISHED_STATUSES:
+                return
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (or timeout) and return its status."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        deadline = None if timeout is None else time.time() + timeout
+        with job.changed:
+            while not job.is_finished:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                job.changed.wait(remaining)
+        return job.to_dict()
+
+    def result(self, job_id):
+        """Output paths of a finished job ({"video": ..., "tracks": ..., "speeds": ...}), None otherwise."""
+        job = self.get(job_id)
+        if job is None or job.status != "done":
+            return None
+        return {"video": job.result["video"], "tracks": job.result["tracks"], "speeds": job.result["speeds"]}
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job_id in list(self.jobs):
+                self.cancel(job_id)
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    # Workers
+
+    def get_pool(self, tracker_options):
+        # Shared with the app: one copy of the weights per backend, the other options are applied per job
+        return get_shared_pool(
+            self.model_path, self.max_concurrent, tracker_options.get("backend", "torch"), tracker_options.get("int8", False)
+        )
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if job.cancel_event.is_set():
+                # Cancelled while queued
+                self.clean_up(job)
+                continue
+
+            job.update(status="running", started=time.time())
+            try:
+                runner = BatchRunner(model_path=self.model_path, output_dir=self.output_dir, **job.options)
+                with self.get_pool(runner.tracker_options).lease(**runner.tracker_options) as models:
+                    runner.tracker, runner.team_assigner, runner.player_ball_assigner = models
+                    record = runner.process_file(job.video_path, job.job_dir, progress=job.update_progress, metrics=job.metrics)
+                if job.cancel_event.is_set():
+                    job.update(status="cancelled", finished=time.time())
+                elif record["status"] == "done":
+                    job.update(status="done", result=record, finished=time.time())
+                else:
+                    job.update(status="failed", error=record.get("error"), finished=time.time())
+            except Exception as e:
+                job.update(status="failed", error=str(e), finished=time.time())
+            finally:
+                self.clean_up(job)
+
+    def clean_up(self, job):
+        # The uploaded copy of the input isn't needed once the job is over, results stay until evicted
+        if job.owns_input and os.path.exists(job.video_path):
+            os.remove(job.video_path)
+        self.evict()
+
+    def evict(self):
+        """Forget the oldest finished jobs beyond max_finished and delete their folders."""
+        with self._lock:
+            finished = [job for job in self.jobs.values() if job.is_finished]
+            expired = finished[:max(len(finished) - self.max_finished, 0)]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# What one job needs: a tracker with its own ByteTrack and fresh assigners
+ModelSet = namedtuple("ModelSet", ["tracker", "team_assigner", "player_ball_assigner"])
+
+# Pools shared by everything in this process, one per set of loaded weights
+_shared_pools = {}
+_shared_lock = threading.Lock()
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class ModelPool:
+    """Hands out per-job model sets that share one copy of the detector weights.
+
+    The YOLO weights are loaded once. Every acquired ModelSet gets a fresh
+    Tracker built with Tracker.spawn() from that run's tracker_options
+    (batch size, conf, keyframes... anything but backend and int8), and
+    keeps its own TeamAssigner and PlayerBallAssigner, so concurrent jobs
+    can't touch each other's state. At most size sets exist; lease() waits
+    for one to come back when they are all in use. Inference itself is
+    serialized by the shared detector.
+
+    Loading and warming up the weights happens in a background thread that
+    starts with the pool, so creating it returns right away. acquire()
+    waits for the load and re-raises its error if it failed.
+    """
+
+    def __init__(self, model_path="models/best.pt", size=2, warmup=True, **tracker_options):
+        self.model_path = model_path
+        self.size = size
+        self.tracker_options = tracker_options
+        self.base_tracker = None
+        self.error = None
+        self.load_seconds = None
+        self._ready = threading.Event()
+        self._free = queue.LifoQueue()
+        self._created = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+        self._loader = threading.Thread(target=self._load, args=(warmup,), name="model-warmup", daemon=True)
+        self._loader.start()
+
+    def _load(self, warmup):
+        try:
+            # Imported here so the pool can be created without loading torch
+            from trackers import Tracker
+
+            started = time.perf_counter()
+            self.base_tracker = Tracker(self.model_path, **self.tracker_options)
+            if warmup:
+                self.base_tracker.base_detector.warmup()
+                # Team clustering is the other slow import, pay for it before the first video too
+                import sklearn.cluster
+            self.load_seconds = time.perf_counter() - started
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def is_ready(self):
+        return self._ready.is_set() and self.error is None
+
+    def wait_ready(self, timeout=None):
+        """Block until the weights are loaded. Returns False on timeout, raises if loading failed."""
+        if not self._ready.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def _create(self):
+        from TeamAssigner import TeamAssigner
+        from player_ball_assigner import PlayerBallAssigner
+
+        return ModelSet(None, TeamAssigner(), PlayerBallAssigner())
+
+    def grow(self, size):
+        with self._lock:
+            self.size = max(self.size, size)
+
+    def acquire(self, timeout=None, **tracker_options):
+        """Take a model set with tracker_options applied, creating one while under size.
+
+        Raises PoolExhausted on timeout.
+        """
+        if not self.wait_ready(timeout):
+            raise PoolExhausted(f"Model still loading after {timeout}s")
+        with self._lock:
+            if self._free.empty() and self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                self._waiting += 1
+                create = False
+
+        if create:
+            try:
+                models = self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        else:
+            try:
+                models = self._free.get(timeout=timeout)
+            except queue.Empty:
+                raise PoolExhausted(f"No free model set after {timeout}s ({self.size} in use)")
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+        # Start every job from a clean slate, with a tracker of this run's settings on the shared weights
+        try:
+            models = models._replace(tracker=self.base_tracker.spawn(**tracker_options))
+        except Exception:
+            self.release(models)
+            raise
+        models.team_assigner.reset()
+        models.player_ball_assigner.reset()
+        return models
+
+    def release(self, models):
+        self._free.put(models)
+
+    @contextmanager
+    def lease(self, timeout=None, **tracker_options):
+        models = self.acquire(timeout, **tracker_options)
+        try:
+            yield models
+        finally:
+            self.release(models)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._created - self._free.qsize(),
+                "waiting": self._waiting,
+                "ready": self.is_ready(),
+                "load_seconds": self.load_seconds,
+            }
+
+
+def get_shared_pool(model_path="models/best.pt", size=2, backend="torch", int8=False):
+    """The ModelPool of one set of weights, shared by the app and the job queue of this process.
+
+    Pools are keyed on what changes the loaded weights (model path, backend
+    and int8), per-run settings go to acquire(). Asking for a larger size
+    grows the pool, and a pool whose weights failed to load is replaced so
+    fixing the model file is enough.
+    """
+    key = (model_path, backend, bool(int8))
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool.error is not None:
+            pool = _shared_pools[key] = ModelPool(model_path, size=size, backend=backend, int8=bool(int8))
+        else:
+            pool.grow(size)
+        return pool
\ No newline at end of file
@@ -0,0 +1 @@
+from .baseline import load_baseline, save_baseline, compare, format_comparison
\ No newline at end of file
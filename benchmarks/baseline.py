@@ -0,0 +1,55 @@
+import json
+import os
+import platform
+import time
+
+
+def load_baseline(path):
+    """Metrics saved by save_baseline, or None if there is no baseline yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["metrics"]
+
+
+def save_baseline(path, metrics):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    record = {
+        "created": time.time(),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "metrics": metrics,
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def compare(metrics, baseline, tolerance=0.1, min_delta=0.0):
+    """Compare timings (lower is better) against a baseline.
+
+    Returns one (name, baseline, current, change_pct, regressed) row per
+    metric. A metric regressed when it got slower by more than tolerance
+    (a fraction) and by more than min_delta in absolute terms, so tiny
+    timings don't flap on noise.
+    """
+    rows = []
+    for name, current in metrics.items():
+        previous = (baseline or {}).get(name)
+        if previous is None:
+            rows.append((name, None, current, None, False))
+            continue
+        change_pct = (current - previous) / previous * 100 if previous else 0.0
+        regressed = current > previous * (1 + tolerance) and current - previous > min_delta
+        rows.append((name, previous, current, change_pct, regressed))
+    return rows
+
+
+def format_comparison(rows, unit="s"):
+    lines = [f"{'metric':<36}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for name, previous, current, change_pct, regressed in rows:
+        previous = "-" if previous is None else f"{previous:.4f}{unit}"
+        change = "new" if change_pct is None else f"{change_pct:+.1f}%"
+        lines.append(f"{name:<36}{previous:>12}{current:>11.4f}{unit}{change:>10}{'  ❌' if regressed else ''}")
+    return "\n".join(lines)
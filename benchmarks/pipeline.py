@@ -0,0 +1,197 @@
+import argparse
+import os
+import time
+from .baseline import load_baseline, save_baseline, compare, format_comparison
+from .synthetic import REPO_ROOT, load_clip, make_frames, make_video, make_detections
+
+# (width, height) of the synthetic videos
+RESOLUTIONS = {"360p": (640, 360), "720p": (1280, 720), "1080p": (1920, 1080)}
+LENGTHS = (25, 100)
+
+# Stages timed in isolation, then the whole of process_video
+STAGES = ("detect", "track", "colors", "ball", "draw", "encode", "end_to_end")
+MODEL_STAGES = ("detect", "end_to_end")
+
+
+def best_time(run, repeat, setup=None):
+    """Fastest of repeat calls of run(*setup()) in seconds, setup isn't timed."""
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class BenchmarkInput:
+    """Synthetic frames of one resolution and length, with the tracks of their labelled boxes.
+
+    The stages after detection run on the dataset labels instead of model
+    output, so they can be timed without the weights and always see the
+    same input.
+    """
+
+    def __init__(self, samples, num_frames, resolution):
+        # Imported here so --help doesn't load the pipeline
+        from trackers.ObjectTracker import ObjectTracker
+        from player_ball_assigner import PlayerBallAssigner
+        from utils import get_team_ball_control
+
+        self.samples = samples
+        self.num_frames = num_frames
+        self.resolution = resolution
+        self.frames, class_ids, bboxes = make_frames(samples, num_frames, resolution)
+        self.detections = [make_detections(ids, boxes) for ids, boxes in zip(class_ids, bboxes)]
+
+        self.tracks = ObjectTracker().get_object_tracks(self.frames, self.detections)
+        self.tracks.set_teams({track_id: 1 + track_id % 2 for track_id in self.tracks.track_ids("players").tolist()})
+        self.tracks.team_colors = {1: (255, 255, 255), 2: (0, 0, 255)}
+        self.team_ball_control = get_team_ball_control(self.tracks, PlayerBallAssigner())
+
+    def get_player_bboxes(self):
+        return [[player["bbox"] for player in players.values()] for players in self.tracks["players"]]
+
+    def get_video(self):
+        return make_video(self.samples, self.num_frames, self.resolution)
+
+
+def bench_detect(data, models, repeat):
+    return best_time(lambda: models.tracker.base_detector.detect_frames(data.frames), repeat)
+
+
+def bench_track(data, models, repeat):
+    from trackers.ObjectTracker import ObjectTracker
+
+    # A fresh ByteTrack every run, its state would carry over otherwise
+    return best_time(lambda tracker: tracker.get_object_tracks(data.frames, data.detections), repeat,
+                     setup=lambda: (ObjectTracker(),))
+
+
+def bench_colors(data, models, repeat):
+    from TeamAssigner.ColorExtractor import ColorExtractor
+
+    color_extractor = ColorExtractor()
+    frame_bboxes = data.get_player_bboxes()
+
+    def run():
+        for frame, bboxes in zip(data.frames, frame_bboxes):
+            for bbox in bboxes:
+                color_extractor.get_player_color(frame, bbox)
+
+    return best_time(run, repeat)
+
+
+def bench_ball(data, models, repeat):
+    from player_ball_assigner import PlayerBallAssigner
+
+    player_ball_assigner = PlayerBallAssigner()
+    return best_time(lambda: player_ball_assigner.assign_tracks(data.tracks), repeat)
+
+
+def bench_draw(data, models, repeat):
+    from trackers.AnnotationDrawer import AnnotationDrawer
+
+    drawer = AnnotationDrawer()
+    return best_time(lambda: drawer.draw_annotations(data.frames, data.tracks, data.team_ball_control), repeat)
+
+
+def bench_encode(data, models, repeat):
+    from utils import frames_to_video_bytes
+
+    return best_time(lambda: frames_to_video_bytes(data.frames, fps=25), repeat)
+
+
+def bench_end_to_end(data, models, repeat):
+    from utils import process_video
+
+    video_path = data.get_video()
+
+    def run():
+        models.tracker.reset()
+        models.team_assigner.reset()
+        process_video(video_path, models.tracker, models.team_assigner, models.player_ball_assigner, fast_mode=False)
+
+    return best_time(run, repeat)
+
+
+BENCHMARKS = {
+    "detect": bench_detect,
+    "track": bench_track,
+    "colors": bench_colors,
+    "ball": bench_ball,
+    "draw": bench_draw,
+    "encode": bench_encode,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def load_models(model_path):
+    from batch import ModelPool
+
+    pool = ModelPool(model_path, size=1)
+    pool.wait_ready()
+    return pool.acquire()
+
+
+def run_benchmarks(stages=STAGES, resolutions=tuple(RESOLUTIONS), lengths=LENGTHS, model_path=None, repeat=3):
+    """{"<stage> <resolution> <frames>f": best seconds} for every stage, resolution and length.
+
+    Stages that need the model are skipped without model_path.
+    """
+    samples = load_clip()
+    stages = [stage for stage in stages if model_path is not None or stage not in MODEL_STAGES]
+    models = load_models(model_path) if any(stage in MODEL_STAGES for stage in stages) else None
+
+    metrics = {}
+    for resolution in resolutions:
+        for num_frames in lengths:
+            data = BenchmarkInput(samples, num_frames, RESOLUTIONS[resolution])
+            for stage in stages:
+                name = f"{stage} {resolution} {num_frames}f"
+                metrics[name] = BENCHMARKS[stage](data, models, repeat)
+                print(f"{name:<36}{metrics[name]:>10.4f}s{num_frames / metrics[name]:>10.1f} fps")
+    return metrics
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic video and compare with a saved baseline")
+    parser.add_argument("--model", default="models/best.pt", help="YOLO weights for the detect and end_to_end stages")
+    parser.add_argument("--skip-model", action="store_true", help="Only time the stages that don't need the model")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--lengths", nargs="+", type=int, default=list(LENGTHS), help="Video lengths in frames")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the fastest counts")
+    parser.add_argument("--baseline", default=os.path.join(REPO_ROOT, "benchmarks", "baselines", "pipeline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Slowdowns below this many seconds are ignored")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    metrics = run_benchmarks(
+        stages=args.stages,
+        resolutions=args.resolutions,
+        lengths=args.lengths,
+        model_path=None if args.skip_model else args.model,
+        repeat=args.repeat,
+    )
+
+    rows = compare(metrics, load_baseline(args.baseline), args.tolerance, args.min_delta)
+    print()
+    print(format_comparison(rows))
+
+    if args.save_baseline:
+        # Metrics of this run replace their old values, the others are kept
+        save_baseline(args.baseline, dict(load_baseline(args.baseline) or {}, **metrics))
+        print(f"Baseline saved to {args.baseline}")
+
+    regressed = [row[0] for row in rows if row[4]]
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
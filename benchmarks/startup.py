@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from .baseline import load_baseline, save_baseline, compare, format_comparison
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages the app and the workers import at startup, they must stay cheap
+STARTUP_PACKAGES = ("utils", "trackers", "TeamAssigner", "player_ball_assigner", "pipeline", "batch")
+
+# Slow imports that should only happen when a model is loaded or first used
+HEAVY_MODULES = ("ultralytics", "torch", "supervision", "sklearn", "scipy", "pandas")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {package}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+MODEL_PROBE = """
+import json, time
+start = time.perf_counter()
+from trackers import Tracker
+imported = time.perf_counter()
+tracker = Tracker({model_path!r})
+loaded = time.perf_counter()
+tracker.base_detector.warmup()
+warm = time.perf_counter()
+print(json.dumps({{"import": imported - start, "load": loaded - imported, "warmup": warm - loaded}}))
+"""
+
+
+def run_probe(code):
+    # A fresh interpreter every time, a warm sys.modules would hide the cost
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_imports(packages=STARTUP_PACKAGES, repeat=3):
+    """({"import <package>": best seconds}, {package: heavy modules it imported})."""
+    metrics, eager = {}, {}
+    for package in packages:
+        runs = [run_probe(IMPORT_PROBE.format(package=package, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+        metrics[f"import {package}"] = min(run["seconds"] for run in runs)
+        if runs[0]["heavy"]:
+            eager[package] = runs[0]["heavy"]
+    return metrics, eager
+
+
+def time_model_load(model_path, repeat=1):
+    runs = [run_probe(MODEL_PROBE.format(model_path=model_path)) for _ in range(repeat)]
+    return {f"model {step}": min(run[step] for run in runs) for step in ("import", "load", "warmup")}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure cold start times and compare them with a saved baseline")
+    parser.add_argument("--model", default="models/best.pt", help="YOLO weights to time loading and warm-up with")
+    parser.add_argument("--skip-model", action="store_true", help="Only time the package imports")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement, the fastest counts")
+    parser.add_argument("--baseline", default=os.path.join(REPO_ROOT, "benchmarks", "baselines", "startup.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Slowdowns below this many seconds are ignored")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    metrics, eager = time_imports(repeat=args.repeat)
+    if not args.skip_model:
+        metrics.update(time_model_load(args.model, repeat=min(args.repeat, 2)))
+
+    rows = compare(metrics, load_baseline(args.baseline), args.tolerance, args.min_delta)
+    print(format_comparison(rows))
+    for package, modules in eager.items():
+        print(f"❌ import {package} loaded {', '.join(modules)} eagerly")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, metrics)
+        print(f"Baseline saved to {args.baseline}")
+
+    regressed = [row[0] for row in rows if row[4]]
+    return 1 if regressed or eager else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
@@ -0,0 +1,121 @@
+import glob
+import os
+import re
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(REPO_ROOT, "training", "football-players-detection-1", "football-players-detection-1")
+VIDEO_CACHE_DIR = os.path.join(REPO_ROOT, "cache", "benchmarks")
+
+# Class ids of the dataset (data.yaml)
+CLASS_NAMES = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+
+# Roboflow names the images <match>_<clip>_<frame>_png.rf.<hash>.jpg
+IMAGE_NAME = re.compile(r"^(?P<match>[^_]+)_(?P<clip>\d+)_(?P<frame>\d+)_png")
+
+
+class Sample:
+    """One dataset image and its labelled boxes (class ids and xyxy pixels)."""
+
+    def __init__(self, image_path, class_ids, bboxes):
+        self.image_path = image_path
+        self.class_ids = class_ids
+        self.bboxes = bboxes
+
+    def load(self, resolution=None):
+        """(frame, bboxes) with the frame resized to resolution (width, height) and the boxes scaled with it."""
+        frame = cv2.imread(self.image_path)
+        if frame is None:
+            raise IOError(f"❌ Could not read dataset image: {self.image_path}")
+        bboxes = self.bboxes
+        if resolution is not None and (frame.shape[1], frame.shape[0]) != tuple(resolution):
+            scale = np.array([resolution[0] / frame.shape[1], resolution[1] / frame.shape[0]] * 2)
+            frame = cv2.resize(frame, tuple(resolution), interpolation=cv2.INTER_AREA)
+            bboxes = bboxes * scale
+        return frame, bboxes
+
+
+def read_labels(label_path, width, height):
+    """(class_ids, xyxy bboxes) from a YOLO label file of an image of the given size."""
+    if not os.path.exists(label_path):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    labels = np.loadtxt(label_path, ndmin=2)
+    if len(labels) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    centers, sizes = labels[:, 1:3], labels[:, 3:5]
+    bboxes = np.hstack([centers - sizes / 2, centers + sizes / 2]) * [width, height, width, height]
+    return labels[:, 0].astype(np.int64), bboxes
+
+
+def load_clip(dataset_dir=DATASET_DIR, split="train"):
+    """Samples of the longest clip in the dataset split, in frame order.
+
+    The dataset has every frame three times (augmented copies), only the
+    first copy is used.
+    """
+    clips = {}
+    for image_path in sorted(glob.glob(os.path.join(dataset_dir, split, "images", "*.jpg"))):
+        match = IMAGE_NAME.match(os.path.basename(image_path))
+        if match is None:
+            continue
+        key = (match["match"], int(match["clip"]))
+        clips.setdefault(key, {}).setdefault(int(match["frame"]), image_path)
+    if not clips:
+        raise IOError(f"❌ No dataset images found in: {os.path.join(dataset_dir, split, 'images')}")
+
+    frames = max(clips.values(), key=len)
+    samples = []
+    for frame_num in sorted(frames):
+        image_path = frames[frame_num]
+        height, width = cv2.imread(image_path).shape[:2]
+        label_path = os.path.join(dataset_dir, split, "labels", os.path.splitext(os.path.basename(image_path))[0] + ".txt")
+        samples.append(Sample(image_path, *read_labels(label_path, width, height)))
+    return samples
+
+
+def get_frame_order(num_samples, num_frames):
+    # Back and forth through the clip, so objects move smoothly except at the turns
+    cycle = list(range(num_samples)) + list(range(num_samples - 2, 0, -1))
+    return [cycle[i % len(cycle)] for i in range(num_frames)]
+
+
+def make_frames(samples, num_frames, resolution):
+    """num_frames frames of the clip at resolution (width, height) and the labelled boxes of each."""
+    loaded = [sample.load(resolution) for sample in samples]
+    order = get_frame_order(len(samples), num_frames)
+    frames = [loaded[i][0].copy() for i in order]
+    bboxes = [loaded[i][1] for i in order]
+    class_ids = [samples[i].class_ids for i in order]
+    return frames, class_ids, bboxes
+
+
+def make_video(samples, num_frames, resolution, fps=25, cache_dir=VIDEO_CACHE_DIR):
+    """Path of an MP4 with num_frames frames of the clip at resolution, written once and reused."""
+    # Imported here because utils pulls in the pipeline modules
+    from utils import write_video
+
+    os.makedirs(cache_dir, exist_ok=True)
+    video_path = os.path.join(cache_dir, f"clip_{resolution[0]}x{resolution[1]}_{num_frames}f.mp4")
+    if not os.path.exists(video_path):
+        frames, _, _ = make_frames(samples, num_frames, resolution)
+        write_video(frames, video_path + ".tmp.mp4", fps=fps)
+        os.replace(video_path + ".tmp.mp4", video_path)
+    return video_path
+
+
+def make_detections(class_ids, bboxes):
+    """Labelled boxes of one frame as tracker input, like the detector's output with full confidence.
+
+    Goalkeepers are counted as players, as to_supervision does.
+    """
+    import supervision as sv
+    from trackers.ObjectTracker import PropagatedDetections
+
+    class_ids = np.where(class_ids == 1, 2, class_ids)
+    detections = sv.Detections(
+        xyxy=np.asarray(bboxes, dtype=np.float32).reshape(-1, 4),
+        confidence=np.ones(len(class_ids), dtype=np.float32),
+        class_id=np.asarray(class_ids, dtype=np.int64),
+    )
+    return PropagatedDetections(detections, CLASS_NAMES)
\ No newline at end of file
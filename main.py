@@ -1,38 +1,42 @@
 import streamlit as st
 import cv2
 import numpy as np
-from utils import frames_to_video_bytes, process_video
-from trackers import Tracker
-from TeamAssigner import TeamAssigner
-from player_ball_assigner import PlayerBallAssigner
+import io
+import os
+import tempfile
+from utils import frames_to_video_bytes, process_video, process_video_stream, process_video_concurrent, process_video_sharded, has_ffmpeg, tune_batch_size
+from trackers import TrackCache
+from batch import JobQueue, get_shared_pool
+from pipeline import PipelineMetrics, NullMetrics
+from view_transformer import ViewTransformer
 
 @st.cache_resource
-def load_tracker(model_path):
-    """Cache the YOLO model to avoid reloading on every run"""
+def load_model_pool(model_path, pool_size, backend="torch", int8=False):
+    """Load the YOLO weights once per backend (in the background), shared with the job queue"""
     try:
-        tracker = Tracker(model_path)
-        return tracker
+        return get_shared_pool(model_path, pool_size, backend, int8)
     except Exception as e:
         st.error(f"Error loading model from {model_path}: {str(e)}")
         return None
 
 
 @st.cache_resource
-def load_team_assigner():
-    """Cache the team assigner to avoid recreation"""
+def load_track_cache():
+    """Cache of detections/tracks on disk, reused across reruns of the same video"""
     try:
-        return TeamAssigner()
+        return TrackCache("cache/tracks")
     except Exception as e:
-        st.error(f"Error initializing TeamAssigner: {str(e)}")
+        st.error(f"Error initializing track cache: {str(e)}")
         return None
 
 
 @st.cache_resource
-def load_player_ball_assigner():
+def load_job_queue():
+    """One background job queue shared by every session on this server"""
     try:
-        return PlayerBallAssigner()
+        return JobQueue("cache/jobs", max_concurrent=int(os.environ.get("MAX_CONCURRENT_JOBS", 2)))
     except Exception as e:
-        st.error(f"Error initializing PlayerBallAssigner: {str(e)}")
+        st.error(f"Error starting job queue: {str(e)}")
         return None
 
 
@@ -133,6 +137,150 @@ def add_theme():
 
 
 
+def process_streaming(uploaded_file, tracker, team_assigner, player_ball_assigner, concurrent=False, **kwargs):
+    """Run the low-memory streaming pipeline and return the encoded video bytes"""
+    # With ffmpeg the video is encoded straight into memory, otherwise via a temp file
+    if has_ffmpeg():
+        output = io.BytesIO()
+        output_path = None
+    else:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
+            output = output_path = tmp_file.name
+            kwargs.pop("encoder_options", None)
+    try:
+        if concurrent:
+            frame_count, pipeline = process_video_concurrent(
+                uploaded_file,
+                tracker,
+                team_assigner,
+                player_ball_assigner,
+                output,
+                **kwargs
+            )
+            st.sidebar.subheader("⏱️ Stage Throughput")
+            st.sidebar.table(pipeline.report())
+            st.sidebar.write(f"Bottleneck: **{pipeline.bottleneck()}**")
+        else:
+            frame_count = process_video_stream(
+                uploaded_file,
+                tracker,
+                team_assigner,
+                player_ball_assigner,
+                output,
+                **kwargs
+            )
+        st.info(f"📊 Processed {frame_count} frames")
+
+        if output_path is None:
+            return output.getvalue() or None
+        if os.path.getsize(output_path) == 0:
+            return None
+        with open(output_path, "rb") as f:
+            return f.read()
+    finally:
+        if output_path is not None and os.path.exists(output_path):
+            os.remove(output_path)
+
+
+def create_stage_metrics():
+    """PipelineMetrics that keeps a live per-stage table in the sidebar"""
+    st.sidebar.subheader("📊 Stage Metrics")
+    placeholder = st.sidebar.empty()
+    return PipelineMetrics(on_update=lambda metrics: placeholder.code(metrics.format_report()))
+
+
+def show_stage_metrics(metrics, file_name):
+    """Final per-stage breakdown with JSON and Prometheus downloads"""
+    report = metrics.to_dict()
+    st.subheader("📊 Stage Metrics")
+    st.table(report["stages"])
+    st.write(f"Bottleneck: **{report['bottleneck']}** · Peak memory: {report['peak_memory_mb']} MB")
+
+    file_base = file_name.rsplit('.', 1)[0]
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        label="📥 Metrics (JSON)",
+        data=metrics.to_json(),
+        file_name=f"{file_base}_metrics.json",
+        mime="application/json"
+    )
+    col2.download_button(
+        label="📥 Metrics (Prometheus)",
+        data=metrics.to_prometheus(labels={"video": file_base}),
+        file_name=f"{file_base}_metrics.prom",
+        mime="text/plain"
+    )
+
+
+def show_video_result(video_bytes, file_name, key=None):
+    """Show the analyzed video with a download button, return False if missing"""
+    if not video_bytes:
+        st.error("❌ Failed to generate output video")
+        return False
+
+    st.success("✅ Video conversion completed! 🏆")
+    st.video(video_bytes)
+
+    file_base = file_name.rsplit('.', 1)[0]
+    st.download_button(
+        label="📥 Download Analyzed Video",
+        data=video_bytes,
+        file_name=f"{file_base}_analyzed.mp4",
+        mime="video/mp4",
+        key=key
+    )
+    return True
+
+
+@st.fragment(run_every=2)
+def show_active_jobs(job_queue, job_ids):
+    """Live progress of queued and running jobs, refreshed every 2 seconds"""
+    active = False
+    for job_id in job_ids:
+        job = job_queue.status(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            continue
+        active = True
+
+        with st.container(border=True):
+            st.write(f"**{job['name']}**: {job['status']}")
+            done = job["progress"].get("annotate", 0)
+            total = job["total_frames"] or 0
+            stages = " · ".join(f"{stage} {count}" for stage, count in job["progress"].items())
+            st.progress(min(done / total, 1.0) if total else 0.0, text=stages or "⏳ Waiting for a free worker...")
+            if job["metrics"] and job["metrics"]["bottleneck"]:
+                st.caption(f"📊 Slowest stage so far: {job['metrics']['bottleneck']}")
+            if st.button("🛑 Cancel", key=f"cancel_{job_id}"):
+                job_queue.cancel(job_id)
+
+    if not active:
+        # Everything finished, rerun the whole page to show the results
+        st.rerun()
+
+
+def show_jobs(job_queue, job_ids):
+    """Results of this session's background jobs, newest first"""
+    jobs = [job for job in (job_queue.status(job_id) for job_id in reversed(job_ids)) if job is not None]
+    if not jobs:
+        return
+
+    st.subheader("📋 Background Jobs")
+    if any(job["status"] in ("queued", "running") for job in jobs):
+        show_active_jobs(job_queue, [job["id"] for job in jobs])
+
+    for job in jobs:
+        if job["status"] == "done":
+            with st.expander(f"✅ {job['name']} ({job['result']['frames']} frames)"):
+                with open(job_queue.result(job["id"])["video"], "rb") as f:
+                    show_video_result(f.read(), job["name"], key=f"download_{job['id']}")
+                if job["metrics"]:
+                    st.table(job["metrics"]["stages"])
+        elif job["status"] == "failed":
+            st.error(f"❌ {job['name']}: {job['error']}")
+        elif job["status"] == "cancelled":
+            st.warning(f"🛑 {job['name']} was cancelled")
+
+
 def main():
     st.set_page_config(
         page_title="⚽ Football Video Analysis",
@@ -146,21 +294,6 @@ def main():
     st.title("⚽ Football Video Analysis App")
     st.markdown("Upload a football video to analyze player tracking, team assignment, and ball detection! 🏟️")
     
-    # Load models
-    model_path = "models/best.pt"
-    tracker = load_tracker(model_path)
-    if tracker is None:
-        st.error("❌ Failed to load YOLO model from 'models/best.pt'")
-        st.error("Please ensure the model file exists at the correct path")
-        st.stop()
-    
-    team_assigner = load_team_assigner()
-    if team_assigner is None:
-        st.error("❌ Failed to initialize TeamAssigner")
-        st.stop()
-
-    player_ball_assigner = load_player_ball_assigner()
-
     # Sidebar: processing mode selection
     st.sidebar.header("⚡ Processing Mode ⚽")
     mode = st.sidebar.radio(
@@ -178,6 +311,114 @@ def main():
     else:  # 🎯 High Quality
         max_frames, skip_frames, resize_width, fast_mode = None, 1, None, False
 
+    keyframe_mode = fast_mode and st.sidebar.checkbox(
+        "🎞️ Full frame rate (keyframe detection)",
+        value=False,
+        help="Run YOLO on every Nth frame only and move boxes with optical flow in between instead of dropping frames"
+    )
+    keyframe_interval = 1
+    if keyframe_mode:
+        keyframe_interval, skip_frames = skip_frames, 1
+
+    ball_roi = fast_mode and st.sidebar.checkbox(
+        "🔍 High-res ball search",
+        value=False,
+        help="Keep full-resolution frames and look for the ball in a crop around its expected position; players are still detected on a downscaled frame"
+    )
+    if ball_roi:
+        # The model downscales the full frame itself, crops need the original pixels
+        resize_width = None
+
+    # Sidebar: inference settings
+    with st.sidebar.expander("🔧 Inference Settings"):
+        auto_batch = st.checkbox(
+            "Auto batch size", value=False,
+            help="Time a few batch sizes on the first frames of the video and keep the fastest"
+        )
+        batch_size = st.slider("Batch size", 1, 64, 20, disabled=auto_batch)
+        conf = st.slider("Confidence threshold", 0.05, 0.9, 0.1, 0.05)
+        imgsz = st.selectbox("Inference image size", [None, 640, 960, 1280],
+                             format_func=lambda size: "Auto" if size is None else str(size))
+        memory_budget_mb = st.number_input(
+            "Memory budget (MB, 0 = no limit)", min_value=0, value=0, step=256,
+            help="Caps the batch size so one batch fits in this much memory"
+        )
+        backend = st.selectbox(
+            "Inference backend", ["torch", "onnx", "openvino"],
+            help="ONNX/OpenVINO export the model once and cache it under models/exports"
+        )
+        int8 = backend != "torch" and st.checkbox("INT8 quantization", value=False)
+
+    # Load models
+    model_path = "models/best.pt"
+    tracker_options = dict(
+        batch_size=batch_size,
+        conf=conf,
+        imgsz=imgsz,
+        memory_budget_mb=memory_budget_mb or None,
+        backend=backend,
+        int8=int8,
+        keyframe_interval=keyframe_interval,
+        ball_roi=ball_roi,
+    )
+    # Only the backend loads other weights, the other settings are applied to each run's tracker
+    model_pool = load_model_pool(model_path, int(os.environ.get("MODEL_POOL_SIZE", 2)), backend, int8)
+    if model_pool is None:
+        st.error("❌ Failed to load YOLO model from 'models/best.pt'")
+        st.error("Please ensure the model file exists at the correct path")
+        st.stop()
+    if not model_pool.is_ready():
+        st.sidebar.caption("⏳ Model is loading in the background...")
+
+    with st.sidebar.expander("⏱️ Segment"):
+        start_time = st.number_input("Start (seconds)", min_value=0.0, value=0.0, step=10.0)
+        end_time = st.number_input("End (seconds, 0 = end of video)", min_value=0.0, value=0.0, step=10.0)
+    start_time = start_time or None
+    end_time = end_time or None
+
+    streaming = st.sidebar.checkbox(
+        "💾 Low-memory streaming",
+        value=False,
+        help="Decode, analyze and encode frame by frame. Use for long matches."
+    )
+    sharded = not streaming and st.sidebar.checkbox(
+        "🧩 Split across CPU cores",
+        value=False,
+        help="Track overlapping segments of the video in parallel processes and stitch the track ids back together"
+    )
+    use_track_cache = not streaming and not sharded and st.sidebar.checkbox(
+        "🗂️ Reuse cached detections",
+        value=True,
+        help="Skip YOLO inference when this video was already processed with the same settings"
+    )
+    encoder_options = {}
+    if has_ffmpeg():
+        with st.sidebar.expander("🎞️ Encoding"):
+            encoder_options["crf"] = st.slider("Quality (CRF, lower is better)", 16, 35, 23)
+            encoder_options["preset"] = st.selectbox(
+                "Speed preset", ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"], index=2
+            )
+    concurrent = streaming and st.sidebar.checkbox(
+        "⚙️ Overlap pipeline stages",
+        value=True,
+        help="Run decoding, inference, tracking, drawing and encoding in parallel threads"
+    )
+    background = st.sidebar.checkbox(
+        "📨 Run as background job",
+        value=False,
+        help="Queue the analysis on the server and follow its progress; the page stays usable and the job can be cancelled"
+    )
+    job_queue = load_job_queue() if background else None
+    pitch_distances = not sharded and not background and st.sidebar.checkbox(
+        "📐 Measure on the pitch",
+        value=False,
+        help="Map positions to pitch meters (homography cached per camera shot) and give the ball to players within reach in meters"
+    )
+    show_metrics = st.sidebar.checkbox(
+        "📊 Show stage metrics",
+        value=False,
+        help="Time every stage (decoding, inference, tracking, drawing, encoding...) with its throughput, memory and batch sizes"
+    )
 
 
     # File uploader
@@ -193,48 +434,141 @@ def main():
         # Show original video
         st.subheader("📹 Original Video")
         st.video(uploaded_file)
+
+        if job_queue is not None:
+            if st.button("🚀 Submit analysis job"):
+                uploaded_file.seek(0)  # Reset file pointer
+                job_id = job_queue.submit(
+                    uploaded_file,
+                    name=uploaded_file.name,
+                    tracker_options=tracker_options,
+                    encoder_options=encoder_options,
+                    max_frames=max_frames if fast_mode else None,
+                    skip_frames=skip_frames if fast_mode else 1,
+                    resize_width=resize_width if fast_mode else None,
+                    start_time=start_time,
+                    end_time=end_time,
+                    concurrent=concurrent,
+                    auto_batch=auto_batch,
+                )
+                st.session_state.setdefault("job_ids", []).append(job_id)
+                st.success(f"📨 Job {job_id} submitted, you can keep using the app")
+            show_jobs(job_queue, st.session_state.get("job_ids", []))
+            return
         
-        with st.spinner("🔄 Processing video... This may take a few minutes ⏳"):
-            uploaded_file.seek(0)  # Reset file pointer
+        with st.spinner("⏳ Loading the model..."):
+            try:
+                model_pool.wait_ready()
+            except Exception as e:
+                # Forget the failed pool so the next run tries again
+                load_model_pool.clear()
+                st.error(f"❌ Failed to load YOLO model from '{model_path}': {str(e)}")
+                st.error("Please ensure the model file exists at the correct path")
+                st.stop()
 
-            output_frames, tracks = process_video(
-                uploaded_file, 
-                tracker, 
-                team_assigner,
-                player_ball_assigner=player_ball_assigner,
-                max_frames=max_frames,
-                skip_frames=skip_frames,
-                resize_width=resize_width,
-                fast_mode=fast_mode
-            )
+        # Every session gets its own tracker and assigners, other sessions may be analyzing right now
+        with st.spinner("⏳ Waiting for a free model slot..."):
+            models = model_pool.acquire(**tracker_options)
+        try:
+            tracker, team_assigner, player_ball_assigner = models
+            metrics = create_stage_metrics() if show_metrics else NullMetrics()
+            view_transformer = ViewTransformer() if pitch_distances else None
+
+            if auto_batch:
+                with st.spinner("⏱️ Timing batch sizes on the first frames..."):
+                    batch_size = tune_batch_size(
+                        uploaded_file,
+                        tracker,
+                        skip_frames=skip_frames if fast_mode else 1,
+                        resize_width=resize_width if fast_mode else None,
+                        start_time=start_time,
+                    )
+                st.sidebar.caption(f"⚡ Batch size {batch_size} was the fastest")
+
+            if streaming:
+                with st.spinner("🔄 Streaming video analysis... This may take a few minutes ⏳"):
+                    uploaded_file.seek(0)  # Reset file pointer
+                    video_bytes = process_streaming(
+                        uploaded_file,
+                        tracker,
+                        team_assigner,
+                        player_ball_assigner,
+                        concurrent=concurrent,
+                        encoder_options=encoder_options,
+                        max_frames=max_frames if fast_mode else None,
+                        skip_frames=skip_frames if fast_mode else 1,
+                        resize_width=resize_width if fast_mode else None,
+                        start_time=start_time,
+                        end_time=end_time,
+                        metrics=metrics,
+                        view_transformer=view_transformer,
+                    )
+
+                    st.success("✅ Video analysis completed! 🎉")
+                    st.subheader("🎯 Analyzed Video ⚽")
+                    show_video_result(video_bytes, uploaded_file.name)
+                if show_metrics:
+                    show_stage_metrics(metrics, uploaded_file.name)
+                return
+
+            with st.spinner("🔄 Processing video... This may take a few minutes ⏳"):
+                uploaded_file.seek(0)  # Reset file pointer
+
+                if sharded:
+                    output_frames, tracks = process_video_sharded(
+                        uploaded_file,
+                        tracker,
+                        team_assigner,
+                        player_ball_assigner,
+                        max_frames=max_frames if fast_mode else None,
+                        skip_frames=skip_frames if fast_mode else 1,
+                        resize_width=resize_width if fast_mode else None,
+                        start_time=start_time,
+                        end_time=end_time,
+                        metrics=metrics
+                    )
+                else:
+                    output_frames, tracks = process_video(
+                        uploaded_file, 
+                        tracker, 
+                        team_assigner,
+                        player_ball_assigner=player_ball_assigner,
+                        max_frames=max_frames,
+                        skip_frames=skip_frames,
+                        resize_width=resize_width,
+                        fast_mode=fast_mode,
+                        track_cache=load_track_cache() if use_track_cache else None,
+                        start_time=start_time,
+                        end_time=end_time,
+                        metrics=metrics,
+                        view_transformer=view_transformer
+                    )
                 
-            st.success("✅ Video analysis completed! 🎉")
-            st.info(f"📊 Processed {len(output_frames)} frames")
+                st.success("✅ Video analysis completed! 🎉")
+                st.info(f"📊 Processed {len(output_frames)} frames")
             
-            st.subheader("🎯 Analyzed Video ⚽")
-            video_bytes = frames_to_video_bytes(output_frames)
+                st.subheader("🎯 Analyzed Video ⚽")
+                with metrics.stage("encoding", len(output_frames)):
+                    video_bytes = frames_to_video_bytes(output_frames, fps=tracks.fps, **encoder_options)
             
-            if video_bytes:
-                st.success("✅ Video conversion completed! 🏆")
-                st.video(video_bytes)
-                
-                file_base = uploaded_file.name.rsplit('.', 1)[0]
-                st.download_button(
-                    label="📥 Download Analyzed Video",
-                    data=video_bytes,
-                    file_name=f"{file_base}_analyzed.mp4",
-                    mime="video/mp4"
-                )
-            else:
-                st.error("❌ Failed to generate output video")
-                st.warning("📸 Showing sample analyzed frames instead:")
-                num_sample_frames = min(10, len(output_frames))
-                sample_indices = np.linspace(0, len(output_frames)-1, num_sample_frames, dtype=int)
-                for idx in sample_indices:
-                    frame_rgb = cv2.cvtColor(output_frames[idx], cv2.COLOR_BGR2RGB)
-                    st.image(frame_rgb, caption=f"📸 Frame {idx+1}")
+                if not show_video_result(video_bytes, uploaded_file.name):
+                    st.warning("📸 Showing sample analyzed frames instead:")
+                    num_sample_frames = min(10, len(output_frames))
+                    sample_indices = np.linspace(0, len(output_frames)-1, num_sample_frames, dtype=int)
+                    for idx in sample_indices:
+                        frame_rgb = cv2.cvtColor(output_frames[idx], cv2.COLOR_BGR2RGB)
+                        st.image(frame_rgb, caption=f"📸 Frame {idx+1}")
+
+                if show_metrics:
+                    show_stage_metrics(metrics, uploaded_file.name)
                     
+        finally:
+            model_pool.release(models)
+
     else:
+        if job_queue is not None:
+            show_jobs(job_queue, st.session_state.get("job_ids", []))
+
         st.info("👆 Please upload a football video file to get started! ⚽")
         
         st.subheader("📋 How to use:")
@@ -0,0 +1,3 @@
+from .staged_executor import StagedPipeline, StageStats, PipelineStopped
+from .metrics import PipelineMetrics, NullMetrics, StageMetrics, observe_batch
+from .frame_buffer import FrameRing, FrameRef
\ No newline at end of file
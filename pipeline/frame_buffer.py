@@ -0,0 +1,159 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+# Slots start on cache line boundaries
+_ALIGN = 64
+
+
+def _aligned(size):
+    return -(-size // _ALIGN) * _ALIGN
+
+
+class FrameRef:
+    """Picklable handle of a frame in a FrameRing: its slot, write sequence, shape and dtype."""
+
+    def __init__(self, slot, sequence, shape, dtype):
+        self.slot = slot
+        self.sequence = sequence
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __repr__(self):
+        return f"FrameRef(slot={self.slot}, sequence={self.sequence}, shape={self.shape})"
+
+
+class FrameRing:
+    """Frame slots in shared memory, handed between processes as FrameRefs.
+
+    A writer copies a frame into a free slot once with put() (or decodes
+    straight into the view reserve() returns) and passes the small FrameRef
+    on through a queue or pool call; readers in other processes get a view
+    of the slot without copying. Every slot is reference counted:
+    put(frame, refs=n) for n readers, each calls release(ref) when done and
+    the slot is reused once its count is back at 0. put() blocks while every
+    slot is taken, like a bounded queue.
+
+    The ring is handed to worker processes when they start (Process or pool
+    initializer arguments), its lock can't be pickled later. The process
+    that created it frees the memory with close(), after dropping its views.
+    """
+
+    def __init__(self, num_slots, frame_shape, dtype=np.uint8, context=None):
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = _aligned(int(np.prod(self.frame_shape)) * self.dtype.itemsize)
+        self.header_bytes = _aligned(num_slots * 2 * 8)
+        self.condition = (context or multiprocessing).Condition()
+        self.shm = shared_memory.SharedMemory(create=True, size=self.header_bytes + num_slots * self.slot_bytes)
+        self.owner = True
+        self._attach()
+        self.refcounts[:] = 0
+        self.sequences[:] = 0
+
+    def _attach(self):
+        # Reference count and write sequence of every slot
+        header = np.ndarray((2, self.num_slots), dtype=np.int64, buffer=self.shm.buf)
+        self.refcounts, self.sequences = header[0], header[1]
+        self.next_slot = 0
+
+    def __getstate__(self):
+        return {
+            "name": self.shm.name,
+            "num_slots": self.num_slots,
+            "frame_shape": self.frame_shape,
+            "dtype": self.dtype.str,
+            "condition": self.condition,
+        }
+
+    def __setstate__(self, state):
+        self.num_slots = state["num_slots"]
+        self.frame_shape = state["frame_shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.slot_bytes = _aligned(int(np.prod(self.frame_shape)) * self.dtype.itemsize)
+        self.header_bytes = _aligned(self.num_slots * 2 * 8)
+        self.condition = state["condition"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self._attach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _view(self, slot, shape, dtype):
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=self.header_bytes + slot * self.slot_bytes)
+
+    def _find_free(self):
+        # Round robin from the last slot taken, so slots are reused as late as possible
+        for i in range(self.num_slots):
+            slot = (self.next_slot + i) % self.num_slots
+            if self.refcounts[slot] == 0:
+                self.next_slot = slot + 1
+                return slot
+        return None
+
+    # Writing
+
+    def reserve(self, shape=None, refs=1, timeout=None):
+        """(FrameRef, writable view) of a free slot held by refs readers, waiting up to timeout seconds for one."""
+        shape = self.frame_shape if shape is None else tuple(shape)
+        if int(np.prod(shape)) * self.dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"❌ Frame of shape {shape} does not fit the ring's {self.frame_shape} slots")
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.refcounts.min() == 0, timeout):
+                raise TimeoutError("❌ No free frame slot, readers are not releasing their frames")
+            slot = self._find_free()
+            self.refcounts[slot] = refs
+            self.sequences[slot] += 1
+            ref = FrameRef(slot, int(self.sequences[slot]), shape, self.dtype.str)
+        return ref, self._view(slot, shape, self.dtype)
+
+    def put(self, frame, refs=1, timeout=None):
+        """Copy frame into a free slot and return its FrameRef."""
+        ref, view = self.reserve(frame.shape, refs, timeout)
+        view[...] = frame
+        return ref
+
+    # Reading
+
+    def view(self, ref, writable=False):
+        """The frame of ref, without copying. Only valid until ref is released."""
+        if self.sequences[ref.slot] != ref.sequence or self.refcounts[ref.slot] <= 0:
+            raise ValueError(f"❌ {ref} was already released and its slot reused")
+        frame = self._view(ref.slot, ref.shape, np.dtype(ref.dtype))
+        frame.flags.writeable = writable
+        return frame
+
+    def retain(self, ref, count=1):
+        """Add count readers to a frame that is still held."""
+        with self.condition:
+            if self.sequences[ref.slot] != ref.sequence or self.refcounts[ref.slot] <= 0:
+                raise ValueError(f"❌ {ref} was already released and its slot reused")
+            self.refcounts[ref.slot] += count
+
+    def release(self, ref):
+        """Drop one reader of ref, the slot is free once none are left."""
+        with self.condition:
+            if self.sequences[ref.slot] != ref.sequence or self.refcounts[ref.slot] <= 0:
+                raise ValueError(f"❌ {ref} was released more times than it was held")
+            self.refcounts[ref.slot] -= 1
+            if self.refcounts[ref.slot] == 0:
+                self.condition.notify_all()
+
+    def in_use(self):
+        return int((self.refcounts > 0).sum())
+
+    def close(self):
+        """Detach from the shared memory, and free it in the process that created the ring."""
+        if self.shm is None:
+            return
+        self.refcounts = self.sequences = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
\ No newline at end of file
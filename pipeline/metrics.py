@@ -0,0 +1,286 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Display order, stages that aren't listed here come after them
+STAGE_ORDER = ("decode", "inference", "tracking", "interpolation", "view_transform", "team_assignment",
+               "ball_assignment", "drawing", "encoding")
+
+# Stages currently running on each thread, innermost last: [metrics, stage name, nested seconds]
+_active = threading.local()
+
+
+def _stack():
+    if not hasattr(_active, "stack"):
+        _active.stack = []
+    return _active.stack
+
+
+def get_memory_mb():
+    """Resident memory of this process in MB, the peak so far where the current value isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    return get_peak_memory_mb()
+
+
+def get_peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def observe_batch(batch_size):
+    """Record a batch size for the stage running on this thread, if any (called by the detector)."""
+    stack = _stack()
+    if stack:
+        metrics, name, _ = stack[-1]
+        metrics.record_batch(name, batch_size)
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.calls = 0
+        self.seconds = 0.0
+        self.batches = 0
+        self.batch_frames = 0
+        self.max_batch = 0
+        self.max_queue_depth = 0
+        self.peak_memory_mb = None
+
+    @property
+    def fps(self):
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "frames": self.frames,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 4),
+            "fps": round(self.fps, 2),
+            "batches": self.batches,
+            "mean_batch": round(self.batch_frames / self.batches, 2) if self.batches else None,
+            "max_batch": self.max_batch or None,
+            "max_queue_depth": self.max_queue_depth,
+            "peak_memory_mb": None if self.peak_memory_mb is None else round(self.peak_memory_mb, 1),
+        }
+
+
+class PipelineMetrics:
+    """Wall time, throughput, memory, batch sizes and queue depths per processing stage.
+
+    Time a block with `with metrics.stage("drawing"):` or a generator with
+    metrics.iter_stage("decode", frames). Stages nest: time spent in an
+    inner stage (or in an upstream generator wrapped with idle()) is only
+    counted for the inner one, so the stage times add up to the work done.
+    Nesting is tracked per thread, so the stage threads of a StagedPipeline
+    can share one PipelineMetrics. on_update(metrics) is called at most
+    every update_interval seconds, and only on the thread that created the
+    metrics (the Streamlit script thread can draw from it).
+    """
+
+    def __init__(self, on_update=None, update_interval=1.0, memory_interval=0.1):
+        self.stages = {}
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._owner = threading.get_ident()
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.memory_interval = memory_interval
+        self._last_update = 0.0
+        self._last_memory = {}
+
+    def _get(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    # Recording
+
+    def record(self, name, seconds, frames=1):
+        now = time.perf_counter()
+        with self._lock:
+            stats = self._get(name)
+            stats.seconds += seconds
+            stats.frames += frames
+            stats.calls += 1
+            # Reading the memory costs a system call, sample it
+            if now - self._last_memory.get(name, 0.0) >= self.memory_interval:
+                self._last_memory[name] = now
+                memory = get_memory_mb()
+                if memory is not None and (stats.peak_memory_mb is None or memory > stats.peak_memory_mb):
+                    stats.peak_memory_mb = memory
+
+        if (self.on_update is not None and threading.get_ident() == self._owner
+                and now - self._last_update >= self.update_interval):
+            self._last_update = now
+            self.on_update(self)
+
+    def record_batch(self, name, batch_size):
+        with self._lock:
+            stats = self._get(name)
+            stats.batches += 1
+            stats.batch_frames += batch_size
+            stats.max_batch = max(stats.max_batch, batch_size)
+
+    def observe_queue(self, name, depth):
+        with self._lock:
+            stats = self._get(name)
+            stats.max_queue_depth = max(stats.max_queue_depth, depth)
+
+    @contextmanager
+    def stage(self, name, frames=1):
+        """Time the block as one call of stage name. frames can be changed through the yielded dict."""
+        call = {"frames": frames}
+        stack = _stack()
+        stack.append([self, name, 0.0])
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            elapsed = time.perf_counter() - start
+            _, _, nested = stack.pop()
+            if stack:
+                stack[-1][2] += elapsed
+            self.record(name, elapsed - nested, call["frames"])
+
+    def iter_stage(self, name, items):
+        """Pass items through, timing how long producing each one takes (one frame per item)."""
+        iterator = iter(items)
+        while True:
+            with self.stage(name) as call:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    call["frames"] = 0
+                    return
+            yield item
+
+    def idle(self, items):
+        """Pass items through without charging the time spent waiting for them to the consuming stage."""
+        iterator = iter(items)
+        stack = _stack()
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if stack:
+                    stack[-1][2] += time.perf_counter() - start
+            yield item
+
+    def add_pipeline_stats(self, stage_stats, names=None):
+        """Copy max queue depths from StagedPipeline stats, renaming stages through names."""
+        for stats in stage_stats:
+            self.observe_queue((names or {}).get(stats.name, stats.name), stats.max_queue_depth)
+
+    # Reports
+
+    def ordered_stages(self):
+        with self._lock:
+            stages = list(self.stages.values())
+        order = {name: i for i, name in enumerate(STAGE_ORDER)}
+        return sorted(stages, key=lambda stats: order.get(stats.name, len(order)))
+
+    def bottleneck(self):
+        stages = self.ordered_stages()
+        return max(stages, key=lambda stats: stats.seconds).name if stages else None
+
+    def to_dict(self):
+        stages = [stats.to_dict() for stats in self.ordered_stages()]
+        total = sum(stage["seconds"] for stage in stages)
+        for stage in stages:
+            stage["share"] = round(stage["seconds"] / total, 4) if total else 0.0
+
+        peak_memory = get_peak_memory_mb()
+        return {
+            "started": self.started,
+            "wall_seconds": round(time.perf_counter() - self._start, 4),
+            "frames": max((stage["frames"] for stage in stages), default=0),
+            "peak_memory_mb": None if peak_memory is None else round(peak_memory, 1),
+            "bottleneck": self.bottleneck(),
+            "stages": stages,
+        }
+
+    def to_json(self, path=None):
+        report = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(report)
+        return report
+
+    def to_prometheus(self, prefix="football", labels=None):
+        """The metrics in the Prometheus text exposition format."""
+        report = self.to_dict()
+        base_labels = "".join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        metrics = [
+            ("stage_seconds_total", "counter", "Time spent in the stage", "seconds", 1),
+            ("stage_frames_total", "counter", "Frames processed by the stage", "frames", 1),
+            ("stage_frames_per_second", "gauge", "Stage throughput", "fps", 1),
+            ("stage_batches_total", "counter", "Batches run by the stage", "batches", 1),
+            ("stage_batch_size_max", "gauge", "Largest batch of the stage", "max_batch", 1),
+            ("stage_queue_depth_max", "gauge", "Deepest output queue of the stage", "max_queue_depth", 1),
+            ("stage_memory_peak_bytes", "gauge", "Process memory seen during the stage", "peak_memory_mb", 2 ** 20),
+        ]
+
+        lines = []
+        for metric, metric_type, help_text, key, scale in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for stage in report["stages"]:
+                if stage[key] is not None:
+                    lines.append(f'{prefix}_{metric}{{stage="{stage["stage"]}"{base_labels}}} {stage[key] * scale:g}')
+
+        if report["peak_memory_mb"] is not None:
+            label_text = "{" + base_labels[1:] + "}" if base_labels else ""
+            lines.append(f"# HELP {prefix}_process_memory_peak_bytes Peak resident memory of the process")
+            lines.append(f"# TYPE {prefix}_process_memory_peak_bytes gauge")
+            lines.append(f"{prefix}_process_memory_peak_bytes{label_text} {report['peak_memory_mb'] * 2 ** 20:g}")
+        return "\n".join(lines) + "\n"
+
+    def format_report(self):
+        lines = [f"{'stage':<16}{'frames':>8}{'seconds':>10}{'fps':>12}{'batch':>7}{'max q':>7}{'mem MB':>9}"]
+        for stats in self.ordered_stages():
+            batch = f"{stats.batch_frames / stats.batches:.1f}" if stats.batches else "-"
+            memory = f"{stats.peak_memory_mb:.0f}" if stats.peak_memory_mb is not None else "-"
+            lines.append(
+                f"{stats.name:<16}{stats.frames:>8}{stats.seconds:>10.2f}{stats.fps:>12.1f}"
+                f"{batch:>7}{stats.max_queue_depth:>7}{memory:>9}"
+            )
+        lines.append(f"bottleneck: {self.bottleneck()}")
+        return "\n".join(lines)
+
+
+class NullMetrics:
+    """Stands in for PipelineMetrics when nothing is measured."""
+
+    @contextmanager
+    def stage(self, name, frames=1):
+        yield {"frames": frames}
+
+    def iter_stage(self, name, items):
+        return items
+
+    def idle(self, items):
+        return items
+
+    def observe_queue(self, name, depth):
+        pass
+
+    def add_pipeline_stats(self, stage_stats, names=None):
+        pass
\ No newline at end of file
@@ -0,0 +1,208 @@
+import queue
+import threading
+import time
+
+
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.elapsed = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.max_queue_depth = 0
+
+    @property
+    def busy(self):
+        # Time spent doing work, not blocked on the neighbouring queues
+        return max(self.elapsed - self.wait_in - self.wait_out, 0.0)
+
+    @property
+    def fps(self):
+        return self.items / self.busy if self.busy > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_s": round(self.busy, 4),
+            "wait_in_s": round(self.wait_in, 4),
+            "wait_out_s": round(self.wait_out, 4),
+            "items_per_s": round(self.fps, 2),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class _QueueReader:
+    """Iterates a stage's input queue, recording how long it waits."""
+
+    def __init__(self, in_queue, stats, stop_event):
+        self.in_queue = in_queue
+        self.stats = stats
+        self.stop_event = stop_event
+
+    def __iter__(self):
+        while True:
+            start = time.perf_counter()
+            item = _get(self.in_queue, self.stop_event)
+            self.stats.wait_in += time.perf_counter() - start
+            if item is _DONE:
+                return
+            yield item
+
+
+def _get(in_queue, stop_event):
+    while True:
+        if stop_event.is_set():
+            raise PipelineStopped()
+        try:
+            return in_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def _put(out_queue, item, stop_event):
+    while True:
+        if stop_event.is_set():
+            raise PipelineStopped()
+        try:
+            out_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+class StagedPipeline:
+    """Runs a chain of generator stages concurrently, one thread per stage.
+
+    Stages are joined by bounded queues, so a slow stage applies backpressure
+    to the stages before it instead of letting frames pile up in memory.
+
+        pipeline = StagedPipeline(queue_size=8)
+        pipeline.add_source("decode", iter_video(path))
+        pipeline.add_stage("detect", lambda frames: detector.detect_frames_stream(frames))
+        pipeline.add_sink("encode", lambda frames: write_video(frames, output_path))
+        result = pipeline.run()
+        print(pipeline.format_report())
+    """
+
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.source = None
+        self.stages = []
+        self.sink = None
+        self.stats = []
+
+    def add_source(self, name, iterable):
+        self.source = (name, iterable)
+        return self
+
+    def add_stage(self, name, fn):
+        """fn takes an iterable of inputs and returns an iterable of outputs."""
+        self.stages.append((name, fn))
+        return self
+
+    def add_sink(self, name, fn):
+        """fn consumes an iterable of inputs; its return value is returned by run()."""
+        self.sink = (name, fn)
+        return self
+
+    def run(self):
+        if self.source is None or self.sink is None:
+            raise ValueError("A pipeline needs a source and a sink")
+
+        stop_event = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        source_name, source = self.source
+        sink_name, sink_fn = self.sink
+        self.stats = [StageStats(source_name)]
+        self.stats += [StageStats(name) for name, _ in self.stages]
+        self.stats.append(StageStats(sink_name))
+
+        threads = [threading.Thread(
+            target=self._run_stage,
+            args=(lambda _: source, None, queues[0], self.stats[0], stop_event, errors),
+            name=f"pipeline-{source_name}",
+            daemon=True,
+        )]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(fn, queues[i], queues[i + 1], self.stats[i + 1], stop_event, errors),
+                name=f"pipeline-{name}",
+                daemon=True,
+            ))
+
+        for thread in threads:
+            thread.start()
+
+        sink_stats = self.stats[-1]
+        result = None
+        start = time.perf_counter()
+        try:
+            reader = _QueueReader(queues[-1], sink_stats, stop_event)
+            result = sink_fn(self._count(reader, sink_stats))
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            sink_stats.elapsed = time.perf_counter() - start
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return result
+
+    def _run_stage(self, fn, in_queue, out_queue, stats, stop_event, errors):
+        start = time.perf_counter()
+        try:
+            inputs = _QueueReader(in_queue, stats, stop_event) if in_queue is not None else None
+            for item in fn(inputs):
+                put_start = time.perf_counter()
+                _put(out_queue, item, stop_event)
+                stats.wait_out += time.perf_counter() - put_start
+                stats.items += 1
+                stats.max_queue_depth = max(stats.max_queue_depth, out_queue.qsize())
+            _put(out_queue, _DONE, stop_event)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            stats.elapsed = time.perf_counter() - start
+
+    def _count(self, items, stats):
+        for item in items:
+            stats.items += 1
+            yield item
+
+    def report(self):
+        return [stats.to_dict() for stats in self.stats]
+
+    def bottleneck(self):
+        if not self.stats:
+            return None
+        return max(self.stats, key=lambda stats: stats.busy).name
+
+    def format_report(self):
+        lines = [f"{'stage':<12}{'items':>8}{'busy s':>10}{'items/s':>10}{'max q':>7}"]
+        for stats in self.stats:
+            lines.append(
+                f"{stats.name:<12}{stats.items:>8}{stats.busy:>10.2f}{stats.fps:>10.1f}{stats.max_queue_depth:>7}"
+            )
+        lines.append(f"bottleneck: {self.bottleneck()}")
+        return "\n".join(lines)
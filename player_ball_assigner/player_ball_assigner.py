@@ -1,28 +1,148 @@
-from utils import get_center_of_bbox, measure_distance
+import numpy as np
 
 class PlayerBallAssigner():
-    def __init__(self):
-        self.max_player_ball_distance = 70
+    def __init__(self, max_player_ball_distance=70, min_hold_frames=3, max_pitch_distance=1.5):
+        self.max_player_ball_distance = max_player_ball_distance
+        # Reach in meters, used instead of the pixel distance when a view transformer maps positions to the pitch
+        self.max_pitch_distance = max_pitch_distance
+        # A new player only takes the ball after being closest this many frames in a row
+        self.min_hold_frames = min_hold_frames
+        self.reset()
 
-    def assign_ball_to_player(self, players, ball_bbox):
-        ball_position = get_center_of_bbox(bbox=ball_bbox)
+    def reset(self):
+        """Forget the current holder, call between videos."""
+        self.holder = -1
+        self.candidate = -1
+        self.candidate_frames = 0
 
-        miniumum_distance = 99999
-        assigned_player=-1
+    def get_ball_distances(self, bboxes, ball_centers):
+        """Distance from each ball center to the nearer bottom corner (foot) of each player box.
 
-        for player_id, player in players.items():
-            player_bbox = player["bbox"]
+        bboxes (..., 4) and ball_centers (..., 2) broadcast against each
+        other. NaN ball centers give NaN distances.
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float32)
+        ball_centers = np.asarray(ball_centers, dtype=np.float32)
+        dy = bboxes[..., 3] - ball_centers[..., 1]
+        distance_left = np.hypot(bboxes[..., 0] - ball_centers[..., 0], dy)
+        distance_right = np.hypot(bboxes[..., 2] - ball_centers[..., 0], dy)
+        return np.minimum(distance_left, distance_right)
 
-            distance_left = measure_distance((player_bbox[0],player_bbox[-1]),ball_position)
-            distance_right = measure_distance((player_bbox[2],player_bbox[-1]),ball_position)
-            distance = min(distance_left,distance_right)
+    def get_pitch_distances(self, bboxes, ball_centers, view_transformer, frames=None):
+        """get_ball_distances in pitch meters, with the foot corners and ball centers mapped by view_transformer.
 
-            if distance < self.max_player_ball_distance:
-                if distance < miniumum_distance:
-                    miniumum_distance = distance
-                    assigned_player = player_id
+        frames (N,) picks each row's homography, None uses the last frame's.
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        ball = view_transformer.transform_points(np.broadcast_to(ball_centers, (len(bboxes), 2)), frames)
+        left = view_transformer.transform_points(bboxes[:, [0, 3]], frames)
+        right = view_transformer.transform_points(bboxes[:, [2, 3]], frames)
+        return np.minimum(np.linalg.norm(left - ball, axis=1), np.linalg.norm(right - ball, axis=1))
 
-        return assigned_player
+    def get_distances(self, bboxes, ball_centers, view_transformer=None, frames=None):
+        """(distances, reach) in pixels, or in meters with a view_transformer."""
+        if view_transformer is None:
+            return self.get_ball_distances(bboxes, ball_centers), self.max_player_ball_distance
+        return self.get_pitch_distances(bboxes, ball_centers, view_transformer, frames), self.max_pitch_distance
 
+    def get_nearest_players(self, frames, bboxes, ball_bboxes, view_transformer=None):
+        """Row of the player closest to the ball in every frame, -1 where nobody is within reach.
 
+        frames (N,) and bboxes (N, 4) are player rows of any number of frames,
+        ball_bboxes (num_frames, 4) has NaN where the ball is missing.
+        """
+        ball_bboxes = np.asarray(ball_bboxes, dtype=np.float32)
+        nearest = np.full(len(ball_bboxes), -1, dtype=np.int64)
+        if len(frames) == 0:
+            return nearest
 
+        frames = np.asarray(frames)
+        ball_centers = (ball_bboxes[:, :2] + ball_bboxes[:, 2:]) / 2
+        distance, reach = self.get_distances(bboxes, ball_centers[frames], view_transformer, frames)
+
+        # Sort the players in reach by frame, then distance, and keep the first of every frame
+        rows = np.flatnonzero(distance < reach)
+        rows = rows[np.lexsort((distance[rows], frames[rows]))]
+        _, first = np.unique(frames[rows], return_index=True)
+        nearest[frames[rows[first]]] = rows[first]
+        return nearest
+
+    def smooth_possession(self, player_ids):
+        """Drop possession spells shorter than min_hold_frames so the ball doesn't flicker between players.
+
+        player_ids has one track id per frame, -1 where nobody has the ball.
+        Those frames don't interrupt a spell. Dropped frames become -1.
+        """
+        smoothed = np.array(player_ids)
+
+        # Shortest spells first, so the spells around a dropped blip join up before they are measured
+        for min_length in range(2, self.min_hold_frames + 1):
+            held = np.flatnonzero(smoothed != -1)
+            if len(held) == 0:
+                break
+            holders = smoothed[held]
+            starts = np.flatnonzero(np.r_[True, holders[1:] != holders[:-1]])
+            lengths = np.diff(np.r_[starts, len(holders)])
+            smoothed[held[np.repeat(lengths < min_length, lengths)]] = -1
+        return smoothed
+
+    def assign_tracks(self, tracks, view_transformer=None):
+        """Flag the player with the ball in every frame of a TrackStore.
+
+        Returns the (num_frames,) row index of the holder, -1 where nobody
+        has the ball. With a view_transformer that has processed the clip's
+        frames, reach is measured on the pitch.
+        """
+        players = np.flatnonzero(tracks.class_mask("players"))
+        data = tracks.data
+        nearest = self.get_nearest_players(data["frame"][players], data["bbox"][players], tracks.ball_bboxes(),
+                                           view_transformer)
+
+        holder_ids = np.where(nearest != -1, data["track_id"][players[np.maximum(nearest, 0)]], -1)
+        held = self.smooth_possession(holder_ids) != -1
+        holder_rows = np.where(held, players[np.maximum(nearest, 0)], -1)
+        tracks.set_ball_holders(holder_rows[held])
+        return holder_rows
+
+    def update_possession(self, player_id):
+        """Streaming counterpart of smooth_possession for one frame's nearest player.
+
+        A new player takes over after being the nearest for min_hold_frames
+        frames in a row. Returns the holder for this frame, -1 while
+        nobody (or only a candidate) has the ball.
+        """
+        if player_id == -1:
+            return -1
+        if player_id == self.holder:
+            self.candidate, self.candidate_frames = -1, 0
+            return self.holder
+
+        if player_id == self.candidate:
+            self.candidate_frames += 1
+        else:
+            self.candidate, self.candidate_frames = player_id, 1
+        if self.candidate_frames < self.min_hold_frames:
+            return -1
+
+        self.holder = player_id
+        self.candidate, self.candidate_frames = -1, 0
+        return self.holder
+
+    def assign_ball_to_player(self, players, ball_bbox, view_transformer=None):
+        """Track id of the player closest to the ball in one frame, -1 if nobody is within reach.
+
+        With a view_transformer, reach is measured on the pitch with the
+        homography of the last frame it was updated with.
+        """
+        if not players or len(ball_bbox) != 4:
+            return -1
+
+        player_ids = list(players.keys())
+        bboxes = np.array([player["bbox"] for player in players.values()], dtype=np.float32)
+        ball_center = (np.asarray(ball_bbox[:2], dtype=np.float32) + np.asarray(ball_bbox[2:], dtype=np.float32)) / 2
+        distance, reach = self.get_distances(bboxes, ball_center, view_transformer)
+
+        nearest = int(np.argmin(distance))
+        if not distance[nearest] < reach:
+            return -1
+        return player_ids[nearest]
\ No newline at end of file
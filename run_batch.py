@@ -0,0 +1,68 @@
+import argparse
+from batch import BatchRunner
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze a directory of football videos without the web UI")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories to search for videos")
+    parser.add_argument("--output-dir", default="outputs", help="One folder per video is written here")
+    parser.add_argument("--model", default="models/best.pt", help="YOLO weights")
+    parser.add_argument("--workers", type=int, default=1, help="Videos processed in parallel, each worker loads the model once")
+    parser.add_argument("--skip-frames", type=int, default=1, help="Keep every nth frame")
+    parser.add_argument("--resize-width", type=int, default=None, help="Resize frames to this width before analysis")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop each video after this many frames")
+    parser.add_argument("--start", type=float, default=None, help="Start each video at this many seconds")
+    parser.add_argument("--end", type=float, default=None, help="Stop each video at this many seconds")
+    parser.add_argument("--batch-size", type=int, default=20, help="Frames per inference batch")
+    parser.add_argument("--auto-batch", action="store_true", help="Time a few batch sizes on the first frames and keep the fastest")
+    parser.add_argument("--conf", type=float, default=0.1, help="Detection confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=None, help="Inference image size")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"], help="Inference backend")
+    parser.add_argument("--keyframe-interval", type=int, default=1, help="Run YOLO on every nth frame and propagate boxes in between")
+    parser.add_argument("--ball-roi", action="store_true", help="Search for the ball in full-resolution crops")
+    parser.add_argument("--crf", type=int, default=None, help="Output quality when encoding with ffmpeg")
+    parser.add_argument("--preset", default=None, help="ffmpeg speed preset")
+    parser.add_argument("--concurrent", action="store_true", help="Overlap pipeline stages in threads within each video")
+    parser.add_argument("--no-retry-failed", action="store_true", help="Skip videos that failed in an earlier run")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    encoder_options = {}
+    if args.crf is not None:
+        encoder_options["crf"] = args.crf
+    if args.preset is not None:
+        encoder_options["preset"] = args.preset
+
+    runner = BatchRunner(
+        model_path=args.model,
+        output_dir=args.output_dir,
+        num_workers=args.workers,
+        tracker_options={
+            "batch_size": args.batch_size,
+            "conf": args.conf,
+            "imgsz": args.imgsz,
+            "backend": args.backend,
+            "keyframe_interval": args.keyframe_interval,
+            "ball_roi": args.ball_roi,
+        },
+        skip_frames=args.skip_frames,
+        resize_width=args.resize_width,
+        max_frames=args.max_frames,
+        start_time=args.start,
+        end_time=args.end,
+        encoder_options=encoder_options,
+        concurrent=args.concurrent,
+        auto_batch=args.auto_batch,
+    )
+    jobs = runner.run(args.inputs, retry_failed=not args.no_retry_failed)
+
+    failed = [video_path for video_path, job in jobs.items() if job["status"] != "done"]
+    print(f"Done: {len(jobs) - len(failed)} succeeded, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
@@ -0,0 +1 @@
+from .speed_and_distance_estimator import SpeedAndDistanceEstimator, TrackKinematics
\ No newline at end of file
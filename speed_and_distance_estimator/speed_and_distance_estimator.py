@@ -0,0 +1,278 @@
+from collections import deque
+import numpy as np
+from utils.bbox_utils import get_foot_positions
+
+DEFAULT_FPS = 30
+
+
+class TrackKinematics:
+    """Speed, distance and acceleration of every row of a class in a TrackStore.
+
+    Arrays are aligned and sorted by (track_id, frame); rows indexes the
+    TrackStore data. speed and acceleration are NaN where there is no
+    earlier position to measure against yet.
+    """
+
+    def __init__(self, rows, track_ids, frames, speed, distance, acceleration, sprints, accelerations):
+        self.rows = rows
+        self.track_ids = track_ids
+        self.frames = frames
+        self.speed = speed
+        self.distance = distance
+        self.acceleration = acceleration
+        self.sprints = sprints
+        self.accelerations = accelerations
+
+    def get_frame(self, frame_num):
+        """{track_id: {"speed", "distance", "acceleration"}} of one frame."""
+        frame_rows = np.flatnonzero(self.frames == frame_num)
+        return {
+            int(self.track_ids[i]): {
+                "speed": float(self.speed[i]),
+                "distance": float(self.distance[i]),
+                "acceleration": float(self.acceleration[i]),
+            }
+            for i in frame_rows
+        }
+
+    def summary(self):
+        """{track_id: {"distance", "top_speed", "mean_speed", "sprints", "accelerations"}} over the clip."""
+        if len(self.track_ids) == 0:
+            return {}
+        starts = np.flatnonzero(np.r_[True, self.track_ids[1:] != self.track_ids[:-1]])
+        ends = np.r_[starts[1:], len(self.track_ids)] - 1
+        measured = np.isfinite(self.speed)
+        speed = np.where(measured, self.speed, 0.0)
+        top_speed = np.maximum.reduceat(speed, starts)
+        mean_speed = np.add.reduceat(speed, starts) / np.maximum(np.add.reduceat(measured, starts), 1)
+
+        sprint_counts = {}
+        for event in self.sprints:
+            sprint_counts[event["track_id"]] = sprint_counts.get(event["track_id"], 0) + 1
+        acceleration_counts = {}
+        for event in self.accelerations:
+            acceleration_counts[event["track_id"]] = acceleration_counts.get(event["track_id"], 0) + 1
+
+        return {
+            int(self.track_ids[start]): {
+                "distance": float(self.distance[end]),
+                "top_speed": float(top_speed[k]),
+                "mean_speed": float(mean_speed[k]),
+                "sprints": sprint_counts.get(int(self.track_ids[start]), 0),
+                "accelerations": acceleration_counts.get(int(self.track_ids[start]), 0),
+            }
+            for k, (start, end) in enumerate(zip(starts, ends))
+        }
+
+
+class SpeedAndDistanceEstimator:
+    """Speed, distance covered, acceleration and sprints of every player track.
+
+    Positions are the foot points of the boxes, averaged over the last
+    smoothing_window detections of a track to take out box jitter. They are
+    in pixels unless meters_per_pixel or position_transform (points (N, 2),
+    frames (N,) -> pitch positions (N, 2)) maps them to meters; max_speed,
+    sprint_speed and acceleration_threshold are in those units per second
+    and the defaults assume meters. A track that is lost for more than
+    max_gap frames starts a new segment: the distance across the gap isn't
+    counted and speeds are measured afresh. Steps faster than max_speed are
+    tracking glitches (usually an id switch) and are capped.
+    """
+
+    def __init__(self, fps=None, meters_per_pixel=None, position_transform=None, smoothing_window=5, max_gap=10,
+                 max_speed=12.0, sprint_speed=7.0, min_sprint_seconds=1.0, acceleration_threshold=3.0,
+                 min_acceleration_seconds=0.5):
+        self.fps = fps
+        self.meters_per_pixel = meters_per_pixel
+        self.position_transform = position_transform
+        self.smoothing_window = smoothing_window
+        self.max_gap = max_gap
+        self.max_speed = max_speed
+        self.sprint_speed = sprint_speed
+        self.min_sprint_seconds = min_sprint_seconds
+        self.acceleration_threshold = acceleration_threshold
+        self.min_acceleration_seconds = min_acceleration_seconds
+        self.reset()
+
+    def reset(self):
+        """Forget the streaming state, call between videos."""
+        self.track_states = {}
+        self.sprints = []
+        self.accelerations = []
+
+    def get_positions(self, bboxes, frames):
+        positions = get_foot_positions(bboxes)
+        if self.position_transform is not None:
+            positions = np.asarray(self.position_transform(positions, frames), dtype=np.float64)
+        if self.meters_per_pixel is not None:
+            positions = positions * self.meters_per_pixel
+        return positions
+
+    def get_times(self, tracks, frames):
+        # Source timestamps also account for skipped frames
+        if tracks.timestamps is not None and len(tracks.timestamps) >= tracks.num_frames:
+            return tracks.timestamps[frames]
+        return frames / float(self.fps or tracks.fps or DEFAULT_FPS)
+
+    # Whole clip
+
+    def estimate(self, tracks, cls="players"):
+        """TrackKinematics of every cls track in a TrackStore, in one vectorized pass."""
+        rows = np.flatnonzero(tracks.class_mask(cls))
+        data = tracks.data[rows]
+        order = np.lexsort((data["frame"], data["track_id"]))
+        rows, data = rows[order], data[order]
+
+        frames = data["frame"].astype(np.int64)
+        track_ids = data["track_id"].astype(np.int64)
+        times = self.get_times(tracks, frames)
+        positions = self.get_positions(data["bbox"], frames)
+        index = np.arange(len(rows))
+
+        # A segment ends with its track or at a gap longer than max_gap
+        new_track = np.r_[True, track_ids[1:] != track_ids[:-1]]
+        new_segment = new_track | np.r_[True, np.diff(frames) - 1 > self.max_gap]
+        segment_start = np.maximum.accumulate(np.where(new_segment, index, 0))
+        track_start = np.maximum.accumulate(np.where(new_track, index, 0))
+
+        # Trailing moving average within the segment
+        cumulative = np.vstack([np.zeros((1, 2)), np.cumsum(positions, axis=0)])
+        window_start = np.maximum(index - self.smoothing_window + 1, segment_start)
+        smoothed = (cumulative[index + 1] - cumulative[window_start]) / (index + 1 - window_start)[:, None]
+
+        measured = ~new_segment
+        dt = np.where(measured, np.r_[np.inf, np.diff(times)], np.inf)
+        step = np.r_[0.0, np.hypot(*np.diff(smoothed, axis=0).T)]
+        step = np.where(measured, step, 0.0)
+        if self.max_speed is not None:
+            step = np.minimum(step, self.max_speed * dt)
+        speed = np.where(measured, step / dt, np.nan)
+
+        total = np.cumsum(step)
+        distance = total - total[track_start]
+        acceleration = (speed - np.r_[np.nan, speed[:-1]]) / dt
+
+        sprints = self.get_events(speed >= self.sprint_speed, new_segment, track_ids, frames, times, distance, speed,
+                                  self.min_sprint_seconds)
+        accelerations = self.get_events(acceleration >= self.acceleration_threshold, new_segment, track_ids, frames,
+                                        times, distance, speed, self.min_acceleration_seconds)
+        return TrackKinematics(rows, track_ids, frames, speed, distance, acceleration, sprints, accelerations)
+
+    def get_events(self, active, new_segment, track_ids, frames, times, distance, speed, min_seconds):
+        """Runs of consecutive active rows within a segment that last at least min_seconds."""
+        # Row i continues the run of row i - 1
+        continues = active & np.r_[False, active[:-1]] & ~new_segment
+        starts = np.flatnonzero(active & ~continues)
+        ends = np.flatnonzero(active & ~np.r_[continues[1:], False])
+        seconds = times[ends] - times[starts]
+        keep = seconds >= min_seconds
+        if not keep.any():
+            return []
+
+        # Top speed of every run, from one reduceat over [start, end + 1) pairs
+        bounds = np.column_stack([starts, ends + 1]).ravel()
+        top_speed = np.maximum.reduceat(np.r_[np.nan_to_num(speed), 0.0], bounds)[::2]
+        return [
+            self.make_event(track_ids[start], frames[start], frames[end], seconds[k], distance[end] - distance[start],
+                            top_speed[k])
+            for k, (start, end) in enumerate(zip(starts, ends)) if keep[k]
+        ]
+
+    def make_event(self, track_id, start_frame, end_frame, seconds, distance, top_speed):
+        return {
+            "track_id": int(track_id),
+            "start_frame": int(start_frame),
+            "end_frame": int(end_frame),
+            "seconds": float(seconds),
+            "distance": float(distance),
+            "top_speed": float(top_speed),
+        }
+
+    # Streaming
+
+    def update(self, frame_num, player_track, timestamp=None):
+        """Streaming counterpart of estimate for one frame's {track_id: {"bbox"}}.
+
+        Writes "speed", "distance" and "acceleration" into every track dict
+        and returns them as {track_id: (speed, distance, acceleration)}.
+        Finished sprints and accelerations are appended to self.sprints and
+        self.accelerations; call finish() after the last frame.
+        """
+        if timestamp is None:
+            timestamp = frame_num / float(self.fps or DEFAULT_FPS)
+        if not player_track:
+            return {}
+
+        track_ids = list(player_track)
+        bboxes = [player_track[track_id]["bbox"] for track_id in track_ids]
+        positions = self.get_positions(bboxes, np.full(len(track_ids), frame_num))
+
+        values = {}
+        for track_id, position in zip(track_ids, positions):
+            values[track_id] = self.update_track(track_id, frame_num, timestamp, position)
+            track = player_track[track_id]
+            track["speed"], track["distance"], track["acceleration"] = values[track_id]
+        return values
+
+    def update_track(self, track_id, frame_num, timestamp, position):
+        state = self.track_states.get(track_id)
+        if state is None:
+            state = self.track_states[track_id] = {"frame": None, "distance": 0.0, "runs": {}}
+        elif frame_num - state["frame"] - 1 > self.max_gap:
+            self.close_runs(track_id, state)
+            state["frame"] = None
+
+        if state["frame"] is None:
+            # First position of a segment, nothing to measure against yet
+            state["window"] = deque([position], maxlen=self.smoothing_window)
+            state["smoothed"] = position
+            state["speed"] = np.nan
+            speed = acceleration = np.nan
+        else:
+            state["window"].append(position)
+            smoothed = np.mean(state["window"], axis=0)
+            dt = timestamp - state["time"]
+            step = float(np.hypot(*(smoothed - state["smoothed"])))
+            if self.max_speed is not None:
+                step = min(step, self.max_speed * dt)
+            speed = step / dt
+            acceleration = (speed - state["speed"]) / dt
+            state["distance"] += step
+            state["smoothed"], state["speed"] = smoothed, speed
+
+        state["frame"], state["time"] = frame_num, timestamp
+        self.update_run(track_id, state, "sprint", speed >= self.sprint_speed, speed)
+        self.update_run(track_id, state, "acceleration", acceleration >= self.acceleration_threshold, speed)
+        return speed, state["distance"], acceleration
+
+    def update_run(self, track_id, state, kind, active, speed):
+        run = state["runs"].get(kind)
+        if not active:
+            if run is not None:
+                self.close_run(track_id, kind, run)
+                del state["runs"][kind]
+            return
+        if run is None:
+            run = state["runs"][kind] = {"start_frame": state["frame"], "start_time": state["time"],
+                                         "start_distance": state["distance"], "top_speed": 0.0}
+        run["end_frame"], run["end_time"], run["end_distance"] = state["frame"], state["time"], state["distance"]
+        run["top_speed"] = max(run["top_speed"], np.nan_to_num(speed))
+
+    def close_run(self, track_id, kind, run):
+        seconds = run["end_time"] - run["start_time"]
+        min_seconds = self.min_sprint_seconds if kind == "sprint" else self.min_acceleration_seconds
+        if seconds < min_seconds:
+            return
+        event = self.make_event(track_id, run["start_frame"], run["end_frame"], seconds,
+                                run["end_distance"] - run["start_distance"], run["top_speed"])
+        (self.sprints if kind == "sprint" else self.accelerations).append(event)
+
+    def close_runs(self, track_id, state):
+        for kind, run in state["runs"].items():
+            self.close_run(track_id, kind, run)
+        state["runs"] = {}
+
+    def finish(self):
+        """Close the sprints and accelerations still running at the end of the video."""
+        for track_id, state in self.track_states.items():
+            self.close_runs(track_id, state)
\ No newline at end of file
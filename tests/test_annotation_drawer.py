@@ -0,0 +1,26 @@
+import numpy as np
+from trackers.AnnotationDrawer import AnnotationDrawer
+
+
+def drawn_counts(drawer, frame_num, team_ball_control):
+    drawn = []
+    drawer.draw_ball_control_panel = lambda frame, team_1, team_2: drawn.append((team_1, team_2))
+    drawer.draw_team_ball_control(None, frame_num, team_ball_control)
+    return drawn[0]
+
+
+def test_ball_control_counts_follow_a_growing_list():
+    rng = np.random.default_rng(0)
+    drawer = AnnotationDrawer()
+    team_ball_control = []
+    for frame_num, team in enumerate(rng.integers(1, 3, 200).tolist()):
+        team_ball_control.append(team)
+        expected = (team_ball_control.count(1), team_ball_control.count(2))
+        assert drawn_counts(drawer, frame_num, team_ball_control) == expected
+
+
+def test_ball_control_counts_of_a_new_list():
+    drawer = AnnotationDrawer()
+    assert drawn_counts(drawer, 2, [1, 1, 2, 2]) == (2, 1)
+    # Same length, other list
+    assert drawn_counts(drawer, 2, [2, 2, 2, 1]) == (0, 3)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from trackers.BallInterpolator import BallInterpolator
+
+
+def random_ball(rng, num_frames=300):
+    """A bouncing ball seen in most frames, with short and long gaps and a few false detections."""
+    t = np.arange(num_frames)
+    centers = np.column_stack([
+        640 + 400 * np.sin(t / rng.uniform(20, 60)),
+        360 + 200 * np.cos(t / rng.uniform(15, 50)),
+    ]) + rng.normal(0, 1, (num_frames, 2))
+    bboxes = np.hstack([centers - 5, centers + 5])
+
+    missing = rng.random(num_frames) < 0.3
+    for start in rng.integers(0, num_frames, 4):
+        missing[start:start + rng.integers(5, 40)] = True
+    bboxes[missing] = np.nan
+
+    spikes = rng.choice(np.flatnonzero(~missing), 5, replace=False)
+    bboxes[spikes] += rng.choice([-1, 1], (5, 1)) * 300
+    return bboxes
+
+
+def stream(interpolator, bboxes):
+    items = [
+        (frame_num, {"ball": {} if np.isnan(bbox).any() else {1: {"bbox": bbox.tolist()}}})
+        for frame_num, bbox in enumerate(bboxes)
+    ]
+    filled = np.full(bboxes.shape, np.nan)
+    for frame_num, frame_tracks in interpolator.interpolate_stream(iter(items)):
+        if 1 in frame_tracks["ball"]:
+            filled[frame_num] = frame_tracks["ball"][1]["bbox"]
+    return filled
+
+
+@pytest.mark.parametrize("method", ["linear", "spline"])
+@pytest.mark.parametrize("seed", range(10))
+def test_stream_matches_batch(method, seed):
+    rng = np.random.default_rng(seed)
+    bboxes = random_ball(rng)
+    interpolator = BallInterpolator(max_gap=25, method=method, max_speed=80)
+
+    batch = interpolator.fill(bboxes)
+    streamed = stream(interpolator, bboxes)
+
+    np.testing.assert_allclose(streamed, batch, rtol=1e-9, equal_nan=True)
+
+
+def test_leading_frames_are_not_back_filled():
+    bboxes = np.full((10, 4), np.nan)
+    bboxes[4:] = [[100, 100, 110, 110]]
+
+    filled = BallInterpolator().fill(bboxes)
+
+    assert np.isnan(filled[:4]).all()
+    assert np.isfinite(filled[4:]).all()
\ No newline at end of file
@@ -0,0 +1,101 @@
+from collections import namedtuple
+import numpy as np
+import supervision as sv
+from trackers.BallRoiDetector import BallRoiDetector, BallTrajectory
+from trackers.KeyframeDetector import KeyframeDetector
+
+FRAME_SHAPE = (360, 640, 3)
+NAMES = {0: "ball", 1: "player"}
+ROI_SIZE = 64
+
+FakeResult = namedtuple("FakeResult", "detections names")
+
+
+class FakeDetector:
+    """Finds the white ball in crops but never in full frames, like a downscaled pass missing it."""
+
+    imgsz = ROI_SIZE
+
+    def __init__(self):
+        self.crops = 0
+
+    def get_batch_size(self, frame_shape):
+        return 8
+
+    def reset(self):
+        pass
+
+    def predict(self, images):
+        results = []
+        for image in images:
+            xyxy = np.zeros((0, 4), dtype=np.float32)
+            if image.shape != FRAME_SHAPE:
+                self.crops += 1
+                ys, xs = np.nonzero(image[..., 0])
+                if len(xs):
+                    xyxy = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32)
+            detections = sv.Detections(
+                xyxy=xyxy, confidence=np.ones(len(xyxy)), class_id=np.zeros(len(xyxy), dtype=int)
+            )
+            results.append(FakeResult(detections, NAMES))
+        return results
+
+
+def ball_frames(frame_nums, speed=(6, 2), start=(40, 100)):
+    frames, boxes = [], []
+    for frame_num in frame_nums:
+        x, y = start[0] + speed[0] * frame_num, start[1] + speed[1] * frame_num
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        frame[y:y + 4, x:x + 4] = 255
+        frames.append(frame)
+        boxes.append([x, y, x + 4, y + 4])
+    return frames, np.array(boxes, dtype=np.float32)
+
+
+def found_boxes(results):
+    return np.array([r.detections.xyxy[0] if len(r.detections) else [np.nan] * 4 for r in results])
+
+
+def test_trajectory_update_skips_gap():
+    trajectory = BallTrajectory()
+    trajectory.update((0, 0))
+    trajectory.update((30, 0), gap=3)
+    # Sightings on frames 0 and 3: 10 px per frame, and the next frame is frame 4
+    assert np.allclose(trajectory.predict(), (40, 0))
+    assert np.allclose(trajectory.predict(ahead=2), (60, 0))
+
+
+def test_one_crop_per_frame_once_found():
+    frames, boxes = ball_frames(range(40))
+    detector = FakeDetector()
+    roi = BallRoiDetector(detector, ROI_SIZE)
+
+    results = roi.predict(frames)
+
+    assert np.array_equal(found_boxes(results), boxes)
+    # Only the first frame is tiled, every later one gets a single crop on the trajectory
+    assert detector.crops == len(roi.get_tiles(FRAME_SHAPE)) + len(frames) - 1
+
+
+def test_uneven_keyframe_gaps():
+    frame_nums = [0, 1, 2, 5, 6, 10, 11, 12, 16, 17, 20]
+    frames, boxes = ball_frames(frame_nums, speed=(12, 4))
+    gaps = [1] + np.diff(frame_nums).tolist()
+    detector = FakeDetector()
+    roi = BallRoiDetector(detector, ROI_SIZE)
+
+    results = roi.predict(frames, gaps)
+
+    assert np.array_equal(found_boxes(results), boxes)
+    assert detector.crops == len(roi.get_tiles(FRAME_SHAPE)) + len(frames) - 1
+
+
+def test_reset_through_wrappers():
+    frames, _ = ball_frames(range(5))
+    roi = BallRoiDetector(FakeDetector(), ROI_SIZE)
+    roi.predict(frames)
+    assert roi.trajectory.positions
+
+    KeyframeDetector(roi).reset()
+    assert not roi.trajectory.positions
+    assert roi.trajectory.step == 0
\ No newline at end of file
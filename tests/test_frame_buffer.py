@@ -0,0 +1,116 @@
+import multiprocessing
+import numpy as np
+import pytest
+from pipeline import FrameRing
+
+FRAME_SHAPE = (72, 128, 3)
+
+# The ring of a pool worker, handed over by the initializer
+_ring = None
+
+
+def _init_reader(ring):
+    global _ring
+    _ring = ring
+
+
+def _read_frame(ref):
+    frame = _ring.view(ref)
+    total = int(frame.sum())
+    del frame
+    _ring.release(ref)
+    return total
+
+
+@pytest.fixture
+def context():
+    return multiprocessing.get_context("spawn")
+
+
+def test_frames_are_read_in_other_processes(context):
+    ring = FrameRing(3, FRAME_SHAPE, context=context)
+    try:
+        with context.Pool(2, initializer=_init_reader, initargs=(ring,)) as pool:
+            results = []
+            for value in range(12):
+                # More frames than slots, put() waits for the readers to release them
+                ref = ring.put(np.full(FRAME_SHAPE, value, dtype=np.uint8), timeout=30)
+                results.append(pool.apply_async(_read_frame, (ref,)))
+            totals = [result.get(timeout=30) for result in results]
+        assert totals == [value * int(np.prod(FRAME_SHAPE)) for value in range(12)]
+        assert ring.in_use() == 0
+    finally:
+        ring.close()
+
+
+def test_slot_is_held_until_every_reader_released(context):
+    ring = FrameRing(1, FRAME_SHAPE, context=context)
+    try:
+        ref = ring.put(np.ones(FRAME_SHAPE, dtype=np.uint8), refs=2)
+        ring.retain(ref)
+        for _ in range(2):
+            ring.release(ref)
+            assert ring.in_use() == 1
+            assert ring.view(ref).sum() == np.prod(FRAME_SHAPE)
+        ring.release(ref)
+        assert ring.in_use() == 0
+    finally:
+        ring.close()
+
+
+def test_stale_refs_are_rejected(context):
+    ring = FrameRing(1, FRAME_SHAPE, context=context)
+    try:
+        old = ring.put(np.zeros(FRAME_SHAPE, dtype=np.uint8))
+        ring.release(old)
+        with pytest.raises(ValueError):
+            ring.release(old)
+
+        # The slot is reused by the next frame, the old ref must not see it
+        new = ring.put(np.ones(FRAME_SHAPE, dtype=np.uint8))
+        assert new.slot == old.slot
+        with pytest.raises(ValueError):
+            ring.view(old)
+        with pytest.raises(ValueError):
+            ring.release(old)
+        assert ring.view(new).all()
+        ring.release(new)
+    finally:
+        ring.close()
+
+
+def test_views_are_read_only(context):
+    ring = FrameRing(1, FRAME_SHAPE, context=context)
+    try:
+        ref = ring.put(np.zeros(FRAME_SHAPE, dtype=np.uint8))
+        frame = ring.view(ref)
+        with pytest.raises(ValueError):
+            frame[0, 0, 0] = 1
+        del frame
+        ring.release(ref)
+    finally:
+        ring.close()
+
+
+def test_reserve_times_out_while_every_slot_is_held(context):
+    ring = FrameRing(2, FRAME_SHAPE, context=context)
+    try:
+        refs = [ring.put(np.zeros(FRAME_SHAPE, dtype=np.uint8)) for _ in range(2)]
+        with pytest.raises(TimeoutError):
+            ring.reserve(timeout=0.1)
+
+        ring.release(refs[0])
+        ref, view = ring.reserve(timeout=0.1)
+        assert ref.slot == refs[0].slot
+        del view
+    finally:
+        ring.close()
+
+
+def test_frames_must_fit_the_slots(context):
+    ring = FrameRing(1, FRAME_SHAPE, context=context)
+    try:
+        with pytest.raises(ValueError):
+            ring.put(np.zeros((FRAME_SHAPE[0] * 2,) + FRAME_SHAPE[1:], dtype=np.uint8))
+    finally:
+        ring.close()
\ No newline at end of file
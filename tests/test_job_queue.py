@@ -0,0 +1,20 @@
+import io
+import os
+from batch.job_queue import JobQueue
+
+
+def test_cancelled_queued_job_is_cleaned_up(tmp_path):
+    # No workers, the queue is drained by hand below
+    job_queue = JobQueue(output_dir=str(tmp_path), max_concurrent=0, max_finished=0)
+    job_id = job_queue.submit(io.BytesIO(b"not a video"), name="clip.mp4")
+    job = job_queue.get(job_id)
+    assert os.path.exists(job.video_path)
+
+    assert job_queue.cancel(job_id)
+    job_queue._queue.put(None)
+    job_queue._work()
+
+    assert job.status == "cancelled"
+    assert not os.path.exists(job.video_path)
+    assert job_queue.get(job_id) is None
+    assert not os.path.exists(job.job_dir)
\ No newline at end of file
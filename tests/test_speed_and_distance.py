@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from speed_and_distance_estimator import SpeedAndDistanceEstimator
+from trackers.TrackStore import TrackStore, CLASS_IDS
+
+
+def random_tracks(rng, num_frames=150, num_tracks=8):
+    """Players speeding up to a sprint at random times, with short and long gaps."""
+    tracks = TrackStore()
+    tracks.timestamps = np.arange(1, num_frames + 1) / 30
+    positions = rng.uniform(100, 900, (num_tracks, 2))
+    directions = rng.normal(0, 1, (num_tracks, 2))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    # Pixels per second, reaching top_speed over ramp seconds from start
+    start, ramp = rng.uniform(0, 2, num_tracks), rng.uniform(1, 2, num_tracks)
+    top_speed = rng.uniform(150, 220, num_tracks)
+
+    for frame_num in range(num_frames):
+        speed = top_speed * np.clip((tracks.timestamps[frame_num] - start) / ramp, 0, 1)
+        positions += directions * (speed / 30)[:, None]
+        # Some tracks are missing for a frame or two, one for longer than max_gap
+        seen = rng.random(num_tracks) > 0.03
+        seen &= ~((np.arange(num_tracks) == 0) & (50 <= frame_num < 70))
+        track_ids = np.flatnonzero(seen) + 1
+        x, y = positions[seen].T
+        bboxes = np.column_stack([x - 15, y - 60, x + 15, y])
+        tracks.append_frame(frame_num, np.full(len(track_ids), CLASS_IDS["players"]), track_ids, bboxes)
+    return tracks
+
+
+def stream(estimator, tracks):
+    values = {}
+    for frame_num in range(tracks.num_frames):
+        rows = tracks.frame_rows(frame_num, "players")
+        player_track = {int(row["track_id"]): {"bbox": row["bbox"].tolist()} for row in rows}
+        for track_id, value in estimator.update(frame_num, player_track, tracks.timestamps[frame_num]).items():
+            values[track_id, frame_num] = value
+    estimator.finish()
+    return values
+
+
+def sorted_events(events):
+    return sorted(events, key=lambda event: (event["track_id"], event["start_frame"]))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_matches_batch(seed):
+    rng = np.random.default_rng(seed)
+    tracks = random_tracks(rng)
+    options = dict(meters_per_pixel=0.05, max_gap=10, smoothing_window=5)
+
+    batch_estimator = SpeedAndDistanceEstimator(**options)
+    kinematics = batch_estimator.estimate(tracks)
+    stream_estimator = SpeedAndDistanceEstimator(**options)
+    values = stream(stream_estimator, tracks)
+
+    # float32 boxes go through different sums in the two paths
+    streamed = np.array([values[int(track_id), int(frame)] for track_id, frame in zip(kinematics.track_ids, kinematics.frames)])
+    for column, batch in enumerate([kinematics.speed, kinematics.distance, kinematics.acceleration]):
+        np.testing.assert_allclose(streamed[:, column], batch, rtol=1e-5, atol=1e-8, equal_nan=True)
+
+    assert kinematics.sprints and kinematics.accelerations
+    for batch_events, stream_events in ((kinematics.sprints, stream_estimator.sprints),
+                                        (kinematics.accelerations, stream_estimator.accelerations)):
+        batch_events, stream_events = sorted_events(batch_events), sorted_events(stream_events)
+        assert len(batch_events) == len(stream_events)
+        for batch_event, stream_event in zip(batch_events, stream_events):
+            assert stream_event == pytest.approx(batch_event, rel=1e-5)
\ No newline at end of file
@@ -1,9 +1,13 @@
 import numpy as np
 import cv2
 from utils import get_center_of_bbox, get_bbox_width
+from .TrackStore import CLASS_IDS, NO_TEAM
 
 
 class AnnotationDrawer:
+    def __init__(self):
+        self._panel_cache = {}
+        self._ball_control_counts = None
 
     def draw_ellipse(self, frame, bbox, color, track_id=None):
         y2 = int(bbox[3])
@@ -66,8 +70,32 @@ class AnnotationDrawer:
 
         return frame
     
+    def get_ball_control_counts(self, team_ball_control):
+        # Prefix sums of frames controlled by each team
+        team_ball_control = np.asarray(team_ball_control)
+        return np.cumsum(team_ball_control == 1), np.cumsum(team_ball_control == 2)
+
     def draw_team_ball_control(self, frame, frame_num, team_ball_control):
-        h, w, _ = frame.shape
+        # Counts of the list drawn last are kept and extended as it grows, it is only ever appended to
+        cached = self._ball_control_counts
+        if cached is None or cached[0] is not team_ball_control or not 0 < len(cached[1]) <= len(team_ball_control):
+            cached = (team_ball_control, *self.get_ball_control_counts(team_ball_control))
+        elif frame_num >= len(cached[1]):
+            start = len(cached[1])
+            team_1_counts, team_2_counts = self.get_ball_control_counts(team_ball_control[start:])
+            cached = (
+                team_ball_control,
+                np.concatenate([cached[1], cached[1][-1:] + team_1_counts]),
+                np.concatenate([cached[2], cached[2][-1:] + team_2_counts]),
+            )
+        self._ball_control_counts = cached
+
+        return self.draw_ball_control_panel(frame, cached[1][frame_num], cached[2][frame_num])
+
+    def get_panel(self, h, w):
+        # Layout and the white panel only depend on the resolution
+        if (h, w) in self._panel_cache:
+            return self._panel_cache[(h, w)]
 
         # Adjust rectangle & text positions based on resize width
         if w == 640: 
@@ -81,16 +109,25 @@ class AnnotationDrawer:
             rect_x1, rect_y1, rect_x2, rect_y2 = int(w*0.55), int(h*0.85), int(w*0.9), int(h*0.97)
             font_scale = w / 1280  # scale text with resolution
 
-        # Draw semi-transparent rectangle
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (rect_x1, rect_y1), (rect_x2, rect_y2), (255, 255, 255), -1)
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        # cv2.rectangle fills both end points, so the ROI is inclusive
+        roi = (slice(max(rect_y1, 0), min(rect_y2 + 1, h)), slice(max(rect_x1, 0), min(rect_x2 + 1, w)))
+        roi_h = roi[0].stop - roi[0].start
+        roi_w = roi[1].stop - roi[1].start
+        white = np.full((max(roi_h, 0), max(roi_w, 0), 3), 255, dtype=np.uint8)
 
-        # Ball control calculations
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]
-        team_1_num_frames = (team_ball_control_till_frame == 1).sum()
-        team_2_num_frames = (team_ball_control_till_frame == 2).sum()
+        panel = (rect_x1, rect_y1, font_scale, roi, white)
+        self._panel_cache[(h, w)] = panel
+        return panel
+
+    def draw_ball_control_panel(self, frame, team_1_num_frames, team_2_num_frames):
+        h, w, _ = frame.shape
+        rect_x1, rect_y1, font_scale, roi, white = self.get_panel(h, w)
+
+        # Draw semi-transparent rectangle, blending only the panel area
+        alpha = 0.4
+        if white.size:
+            frame_roi = frame[roi]
+            cv2.addWeighted(white, alpha, frame_roi, 1 - alpha, 0, frame_roi)
 
         if (team_1_num_frames + team_2_num_frames) == 0:
             team_1, team_2 = 0, 0
@@ -108,34 +145,54 @@ class AnnotationDrawer:
 
         return frame
 
+    def draw_frame(self, frame, player_dict, ball_dict, referee_dict):
+        # Draw Players
+        for track_id, player in player_dict.items():
+            color = player.get("team_color", (0, 0, 255))
+            frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
+
+            if player.get('has_ball', False):
+                frame = self.draw_traingle(frame, player["bbox"], (0, 0, 255))
+
+        # Draw Referee
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255))
+        
+        # Draw ball 
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_traingle(frame, ball["bbox"], (0, 255, 0))
+
+        return frame
+
+    def draw_rows(self, frame, rows, team_colors):
+        """Same drawing as draw_frame, from one frame's TrackStore rows."""
+        # Players, then referees, then the ball on top
+        for class_id in (CLASS_IDS["players"], CLASS_IDS["referees"], CLASS_IDS["ball"]):
+            for row in rows[rows["cls"] == class_id]:
+                bbox = row["bbox"].tolist()
+                if class_id == CLASS_IDS["ball"]:
+                    frame = self.draw_traingle(frame, bbox, (0, 255, 0))
+                elif class_id == CLASS_IDS["referees"]:
+                    frame = self.draw_ellipse(frame, bbox, (0, 255, 255))
+                else:
+                    color = team_colors.get(int(row["team"]), (0, 0, 255)) if row["team"] != NO_TEAM else (0, 0, 255)
+                    frame = self.draw_ellipse(frame, bbox, color, int(row["track_id"]))
+                    if row["has_ball"]:
+                        frame = self.draw_traingle(frame, bbox, (0, 0, 255))
+
+        return frame
 
     def draw_annotations(self, video_frames, tracks, team_ball_control):
+        team_1_counts, team_2_counts = self.get_ball_control_counts(team_ball_control)
+
         output_video_frames = []
         for frame_num, frame in enumerate(video_frames):
             frame = frame.copy()
 
-            player_dict = tracks["players"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
-
-            # Draw Players
-            for track_id, player in player_dict.items():
-                color = player.get("team_color", (0, 0, 255))
-                frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
-
-                if player.get('has_ball', False):
-                    frame = self.draw_traingle(frame, player["bbox"], (0, 0, 255))
-
-            # Draw Referee
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255))
-            
-            # Draw ball 
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_traingle(frame, ball["bbox"], (0, 255, 0))
+            frame = self.draw_rows(frame, tracks.frame_rows(frame_num), tracks.team_colors)
 
             # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+            frame = self.draw_ball_control_panel(frame, team_1_counts[frame_num], team_2_counts[frame_num])
 
             output_video_frames.append(frame)
 
@@ -0,0 +1,150 @@
+import numpy as np
+
+FILL_METHODS = ("linear", "spline")
+
+
+class BallInterpolator:
+    """Fills short gaps in the ball trajectory and drops false ball detections.
+
+    Works on (num_frames, 4) arrays of boxes with NaN rows where the ball is
+    missing. A detection that jumps away from both of its neighbours faster
+    than max_speed (pixels per frame) is treated as a false positive. Gaps
+    of at most max_gap frames are filled at constant velocity ("linear") or
+    along a cubic Hermite curve through the neighbouring velocities
+    ("spline"). Longer gaps stay empty, so the ball never slides across the
+    pitch after a long occlusion.
+    """
+
+    def __init__(self, max_gap=25, method="linear", max_speed=80):
+        if method not in FILL_METHODS:
+            raise ValueError(f"Unknown fill method '{method}', expected one of {FILL_METHODS}")
+        self.max_gap = max_gap
+        self.method = method
+        self.max_speed = max_speed
+
+    def reject_outliers(self, frames, centers, fixed=0):
+        """Mask of the detections to keep among (frames, centers) sorted by frame.
+
+        Detections before frame fixed were already judged and are kept.
+        """
+        keep = np.ones(len(frames), dtype=bool)
+        if self.max_speed is None or len(frames) < 2:
+            return keep
+
+        speed = np.linalg.norm(np.diff(centers, axis=0), axis=1) / np.diff(frames)
+        close = np.diff(frames) - 1 <= self.max_gap
+        fast = close & (speed > self.max_speed)
+        # Neighbours across a long gap (or past the ends) say nothing, one fast side is enough then
+        suspect = fast | ~close
+        is_spike = np.r_[True, suspect] & np.r_[suspect, True] & (np.r_[False, fast] | np.r_[fast, False])
+        keep[is_spike & (frames >= fixed)] = False
+        return keep
+
+    def get_velocities(self, frames, bboxes):
+        """Per-detection box velocity from the neighbouring detections.
+
+        One-sided at the ends and next to gaps longer than max_gap.
+        """
+        index = np.arange(len(frames))
+        close = np.diff(frames) - 1 <= self.max_gap
+        before = np.where(np.r_[False, close], index - 1, index)
+        after = np.where(np.r_[close, False], index + 1, index)
+        span = np.maximum(frames[after] - frames[before], 1)
+        return (bboxes[after] - bboxes[before]) / span[:, None]
+
+    def fill(self, bboxes, fixed=0):
+        """Copy of bboxes with outliers removed and gaps of at most max_gap frames filled."""
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        filled = np.full(bboxes.shape, np.nan)
+        found = np.flatnonzero(np.isfinite(bboxes).all(axis=1))
+        found = found[self.reject_outliers(found, (bboxes[found, :2] + bboxes[found, 2:]) / 2, fixed)]
+        filled[found] = bboxes[found]
+        if len(found) < 2:
+            return filled
+
+        # Every missing frame inside a short enough gap, with its gap and position in it
+        gap_lengths = np.diff(found) - 1
+        fillable = np.flatnonzero((gap_lengths > 0) & (gap_lengths <= self.max_gap))
+        lengths = gap_lengths[fillable]
+        if len(lengths) == 0:
+            return filled
+        gap = np.repeat(fillable, lengths)
+        offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+        span = (found[gap + 1] - found[gap]).astype(np.float64)
+        t = (offset / span)[:, None]
+
+        start, end = bboxes[found[gap]], bboxes[found[gap + 1]]
+        if self.method == "linear":
+            filled[found[gap] + offset] = start + (end - start) * t
+        else:
+            velocities = self.get_velocities(found, bboxes[found])
+            start_tangent = velocities[gap] * span[:, None]
+            end_tangent = velocities[gap + 1] * span[:, None]
+            t2, t3 = t ** 2, t ** 3
+            filled[found[gap] + offset] = (
+                (2 * t3 - 3 * t2 + 1) * start
+                + (t3 - 2 * t2 + t) * start_tangent
+                + (-2 * t3 + 3 * t2) * end
+                + (t3 - t2) * end_tangent
+            )
+        return filled
+
+    def get_final_count(self, bboxes, fixed=0):
+        """How many leading frames of a window can't change any more when frames are appended.
+
+        A detection is only accepted once the next one has been seen, and a
+        gap is only filled once the detection after it is accepted (the
+        spline also needs the one after that for its end velocity).
+        """
+        found = np.flatnonzero(np.isfinite(bboxes).all(axis=1))
+        if len(found) == 0 or len(bboxes) - 1 - found[-1] > self.max_gap:
+            # Nothing can close the current gap any more
+            return len(bboxes)
+
+        keep = self.reject_outliers(found, (bboxes[found, :2] + bboxes[found, 2:]) / 2, fixed)
+        accepted = found[:-1][keep[:-1]]
+        return accepted[-2] + 1 if len(accepted) >= 2 else 0
+
+    def interpolate_stream(self, frame_tracks):
+        """Streaming counterpart of fill for (frame, frame_tracks) pairs.
+
+        Items are held back only until the detections around them are
+        known, usually a few frames and never much more than max_gap.
+        """
+        window, raw = [], []
+        done = 0
+
+        for item in frame_tracks:
+            ball_dict = item[1]["ball"]
+            bbox = ball_dict[1]["bbox"] if 1 in ball_dict else None
+            window.append(item)
+            raw.append(bbox if bbox is not None and len(bbox) == 4 else [np.nan] * 4)
+
+            raw_bboxes = np.asarray(raw, dtype=np.float64)
+            final = self.get_final_count(raw_bboxes, done)
+            if final <= done:
+                continue
+
+            yield from self._apply_fill(window, raw, self.fill(raw_bboxes, done), done, final)
+            done = final
+
+            # Keep a few accepted detections as context for the next gaps
+            found = np.flatnonzero(np.isfinite(np.asarray(raw[:done], dtype=np.float64)).all(axis=1))
+            start = found[-3] if len(found) >= 3 else 0
+            window, raw = window[start:], raw[start:]
+            done -= start
+
+        if done < len(window):
+            yield from self._apply_fill(window, raw, self.fill(np.asarray(raw, dtype=np.float64), done), done, len(window))
+
+    def _apply_fill(self, window, raw, filled, start, stop):
+        for i in range(start, stop):
+            ball_dict = window[i][1]["ball"]
+            if np.isfinite(filled[i]).all():
+                ball_dict[1] = {"bbox": filled[i].tolist()}
+            else:
+                ball_dict.pop(1, None)
+            # A rejected detection must not come back as context of a later window
+            if not np.array_equal(filled[i], raw[i]):
+                raw[i] = [np.nan] * 4
+            yield window[i]
\ No newline at end of file
@@ -0,0 +1,233 @@
+import math
+from collections import deque
+import numpy as np
+from .ObjectTracker import to_supervision
+
+
+class BallTrajectory:
+    """Recent ball centers, extrapolated to guess where the ball is next.
+
+    Uses the same straight-line motion model as interpolate_ball_positions,
+    run forward from the last two sightings instead of between them.
+    """
+
+    def __init__(self, history=5, lost_after=5):
+        self.lost_after = lost_after
+        self.positions = deque(maxlen=history)
+        self.step = 0
+
+    def reset(self):
+        self.positions.clear()
+        self.step = 0
+
+    def update(self, center, gap=1):
+        # gap is how many frames after the previous update this one is, more than 1 over skipped frames
+        self.step += gap - 1
+        if center is not None:
+            self.positions.append((self.step, np.asarray(center, dtype=np.float64)))
+        self.step += 1
+
+    def is_lost(self, ahead=0):
+        if not self.positions:
+            return True
+        return self.step + ahead - self.positions[-1][0] > self.lost_after
+
+    def predict(self, ahead=0):
+        """Expected ball center `ahead` frames after the current step, None when lost."""
+        if self.is_lost(ahead):
+            return None
+        last_step, last_center = self.positions[-1]
+        if len(self.positions) == 1:
+            return last_center
+
+        prev_step, prev_center = self.positions[-2]
+        velocity = (last_center - prev_center) / (last_step - prev_step)
+        return last_center + velocity * (self.step + ahead - last_step)
+
+
+class RoiDetections:
+    """Full-frame detections with the ball taken from the high-res crops."""
+
+    def __init__(self, detections, names):
+        self.detections = detections
+        self.names = names
+
+
+class BallRoiDetector:
+    """Finds players on the whole frame and the ball in a full-resolution crop.
+
+    The full frame goes through the wrapped detector as usual (downscaled to
+    its imgsz), which is plenty for players but loses the tiny ball. A
+    roi_size crop around where the ball should be is then inferred at native
+    resolution: centered on the low-res ball detection when there is one,
+    otherwise on the trajectory of the last sightings. Only once the ball has
+    been missing for lost_after frames is the whole frame tiled into
+    roi_size crops. Frames should therefore be passed at full resolution.
+
+    Crops are inferred in order, and every frame's result goes into the
+    trajectory before a window is guessed from it. Crops around low-res
+    detections are batched freely, trajectory guesses reach at most
+    max_ahead frames past the last result, and a tiled frame is inferred
+    on its own so the next frame can use what it found.
+    """
+
+    def __init__(self, detector, roi_size=None, lost_after=5, tile_overlap=0.2, max_ahead=4):
+        self.detector = detector
+        self.roi_size = roi_size or detector.imgsz or 640
+        self.lost_after = lost_after
+        self.tile_overlap = tile_overlap
+        self.max_ahead = max_ahead
+        self.trajectory = BallTrajectory(lost_after=lost_after)
+
+    def __getattr__(self, name):
+        # Everything else (model, batch_size, get_batch_size, ...) comes from the wrapped detector
+        return getattr(self.detector, name)
+
+    def get_settings(self):
+        return dict(
+            self.detector.get_settings(),
+            ball_roi_size=self.roi_size,
+            ball_lost_after=self.lost_after,
+        )
+
+    def detect_frames(self, frames):
+        return [detection for _, detection in self.detect_frames_stream(frames)]
+
+    def reset(self):
+        # Forget the ball of the previous video
+        self.trajectory.reset()
+        self.detector.reset()
+
+    def detect_frames_stream(self, frames, batch_size=None, with_info=False):
+        self.trajectory.reset()
+
+        batch = []
+        for item in frames:
+            frame = item[0] if with_info else item
+            if batch_size is None:
+                batch_size = self.detector.get_batch_size(frame.shape)
+
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield from self._detect_batch(batch, with_info)
+                batch = []
+
+        if batch:
+            yield from self._detect_batch(batch, with_info)
+
+    def _detect_batch(self, batch, with_info):
+        frames = [frame for frame, _ in batch] if with_info else batch
+        for item, detection in zip(batch, self.predict(frames)):
+            if with_info:
+                yield item[0], detection, item[1]
+            else:
+                yield item, detection
+
+    def predict(self, frames, gaps=None):
+        """Detect frames in video order, returning RoiDetections in order.
+
+        gaps[i] is how many frames frames[i] comes after the previous one
+        (all 1 when omitted), e.g. for keyframes that are not evenly spaced.
+        """
+        gaps = gaps or [1] * len(frames)
+        full = [to_supervision(detection) for detection in self.detector.predict(frames)]
+        if not full:
+            return []
+        names = full[0][1]
+        ball_id = {v:k for k,v in names.items()}["ball"]
+
+        results = [None] * len(frames)
+        pending = []
+        for i, (frame, (detections, _)) in enumerate(zip(frames, full)):
+            center = self.get_ball_center(detections[detections.class_id == ball_id])
+            if center is None:
+                # Guess from the trajectory, with the pending frames' results in it if it would be lost or too far ahead
+                ahead = self.get_ahead(pending, gaps, i)
+                if pending and (ahead >= self.max_ahead or self.trajectory.predict(ahead) is None):
+                    self.infer_crops(frames, full, pending, ball_id, names, results, gaps)
+                    pending = []
+                center = self.trajectory.predict(self.get_ahead(pending, gaps, i))
+
+            # Get one crop around the expected ball, or tiles when it is lost
+            if center is None:
+                windows = self.get_tiles(frame.shape)
+            else:
+                windows = [self.get_window(frame.shape, center)]
+            pending.append((i, windows))
+
+            if center is None or len(pending) >= self.detector.get_batch_size((self.roi_size, self.roi_size)):
+                self.infer_crops(frames, full, pending, ball_id, names, results, gaps)
+                pending = []
+
+        if pending:
+            self.infer_crops(frames, full, pending, ball_id, names, results, gaps)
+        return results
+
+    def get_ahead(self, pending, gaps, i):
+        # Frames from the trajectory's next step to frame i, past the pending frames
+        return sum(gaps[j] for j, _ in pending) + gaps[i] - 1
+
+    def infer_crops(self, frames, full, pending, ball_id, names, results, gaps):
+        """Infer the crops of pending [(frame index, windows)] and feed their balls to the trajectory in order."""
+        crops, owners = [], []
+        for i, windows in pending:
+            for x, y in windows:
+                crops.append(frames[i][y:y+self.roi_size, x:x+self.roi_size])
+                owners.append((i, x, y))
+
+        # Highest confidence ball over each frame's crops
+        balls = {}
+        for crop_detection, (i, x, y) in zip(self.predict_crops(crops), owners):
+            detections, _ = to_supervision(crop_detection)
+            detections = detections[detections.class_id == ball_id]
+            if len(detections) == 0:
+                continue
+            best = detections[[int(np.argmax(detections.confidence))]]
+            if i not in balls or best.confidence[0] > balls[i].confidence[0]:
+                best.xyxy = best.xyxy + np.array([x, y, x, y], dtype=best.xyxy.dtype)
+                balls[i] = best
+
+        import supervision as sv
+
+        for i, _ in pending:
+            detections = full[i][0]
+            if i in balls:
+                # The crop's ball replaces whatever the low-res pass found
+                detections = sv.Detections.merge([detections[detections.class_id != ball_id], balls[i]])
+            self.trajectory.update(self.get_ball_center(detections[detections.class_id == ball_id]), gaps[i])
+            results[i] = RoiDetections(detections, names)
+
+    def predict_crops(self, crops):
+        # Keep crop batches within the detector's batch size (and memory budget)
+        if not crops:
+            return []
+        batch_size = self.detector.get_batch_size((self.roi_size, self.roi_size))
+        results = []
+        for start in range(0, len(crops), batch_size):
+            results.extend(self.detector.predict(crops[start:start + batch_size]))
+        return results
+
+    def get_ball_center(self, ball_detections):
+        if len(ball_detections) == 0:
+            return None
+        x1, y1, x2, y2 = ball_detections.xyxy[-1]
+        return ((x1 + x2) / 2, (y1 + y2) / 2)
+
+    def get_window(self, frame_shape, center):
+        h, w = frame_shape[:2]
+        x = int(np.clip(center[0] - self.roi_size / 2, 0, max(w - self.roi_size, 0)))
+        y = int(np.clip(center[1] - self.roi_size / 2, 0, max(h - self.roi_size, 0)))
+        return x, y
+
+    def get_tiles(self, frame_shape):
+        h, w = frame_shape[:2]
+        stride = self.roi_size * (1 - self.tile_overlap)
+        xs = self.get_tile_starts(w, stride)
+        ys = self.get_tile_starts(h, stride)
+        return [(x, y) for y in ys for x in xs]
+
+    def get_tile_starts(self, length, stride):
+        if length <= self.roi_size:
+            return [0]
+        num_tiles = math.ceil((length - self.roi_size) / stride) + 1
+        return np.linspace(0, length - self.roi_size, num_tiles).round().astype(int).tolist()
\ No newline at end of file
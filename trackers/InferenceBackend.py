@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shutil
+
+
+class InferenceBackend:
+    suffix = ""
+
+    def __init__(self, model_path, imgsz=640, int8=False, half=False, export_dir=None, calibration_data=None):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.half = half
+        self.export_dir = export_dir or os.path.join(os.path.dirname(model_path) or ".", "exports")
+        self.calibration_data = calibration_data
+
+    def load(self):
+        raise NotImplementedError
+
+    def get_cache_key(self):
+        # Exports depend on the weights and on the export settings
+        sha = hashlib.sha256()
+        with open(self.model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+
+        key = f"{sha.hexdigest()[:16]}_{self.imgsz}"
+        if self.int8:
+            key += "_int8"
+        elif self.half:
+            key += "_fp16"
+        return key
+
+    def get_export_path(self):
+        stem = os.path.splitext(os.path.basename(self.model_path))[0]
+        return os.path.join(self.export_dir, f"{stem}_{self.get_cache_key()}{self.suffix}")
+
+    def export(self, export_format, **options):
+        from ultralytics import YOLO
+
+        # ultralytics writes the export next to the weights, move it into the cache
+        exported_path = YOLO(self.model_path).export(format=export_format, imgsz=self.imgsz, **options)
+        cached_path = self.get_export_path()
+        os.makedirs(self.export_dir, exist_ok=True)
+        shutil.move(str(exported_path), cached_path)
+        return cached_path
+
+
+class TorchBackend(InferenceBackend):
+    """Runs the .pt weights with PyTorch through ultralytics."""
+
+    def load(self):
+        from ultralytics import YOLO
+
+        return YOLO(self.model_path)
+
+
+class OnnxBackend(InferenceBackend):
+    """Exports the weights to ONNX once and runs them with ONNX Runtime."""
+
+    suffix = ".onnx"
+
+    def load(self):
+        model_path = self.get_export_path()
+        if not os.path.exists(model_path):
+            model_path = self.export("onnx", dynamic=True, half=self.half and not self.int8)
+            if self.int8:
+                self.quantize(model_path)
+
+        from ultralytics import YOLO
+
+        return YOLO(model_path, task="detect")
+
+    def quantize(self, model_path):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError as e:
+            raise ImportError("INT8 quantization needs onnxruntime: pip install onnxruntime") from e
+
+        float_path = model_path + ".fp32"
+        os.replace(model_path, float_path)
+        try:
+            quantize_dynamic(float_path, model_path, weight_type=QuantType.QUInt8)
+        finally:
+            os.remove(float_path)
+
+
+class OpenVinoBackend(InferenceBackend):
+    """Exports the weights to an OpenVINO IR directory, optionally INT8 quantized."""
+
+    suffix = "_openvino_model"
+
+    def load(self):
+        model_path = self.get_export_path()
+        if not os.path.exists(model_path):
+            options = {"dynamic": True, "int8": self.int8, "half": self.half and not self.int8}
+            if self.int8 and self.calibration_data is not None:
+                options["data"] = self.calibration_data
+            model_path = self.export("openvino", **options)
+
+        from ultralytics import YOLO
+
+        return YOLO(model_path, task="detect")
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend,
+    "openvino": OpenVinoBackend,
+}
+
+
+def load_model(model_path, backend="torch", **options):
+    """Load the detector weights with the given inference backend.
+
+    Every backend returns an ultralytics model, so predict() keeps producing
+    the same Results objects whichever runtime executes the network.
+    ultralytics (and torch) are only imported here, on the first load.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](model_path, **options).load()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+from .ObjectTracker import to_supervision, PropagatedDetections
+from .BallRoiDetector import BallRoiDetector
+
+
+class MotionPropagator:
+    """Moves boxes between consecutive frames with sparse Lucas-Kanade optical flow.
+
+    A small grid of points inside every box is tracked in one
+    calcOpticalFlowPyrLK call and each box is shifted by the median motion
+    of its points. Work is done on a downscaled grayscale copy of the frame.
+    """
+
+    def __init__(self, scale=0.5, grid_size=3):
+        self.scale = scale
+        self.grid_size = grid_size
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+
+    def prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def get_box_points(self, xyxy):
+        # grid_size x grid_size points spread over the inner part of each box
+        steps = (np.arange(self.grid_size) + 0.5) / self.grid_size
+        gx, gy = np.meshgrid(steps, steps)
+        gx, gy = gx.ravel(), gy.ravel()
+
+        x1, y1, x2, y2 = (xyxy[:, i:i+1] * self.scale for i in range(4))
+        points_x = x1 + (x2 - x1) * gx
+        points_y = y1 + (y2 - y1) * gy
+        return np.stack([points_x, points_y], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+
+    def propagate(self, prev_gray, gray, xyxy):
+        """Shift boxes (N, 4) from prev_gray to gray. Boxes whose points are all lost stay put."""
+        if len(xyxy) == 0:
+            return xyxy
+
+        points = self.get_box_points(xyxy)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **self.lk_params)
+
+        points_per_box = self.grid_size * self.grid_size
+        motion = (next_points - points).reshape(len(xyxy), points_per_box, 2) / self.scale
+        found = status.reshape(len(xyxy), points_per_box).astype(bool)
+        motion[~found] = np.nan
+
+        with np.errstate(all="ignore"):
+            shift = np.nanmedian(motion, axis=1)
+        shift = np.nan_to_num(shift)
+
+        h, w = gray.shape[:2]
+        moved = xyxy + np.concatenate([shift, shift], axis=1)
+        moved[:, [0, 2]] = np.clip(moved[:, [0, 2]], 0, w / self.scale)
+        moved[:, [1, 3]] = np.clip(moved[:, [1, 3]], 0, h / self.scale)
+        return moved
+
+    def scene_motion(self, prev_gray, gray):
+        """Mean absolute pixel change between two prepared frames (0-255)."""
+        return float(cv2.absdiff(prev_gray, gray).mean())
+
+
+class KeyframeDetector:
+    """Runs the detector only on keyframes and propagates boxes in between.
+
+    A frame is a keyframe every keyframe_interval frames, or earlier when
+    the scene changed by more than motion_threshold since the last keyframe
+    (camera cuts, fast pans). Other frames get the previous frame's boxes
+    moved with optical flow, so ByteTrack still sees every frame and the
+    output keeps the full frame rate for about 1/keyframe_interval of the
+    inference cost.
+    """
+
+    def __init__(self, detector, keyframe_interval=3, motion_threshold=None, propagator=None):
+        self.detector = detector
+        self.keyframe_interval = keyframe_interval
+        self.motion_threshold = motion_threshold
+        self.propagator = propagator or MotionPropagator()
+
+    def __getattr__(self, name):
+        # Everything else (model, batch_size, predict, ...) comes from the wrapped detector
+        return getattr(self.detector, name)
+
+    def get_settings(self):
+        return dict(
+            self.detector.get_settings(),
+            keyframe_interval=self.keyframe_interval,
+            motion_threshold=self.motion_threshold,
+        )
+
+    def reset(self):
+        self.detector.reset()
+
+    def detect_frames(self, frames):
+        return [detection for _, detection in self.detect_frames_stream(frames)]
+
+    def detect_frames_stream(self, frames, batch_size=None, with_info=False):
+        # A window runs from one keyframe to the frame before the (batch_size+1)th,
+        # so inference stays batched and at most batch_size * keyframe_interval
+        # frames are held at once
+        self.detector.reset()
+        window = []
+        num_keyframes = 0
+        since_keyframe = 0
+        keyframe_gray = None
+        state = {}
+
+        for item in frames:
+            frame = item[0] if with_info else item
+            if batch_size is None:
+                batch_size = self.detector.get_batch_size(frame.shape)
+
+            gray = self.propagator.prepare(frame)
+            is_keyframe = keyframe_gray is None or since_keyframe >= self.keyframe_interval
+            if not is_keyframe and self.motion_threshold is not None:
+                is_keyframe = self.propagator.scene_motion(keyframe_gray, gray) > self.motion_threshold
+
+            if is_keyframe:
+                if num_keyframes == batch_size:
+                    yield from self._process_window(window, state, with_info)
+                    window = []
+                    num_keyframes = 0
+                keyframe_gray = gray
+                since_keyframe = 0
+                num_keyframes += 1
+
+            window.append((item, gray, is_keyframe))
+            since_keyframe += 1
+
+        if window:
+            yield from self._process_window(window, state, with_info)
+
+    def _process_window(self, window, state, with_info):
+        keyframes, gaps = [], []
+        for item, _, is_keyframe in window:
+            # Frames since the previous keyframe, motion_threshold makes them uneven
+            state["gap"] = state.get("gap", 0) + 1
+            if is_keyframe:
+                keyframes.append(item[0] if with_info else item)
+                gaps.append(state["gap"])
+                state["gap"] = 0
+
+        if isinstance(self.detector, BallRoiDetector):
+            # The ball trajectory is extrapolated over the real frame gaps
+            predictions = iter(self.detector.predict(keyframes, gaps))
+        else:
+            predictions = iter(self.detector.predict(keyframes))
+
+        for item, gray, is_keyframe in window:
+            if is_keyframe:
+                detection = next(predictions)
+                detection_supervision, names = to_supervision(detection)
+                state["names"] = names
+                state["detections"] = detection_supervision
+            else:
+                detections = state["detections"][:]
+                detections.xyxy = self.propagator.propagate(state["prev_gray"], gray, state["detections"].xyxy)
+                state["detections"] = detections
+                detection = PropagatedDetections(detections, state["names"])
+
+            state["prev_gray"] = gray
+            if with_info:
+                yield item[0], detection, item[1]
+            else:
+                yield item, detection
@@ -1,13 +1,161 @@
-from ultralytics import YOLO
+import copy
+import threading
+import time
+import numpy as np
+from pipeline import observe_batch
+from .InferenceBackend import load_model
+
+# Rough peak activation memory of a YOLOv5 forward pass per input pixel.
+# Used to turn a memory budget into a batch size without running the model.
+ACTIVATION_BYTES_PER_PIXEL = 256
+
+# Settings that only change how the loaded weights are run, so they can differ per run.
+# threads isn't one: torch's thread count is process-wide, it is set once when the weights are loaded
+RUN_SETTINGS = ("batch_size", "imgsz", "conf", "half", "memory_budget_mb")
 
 class ObjectDetector:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path) 
+    def __init__(self, model_path, batch_size=20, imgsz=None, conf=0.1, half=False, threads=None, memory_budget_mb=None,
+                 backend="torch", int8=False, export_dir=None, calibration_data=None):
+        self.model = load_model(
+            model_path,
+            backend=backend,
+            imgsz=imgsz or 640,
+            int8=int8,
+            half=half,
+            export_dir=export_dir,
+            calibration_data=calibration_data,
+        )
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.batch_size = batch_size
+        self.imgsz = imgsz
+        self.conf = conf
+        self.half = half
+        self.memory_budget_mb = memory_budget_mb
+        # One forward pass at a time, the model object isn't safe to call from several threads
+        self._predict_lock = threading.Lock()
+
+        if threads is not None:
+            # For the whole process, every detector sharing it runs with this many threads
+            import torch
+            torch.set_num_threads(threads)
+
+    def spawn(self, **settings):
+        """A detector sharing these weights (and their predict lock) with its own RUN_SETTINGS."""
+        unknown = set(settings) - set(RUN_SETTINGS)
+        if unknown:
+            raise TypeError(f"Not per-run detector settings: {sorted(unknown)}")
+
+        detector = copy.copy(self)
+        for key, value in settings.items():
+            setattr(detector, key, value)
+        return detector
+
+    def get_settings(self):
+        # Everything that changes what predict() returns
+        return {
+            "backend": self.backend,
+            "imgsz": self.imgsz,
+            "conf": self.conf,
+            "half": self.half,
+            "int8": self.int8,
+        }
+
+    def reset(self):
+        # Nothing is carried between frames, the wrappers' state is reset instead
+        pass
+
+    def predict(self, frames):
+        options = {"conf": self.conf, "half": self.half}
+        if self.imgsz is not None:
+            options["imgsz"] = self.imgsz
+        observe_batch(len(frames))
+        with self._predict_lock:
+            return self.model.predict(frames, **options)
+
+    def warmup(self, frame_shape=(720, 1280, 3)):
+        """Run one prediction on a blank frame so the first real batch doesn't pay for model setup."""
+        self.predict([np.zeros(frame_shape, dtype=np.uint8)])
 
     def detect_frames(self, frames):
-        batch_size=20 
-        detections = [] 
-        for i in range(0,len(frames),batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.1)
-            detections += detections_batch
-        return detections
\ No newline at end of file
+        return [detection for _, detection in self.detect_frames_stream(frames)]
+
+    def detect_frames_stream(self, frames, batch_size=None, with_info=False):
+        # Only one batch of frames is held in memory at a time. With with_info,
+        # frames are (frame, frame_info) pairs and the info is passed through.
+        batch = []
+        for item in frames:
+            frame = item[0] if with_info else item
+            if batch_size is None:
+                batch_size = self.get_batch_size(frame.shape)
+
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield from self._detect_batch(batch, with_info)
+                batch = []
+
+        if batch:
+            yield from self._detect_batch(batch, with_info)
+
+    def _detect_batch(self, batch, with_info):
+        if not with_info:
+            return zip(batch, self.predict(batch))
+
+        frames = [frame for frame, _ in batch]
+        return ((frame, detection, frame_info)
+                for (frame, frame_info), detection in zip(batch, self.predict(frames)))
+
+    def get_batch_size(self, frame_shape):
+        if self.memory_budget_mb is None:
+            return self.batch_size
+        return max(1, min(self.batch_size, self.max_batch_for_budget(frame_shape)))
+
+    def estimate_frame_memory(self, frame_shape):
+        h, w = frame_shape[:2]
+        size = self.imgsz or 640
+        input_h, input_w = (size, size) if isinstance(size, int) else size
+        bytes_per_value = 2 if self.half else 4
+
+        frame_bytes = h * w * 3
+        tensor_bytes = 3 * input_h * input_w * bytes_per_value
+        activation_bytes = input_h * input_w * ACTIVATION_BYTES_PER_PIXEL
+        return frame_bytes + tensor_bytes + activation_bytes
+
+    def max_batch_for_budget(self, frame_shape):
+        budget_bytes = self.memory_budget_mb * 1024 * 1024
+        return int(budget_bytes // self.estimate_frame_memory(frame_shape))
+
+    def tune_batch_size(self, sample_frames, candidates=(1, 2, 4, 8, 16, 32, 64), repeats=2):
+        """Time predict() for each candidate batch size and keep the fastest.
+
+        Candidates above the memory budget are skipped. The sample frames are
+        repeated as needed to fill a batch. Returns the chosen batch size.
+        """
+        sample_frames = list(sample_frames)
+        if not sample_frames:
+            return self.batch_size
+
+        limit = max(candidates)
+        if self.memory_budget_mb is not None:
+            limit = max(1, self.max_batch_for_budget(sample_frames[0].shape))
+
+        # Warm up so the first timed batch doesn't pay for model setup
+        self.predict(sample_frames[:1])
+
+        best_batch_size, best_time = self.batch_size, None
+        for batch_size in candidates:
+            if batch_size > limit:
+                continue
+            batch = [sample_frames[i % len(sample_frames)] for i in range(batch_size)]
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                self.predict(batch)
+            time_per_frame = (time.perf_counter() - start) / (repeats * batch_size)
+
+            if best_time is None or time_per_frame < best_time:
+                best_batch_size, best_time = batch_size, time_per_frame
+
+        self.batch_size = best_batch_size
+        return best_batch_size
\ No newline at end of file
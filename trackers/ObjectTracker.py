@@ -1,51 +1,113 @@
-import supervision as sv
+import os
+import numpy as np
+from .TrackStore import TrackStore, CLASS_IDS
+
+def to_supervision(detection):
+    """Convert a detector result to sv.Detections with goalkeepers counted as players.
+
+    Returns (detection_supervision, cls_names). Detections that are already
+    in supervision format (PropagatedDetections) are passed through.
+    """
+    if hasattr(detection, "detections"):
+        return detection.detections, detection.names
+
+    import supervision as sv
+
+    cls_names = detection.names
+    cls_names_inv = {v:k for k,v in cls_names.items()}
+
+    # Covert to supervision Detection format
+    detection_supervision = sv.Detections.from_ultralytics(detection)
+
+    # Convert GoalKeeper to player object
+    for object_ind , class_id in enumerate(detection_supervision.class_id):
+        if cls_names[class_id] == "goalkeeper":
+            detection_supervision.class_id[object_ind] = cls_names_inv["player"]
+
+    return detection_supervision, cls_names
+
+
+class PropagatedDetections:
+    """Boxes moved forward from the last keyframe instead of predicted by the model."""
+
+    def __init__(self, detections, names):
+        self.detections = detections
+        self.names = names
+
 
 class ObjectTracker:
     def __init__(self):
+        # supervision is slow to import, wait until a tracker is actually built
+        import supervision as sv
+
         self.tracker = sv.ByteTrack()
 
     def get_object_tracks(self, frames, detections, read_from_stub=False, stub_path=None):
-        tracks={
-            "players":[],
-            "referees":[],
-            "ball":[]
-        }
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            return TrackStore.load(stub_path)
+
+        tracks = TrackStore()
 
         for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            cls_names_inv = {v:k for k,v in cls_names.items()}
-
-            # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
-
-            # Convert GoalKeeper to player object
-            for object_ind , class_id in enumerate(detection_supervision.class_id):
-                if cls_names[class_id] == "goalkeeper":
-                    detection_supervision.class_id[object_ind] = cls_names_inv["player"]
-
-            # Track Objects
-            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
-
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
-
-            for frame_detection in detection_with_tracks:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                track_id = frame_detection[4]
-
-                if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox":bbox}
-                
-                if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox":bbox}
+            detection_with_tracks, detection_supervision, cls_names_inv = self.update(detection)
+
+            # Tracked players and referees
+            class_map = {cls_names_inv['player']: CLASS_IDS["players"], cls_names_inv['referee']: CLASS_IDS["referees"]}
+            is_tracked = np.isin(detection_with_tracks.class_id, list(class_map))
+            if detection_with_tracks.tracker_id is not None and is_tracked.any():
+                tracks.append_frame(
+                    frame_num,
+                    [class_map[cls_id] for cls_id in detection_with_tracks.class_id[is_tracked]],
+                    detection_with_tracks.tracker_id[is_tracked],
+                    detection_with_tracks.xyxy[is_tracked],
+                )
+
+            # Ball keeps the last detection of the frame under track id 1
+            is_ball = detection_supervision.class_id == cls_names_inv['ball']
+            if is_ball.any():
+                tracks.append(frame_num, 1, CLASS_IDS["ball"], detection_supervision.xyxy[is_ball][-1])
+
+            tracks.num_frames = frame_num + 1
+
+        if stub_path is not None:
+            tracks.save(stub_path)
+
+        return tracks
+
+    def update(self, detection):
+        detection_supervision, cls_names = to_supervision(detection)
+        cls_names_inv = {v:k for k,v in cls_names.items()}
+
+        # Track Objects
+        detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+
+        return detection_with_tracks, detection_supervision, cls_names_inv
+
+    def track_frame(self, detection):
+        detection_with_tracks, detection_supervision, cls_names_inv = self.update(detection)
+
+        frame_tracks={
+            "players":{},
+            "referees":{},
+            "ball":{}
+        }
+
+        for frame_detection in detection_with_tracks:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            track_id = frame_detection[4]
+
+            if cls_id == cls_names_inv['player']:
+                frame_tracks["players"][track_id] = {"bbox":bbox}
             
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
+            if cls_id == cls_names_inv['referee']:
+                frame_tracks["referees"][track_id] = {"bbox":bbox}
+        
+        for frame_detection in detection_supervision:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
 
-                if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox":bbox}
+            if cls_id == cls_names_inv['ball']:
+                frame_tracks["ball"][1] = {"bbox":bbox}
 
-        return tracks
\ No newline at end of file
+        return frame_tracks
\ No newline at end of file
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+from .TrackStore import TrackStore
+
+CACHE_VERSION = 1
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class TrackCache:
+    """Content-addressed on-disk cache of object tracks.
+
+    Entries are keyed by the video contents, the model weights and every
+    setting that changes detection or tracking, so a rerun of the same match
+    with different drawing or team settings skips inference entirely. Tracks
+    are stored as .npy files that are memory-mapped on load. When the cache
+    grows past max_size_mb the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir="cache/tracks", max_size_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self._weights_hashes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_weights_hash(self, model_path):
+        # Weights rarely change, only rehash when the file does
+        stat = os.stat(model_path)
+        cache_key = (model_path, stat.st_mtime, stat.st_size)
+        if cache_key not in self._weights_hashes:
+            self._weights_hashes[cache_key] = file_hash(model_path)
+        return self._weights_hashes[cache_key]
+
+    def make_key(self, video_path, model_path, settings):
+        key = {
+            "version": CACHE_VERSION,
+            "video": file_hash(video_path),
+            "weights": self.get_weights_hash(model_path),
+            "settings": settings,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        return TrackStore.load(path)
+
+    def put(self, key, tracks):
+        tracks.save(self.get_path(key))
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy") or name.endswith(".tmp.npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                size = stat.st_size + os.path.getsize(path + ".json")
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, size, path))
+        return entries
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        max_bytes = self.max_size_mb * 1024 * 1024
+
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            for entry_path in (path, path + ".json"):
+                if os.path.exists(entry_path):
+                    os.remove(entry_path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            for entry_path in (path, path + ".json"):
+                if os.path.exists(entry_path):
+                    os.remove(entry_path)
\ No newline at end of file
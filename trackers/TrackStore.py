@@ -0,0 +1,405 @@
+import json
+import os
+import numpy as np
+
+TRACK_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("track_id", np.int32),
+    ("cls", np.int8),
+    ("bbox", np.float32, 4),
+    ("team", np.int8),
+    ("has_ball", np.bool_),
+])
+
+CLASS_IDS = {"players": 0, "referees": 1, "ball": 2}
+
+NO_TEAM = 0
+
+# Frame rate assumed for stores without frame info
+DEFAULT_FPS = 30
+
+
+class TrackStore:
+    """Columnar store of every tracked object in a clip.
+
+    One row per (frame, object) in a NumPy structured array, kept sorted by
+    frame. Rows can be looked up by frame or by track id, and store["players"]
+    etc. return a view that behaves like the old list of per-frame dicts, so
+    callers written against tracks["players"][frame][track_id]["bbox"] keep
+    working.
+    """
+
+    def __init__(self, num_frames=0, capacity=1024):
+        self._data = np.zeros(capacity, dtype=TRACK_DTYPE)
+        self._size = 0
+        self.num_frames = num_frames
+        self.team_colors = {}
+        self.fps = None
+        self.source_index = None
+        self.timestamps = None
+        self._frame_offsets = None
+        self._track_order = None
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        store = cls()
+        for name, class_id in CLASS_IDS.items():
+            for frame_num, frame_dict in enumerate(tracks.get(name, [])):
+                store.num_frames = max(store.num_frames, frame_num + 1)
+                for track_id, track in frame_dict.items():
+                    store.append(frame_num, track_id, class_id, track["bbox"],
+                                 team=track.get("team", NO_TEAM), has_ball=track.get("has_ball", False))
+                    if "team_color" in track:
+                        store.team_colors[track["team"]] = track["team_color"]
+        store._sort()
+        return store
+
+    @classmethod
+    def from_data(cls, data, num_frames=None):
+        """Wrap an array of TRACK_DTYPE rows in any frame order."""
+        store = cls(capacity=0)
+        store._data = np.asarray(data, dtype=TRACK_DTYPE)
+        store._size = len(store._data)
+        if num_frames is None:
+            num_frames = int(store._data["frame"].max()) + 1 if store._size else 0
+        store.num_frames = num_frames
+        store._sort()
+        return store
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a store written by save(). With mmap the rows stay on disk and
+        are paged in on access; writes go to private copy-on-write pages."""
+        data = np.load(path, mmap_mode="c" if mmap else None)
+        with open(path + ".json") as f:
+            meta = json.load(f)
+
+        store = cls(num_frames=meta["num_frames"], capacity=0)
+        store._data = data
+        store._size = len(data)
+        store.team_colors = {int(team): color for team, color in meta["team_colors"].items()}
+        if meta.get("timestamps") is not None:
+            store.fps = meta["fps"]
+            store.source_index = np.array(meta["source_index"], dtype=np.int64)
+            store.timestamps = np.array(meta["timestamps"], dtype=np.float64)
+        return store
+
+    def save(self, path):
+        # Write to temporary names first so a crash never leaves a half-written store
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, self.data)
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({
+                "num_frames": self.num_frames,
+                "team_colors": {str(team): np.asarray(color).tolist() for team, color in self.team_colors.items()},
+                "fps": self.fps,
+                "source_index": None if self.source_index is None else self.source_index.tolist(),
+                "timestamps": None if self.timestamps is None else self.timestamps.tolist(),
+            }, f)
+        os.replace(path + ".json.tmp", path + ".json")
+        os.replace(tmp_path, path)
+
+    @property
+    def data(self):
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._data):
+            return
+        capacity = max(needed, 2 * len(self._data))
+        data = np.zeros(capacity, dtype=TRACK_DTYPE)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def _invalidate(self):
+        self._frame_offsets = None
+        self._track_order = None
+
+    def append(self, frame_num, track_id, class_id, bbox, team=NO_TEAM, has_ball=False):
+        self._reserve(1)
+        self._data[self._size] = (frame_num, track_id, class_id, bbox, team, has_ball)
+        self._size += 1
+        self.num_frames = max(self.num_frames, frame_num + 1)
+        self._invalidate()
+
+    def append_tracks(self, frame_num, frame_tracks):
+        """Append one frame in the {"players": {...}, "referees": {...}, "ball": {...}} layout."""
+        for name, class_id in CLASS_IDS.items():
+            for track_id, track in frame_tracks.get(name, {}).items():
+                self.append(frame_num, track_id, class_id, track["bbox"],
+                            team=track.get("team", NO_TEAM), has_ball=track.get("has_ball", False))
+                if "team_color" in track:
+                    self.team_colors[track["team"]] = track["team_color"]
+        self.num_frames = max(self.num_frames, frame_num + 1)
+
+    def append_frame(self, frame_num, class_ids, track_ids, bboxes):
+        """Append all objects of one frame from parallel arrays."""
+        count = len(track_ids)
+        self._reserve(count)
+        rows = self._data[self._size:self._size + count]
+        rows["frame"] = frame_num
+        rows["track_id"] = track_ids
+        rows["cls"] = class_ids
+        rows["bbox"] = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        rows["team"] = NO_TEAM
+        rows["has_ball"] = False
+        self._size += count
+        self.num_frames = max(self.num_frames, frame_num + 1)
+        self._invalidate()
+
+    def _sort(self):
+        order = np.argsort(self.data["frame"], kind="stable")
+        self._data[:self._size] = self.data[order]
+        self._invalidate()
+
+    def set_frame_info(self, frame_infos, fps):
+        """Record where each frame came from in the source and the output frame rate."""
+        self.source_index = np.array([frame_info.index for frame_info in frame_infos], dtype=np.int64)
+        self.timestamps = np.array([frame_info.timestamp for frame_info in frame_infos], dtype=np.float64)
+        self.fps = fps
+
+    def frame_at(self, timestamp):
+        """Index of the last frame shown at timestamp (seconds in the source).
+
+        Without recorded timestamps, frames are assumed to be fps apart from 0.
+        """
+        if self.timestamps is None:
+            frame_num = int(timestamp * (self.fps or DEFAULT_FPS))
+            return min(max(frame_num, 0), max(self.num_frames - 1, 0))
+        return max(int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1, 0)
+
+    # Index lookups
+
+    def frame_slice(self, frame_num):
+        if self._frame_offsets is None:
+            self._frame_offsets = np.searchsorted(self.data["frame"], np.arange(self.num_frames + 1))
+        return slice(self._frame_offsets[frame_num], self._frame_offsets[frame_num + 1])
+
+    def frame_indices(self, frame_num, cls=None):
+        """Row indices of one frame, optionally of one class only."""
+        frame_slice = self.frame_slice(frame_num)
+        if cls is None:
+            return np.arange(frame_slice.start, frame_slice.stop)
+        return frame_slice.start + np.flatnonzero(self._data["cls"][frame_slice] == CLASS_IDS[cls])
+
+    def frame_rows(self, frame_num, cls=None):
+        rows = self.data[self.frame_slice(frame_num)]
+        if cls is not None:
+            rows = rows[rows["cls"] == CLASS_IDS[cls]]
+        return rows
+
+    def track_indices(self, track_id, cls="players"):
+        """Row indices of one track, in frame order."""
+        if self._track_order is None:
+            self._track_order = np.lexsort((self.data["frame"], self.data["track_id"], self.data["cls"]))
+        keys = self.data[self._track_order]
+        class_id = CLASS_IDS[cls]
+        start = np.searchsorted(keys["cls"], class_id, side="left")
+        end = np.searchsorted(keys["cls"], class_id, side="right")
+        track_ids = keys["track_id"][start:end]
+        lo = start + np.searchsorted(track_ids, track_id, side="left")
+        hi = start + np.searchsorted(track_ids, track_id, side="right")
+        return self._track_order[lo:hi]
+
+    def track_rows(self, track_id, cls="players"):
+        return self.data[self.track_indices(track_id, cls)]
+
+    def class_mask(self, cls):
+        return self.data["cls"] == CLASS_IDS[cls]
+
+    def track_ids(self, cls="players"):
+        return np.unique(self.data["track_id"][self.class_mask(cls)])
+
+    # Column helpers
+
+    def set_teams(self, team_by_track, rows=None):
+        """Write the team column for every player row (or only rows) from a {track_id: team} mapping."""
+        if not team_by_track:
+            return
+        track_ids = np.fromiter(team_by_track.keys(), dtype=np.int64)
+        teams = np.fromiter(team_by_track.values(), dtype=np.int64)
+        order = np.argsort(track_ids)
+        track_ids, teams = track_ids[order], teams[order]
+
+        player_rows = np.flatnonzero(self.class_mask("players")) if rows is None else np.asarray(rows, dtype=np.int64)
+        row_track_ids = self._data["track_id"][player_rows]
+        pos = np.clip(np.searchsorted(track_ids, row_track_ids), 0, len(track_ids) - 1)
+        known = track_ids[pos] == row_track_ids
+        self._data["team"][player_rows[known]] = teams[pos[known]]
+
+    def carry_teams(self, step, team_by_track=None):
+        """Fill player rows without a team from the same track on the last assigned frame.
+
+        Teams are assigned on every step-th frame; rows whose track was not
+        assigned there fall back to team_by_track.
+        """
+        players = np.flatnonzero(self.class_mask("players"))
+        frames = self._data["frame"][players].astype(np.int64)
+        keys = self._data["track_id"][players].astype(np.int64) * (self.num_frames + 1)
+        teams = self._data["team"][players]
+
+        # (track, frame) keys of the assigned rows, sorted for lookup
+        assigned = (frames % step == 0) & (teams != NO_TEAM)
+        source_keys = (keys + frames)[assigned]
+        order = np.argsort(source_keys)
+        source_keys, source_teams = source_keys[order], teams[assigned][order]
+
+        todo = teams == NO_TEAM
+        rows = players[todo]
+        if not len(rows):
+            return
+        found = np.zeros(len(rows), dtype=bool)
+        if len(source_keys):
+            wanted = keys[todo] + frames[todo] - frames[todo] % step
+            pos = np.clip(np.searchsorted(source_keys, wanted), 0, len(source_keys) - 1)
+            found = source_keys[pos] == wanted
+            self._data["team"][rows[found]] = source_teams[pos[found]]
+        self.set_teams(team_by_track, rows[~found])
+
+    def set_ball_holders(self, rows):
+        """Set has_ball on the given rows and clear it on every other row."""
+        self._data["has_ball"][:self._size] = False
+        self._data["has_ball"][np.asarray(rows, dtype=np.int64)] = True
+
+    def ball_bboxes(self):
+        """(num_frames, 4) array of ball boxes, NaN where the ball is missing."""
+        bboxes = np.full((self.num_frames, 4), np.nan, dtype=np.float32)
+        ball = self.data[self.class_mask("ball")]
+        bboxes[ball["frame"]] = ball["bbox"]
+        return bboxes
+
+    def set_ball_bboxes(self, bboxes):
+        """Replace every ball row with one per frame that has a finite box."""
+        bboxes = np.asarray(bboxes, dtype=np.float32)
+        keep = ~self.class_mask("ball")
+        data = self.data[keep].copy()
+
+        frames = np.flatnonzero(np.isfinite(bboxes).all(axis=1))
+        ball = np.zeros(len(frames), dtype=TRACK_DTYPE)
+        ball["frame"] = frames
+        ball["track_id"] = 1
+        ball["cls"] = CLASS_IDS["ball"]
+        ball["bbox"] = bboxes[frames]
+
+        self._data = np.concatenate([data, ball])
+        self._size = len(self._data)
+        self.num_frames = max(self.num_frames, len(bboxes))
+        self._sort()
+
+    # Compatibility with the list-of-dicts layout
+
+    def __contains__(self, cls):
+        return cls in CLASS_IDS
+
+    def __getitem__(self, cls):
+        if cls not in CLASS_IDS:
+            raise KeyError(cls)
+        return TrackClassView(self, cls)
+
+    def __setitem__(self, cls, frames):
+        if cls != "ball":
+            raise KeyError(f"Only ball tracks can be replaced, got '{cls}'")
+        bboxes = np.full((len(frames), 4), np.nan, dtype=np.float32)
+        for frame_num, ball_dict in enumerate(frames):
+            bbox = ball_dict.get(1, {}).get("bbox", [])
+            if len(bbox) == 4:
+                bboxes[frame_num] = bbox
+        self.set_ball_bboxes(bboxes)
+
+    def to_tracks(self):
+        return {
+            cls: [{track_id: dict(entry) for track_id, entry in frame.items()} for frame in self[cls]]
+            for cls in CLASS_IDS
+        }
+
+
+class TrackClassView:
+    """Looks like tracks[cls]: a list with one {track_id: track} dict per frame."""
+
+    def __init__(self, store, cls):
+        self.store = store
+        self.cls = cls
+
+    def __len__(self):
+        return self.store.num_frames
+
+    def __getitem__(self, frame_num):
+        if frame_num < 0:
+            frame_num += len(self)
+        if not 0 <= frame_num < len(self):
+            raise IndexError(frame_num)
+
+        frame_slice = self.store.frame_slice(frame_num)
+        class_id = CLASS_IDS[self.cls]
+        return {
+            int(self.store._data["track_id"][row]): TrackEntry(self.store, row)
+            for row in range(frame_slice.start, frame_slice.stop)
+            if self.store._data["cls"][row] == class_id
+        }
+
+    def __iter__(self):
+        for frame_num in range(len(self)):
+            yield self[frame_num]
+
+
+class TrackEntry:
+    """Looks like a {"bbox": ..., "team": ..., "has_ball": ...} dict, backed by one store row."""
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def _row(self):
+        return self.store._data[self.row]
+
+    def keys(self):
+        row = self._row()
+        keys = ["bbox"]
+        if row["team"] != NO_TEAM:
+            keys.append("team")
+            if int(row["team"]) in self.store.team_colors:
+                keys.append("team_color")
+        if row["has_ball"]:
+            keys.append("has_ball")
+        return keys
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __getitem__(self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+        row = self._row()
+        if key == "bbox":
+            return row["bbox"].tolist()
+        if key == "team":
+            return int(row["team"])
+        if key == "team_color":
+            return self.store.team_colors[int(row["team"])]
+        return bool(row["has_ball"])
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        if key == "bbox":
+            self.store._data["bbox"][self.row] = value
+        elif key == "team":
+            self.store._data["team"][self.row] = value
+        elif key == "team_color":
+            team = int(self.store._data["team"][self.row])
+            self.store.team_colors[team] = value
+        elif key == "has_ball":
+            self.store._data["has_ball"][self.row] = value
+        else:
+            raise KeyError(key)
@@ -1,2 +1,4 @@
 #exposes the public the classes and faunctions outside the trackers folder
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .TrackStore import TrackStore
+from .TrackCache import TrackCache
\ No newline at end of file
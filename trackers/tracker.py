@@ -1,20 +1,88 @@
 from .AnnotationDrawer import AnnotationDrawer
-from.ObjectDetector import ObjectDetector
+from.ObjectDetector import ObjectDetector, RUN_SETTINGS
+from .KeyframeDetector import KeyframeDetector
+from .BallRoiDetector import BallRoiDetector
 from .ObjectTracker import ObjectTracker
-import pandas as pd
+from .TrackStore import TrackStore
+from .BallInterpolator import BallInterpolator
+import os
+import numpy as np
 
 class Tracker:
-    def __init__(self, model_path):
-        self.detector = ObjectDetector(model_path)
+    def __init__(self, model_path, keyframe_interval=1, motion_threshold=None, ball_roi=False, ball_roi_size=None,
+                 ball_max_gap=25, ball_fill="linear", ball_max_speed=80, base_detector=None, **detector_options):
+        # Kept so worker processes can build an identical tracker
+        self.model_path = model_path
+        self.options = dict(
+            detector_options,
+            keyframe_interval=keyframe_interval,
+            motion_threshold=motion_threshold,
+            ball_roi=ball_roi,
+            ball_roi_size=ball_roi_size,
+            ball_max_gap=ball_max_gap,
+            ball_fill=ball_fill,
+            ball_max_speed=ball_max_speed,
+        )
+
+        # An existing ObjectDetector can be passed in to share its weights
+        self.base_detector = base_detector or ObjectDetector(model_path, **detector_options)
+        self.detector = self.base_detector
+        if ball_roi:
+            # Look for the ball in a full-resolution crop instead of the downscaled frame
+            self.detector = BallRoiDetector(self.detector, ball_roi_size)
+        if keyframe_interval > 1:
+            # Detect on keyframes only and propagate boxes with optical flow in between
+            self.detector = KeyframeDetector(self.detector, keyframe_interval, motion_threshold)
         self.tracker = ObjectTracker()
         self.drawer = AnnotationDrawer()
+        self.ball_interpolator = BallInterpolator(ball_max_gap, ball_fill, ball_max_speed)
+
+    def reset(self):
+        # Forget tracks (and the detector's ball trajectory) of the previous video so ids start over
+        self.tracker.tracker.reset()
+        self.detector.reset()
+
+    def spawn(self, **options):
+        """A tracker with the same model weights but its own tracking and drawing state.
+
+        options replace this tracker's. Detector RUN_SETTINGS apply to the new
+        tracker only; backend and int8 need other weights and can't change,
+        and threads stays what the process was set to when the weights loaded.
+        """
+        options = dict(self.options, **options)
+        weights = (options.get("backend", "torch"), options.get("int8", False))
+        if weights != (self.base_detector.backend, self.base_detector.int8):
+            raise ValueError(f"❌ backend/int8 {weights} need their own weights, load another tracker for them")
+
+        detector = self.base_detector.spawn(**{key: options[key] for key in RUN_SETTINGS if key in options})
+        return Tracker(self.model_path, base_detector=detector, **options)
+
+    def tune_batch_size(self, sample_frames):
+        """Time the detector on sample_frames and keep its fastest batch size, also for trackers spawned from this one."""
+        self.options["batch_size"] = self.base_detector.tune_batch_size(sample_frames)
+        return self.options["batch_size"]
 
     def detect_frames(self, frames):
         return self.detector.detect_frames(frames)
 
-    def get_object_tracks(self, frames):
+    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None):
+        # A stub skips inference entirely, frames are only needed on a miss
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            return TrackStore.load(stub_path)
+
         detections = self.detect_frames(frames)
-        return self.tracker.get_object_tracks(frames, detections)
+        return self.tracker.get_object_tracks(frames, detections, stub_path=stub_path)
+
+    def iter_object_tracks(self, frames, batch_size=None, with_info=False):
+        return self.track_detections(self.detector.detect_frames_stream(frames, batch_size, with_info))
+
+    def track_detections(self, frame_detections):
+        # Items are (frame, detection) or (frame, detection, frame_info)
+        for frame, detection, *frame_info in frame_detections:
+            frame_tracks = self.tracker.track_frame(detection)
+            if frame_info:
+                frame_tracks["frame_info"] = frame_info[0]
+            yield frame, frame_tracks
     
     def draw_ellipse(self,frame,bbox,color,track_id=None):
         return self.drawer.draw_ellipse(frame,bbox,color,track_id)
@@ -25,15 +93,34 @@ class Tracker:
     def draw_annotations(self,video_frames, tracks,team_ball_control):
         return self.drawer.draw_annotations(video_frames, tracks,team_ball_control)
 
+    def draw_frame(self,frame,player_dict,ball_dict,referee_dict):
+        return self.drawer.draw_frame(frame,player_dict,ball_dict,referee_dict)
+
+    def draw_ball_control_panel(self,frame,team_1_num_frames,team_2_num_frames):
+        return self.drawer.draw_ball_control_panel(frame,team_1_num_frames,team_2_num_frames)
+
 
     def interpolate_ball_positions(self, ball_positions):
         ball_positions = [x.get(1, {}).get("bbox", []) for x in ball_positions]
+        bboxes = np.array([bbox if len(bbox) == 4 else [np.nan] * 4 for bbox in ball_positions], dtype=np.float64)
+
+        bboxes = self.ball_interpolator.fill(bboxes.reshape(-1, 4))
 
-        df_ball_positions = pd.DataFrame(ball_positions)
+        return [{1: {"bbox": bbox.tolist()}} if np.isfinite(bbox).all() else {} for bbox in bboxes]
 
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill()
+    def interpolate_ball_tracks(self, tracks):
+        """interpolate_ball_positions on a TrackStore, without building per-frame dicts."""
+        tracks.set_ball_bboxes(self.ball_interpolator.fill(tracks.ball_bboxes()))
 
-        ball_positions = [{1:{"bbox":x}} for x in df_ball_positions.to_numpy().tolist()]
+    def interpolate_ball_stream(self, frame_tracks, max_buffer=None):
+        """Streaming counterpart of interpolate_ball_positions.
 
-        return ball_positions
\ No newline at end of file
+        Consumes (frame, frame_tracks) pairs and yields them in order with
+        false ball detections dropped and short gaps filled. max_buffer
+        overrides the tracker's ball_max_gap, and with it how many frames
+        can be held back.
+        """
+        interpolator = self.ball_interpolator
+        if max_buffer is not None and max_buffer != interpolator.max_gap:
+            interpolator = BallInterpolator(max_buffer, interpolator.method, interpolator.max_speed)
+        return interpolator.interpolate_stream(frame_tracks)
\ No newline at end of file
@@ -1,2 +1,4 @@
-from .video_utils import read_video,  frames_to_video_bytes, process_video
-from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position
\ No newline at end of file
+from .video_utils import read_video,  frames_to_video_bytes, process_video, iter_video, write_video, process_video_stream, process_video_concurrent, get_team_ball_control, open_video_source, get_video_info, get_output_fps, estimate_frame_count, report_progress, FrameInfo, tune_batch_size
+from .video_encoding import FFmpegVideoWriter, encode_video_chunks, has_ffmpeg
+from .video_sharding import process_video_sharded
+from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position,get_foot_positions
\ No newline at end of file
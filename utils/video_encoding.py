@@ -0,0 +1,111 @@
+import os
+import shutil
+import subprocess
+import threading
+import numpy as np
+
+
+def get_ffmpeg_binary():
+    return os.environ.get("FFMPEG_BINARY") or shutil.which("ffmpeg")
+
+
+def has_ffmpeg():
+    return get_ffmpeg_binary() is not None
+
+
+class FFmpegVideoWriter:
+    """Encodes BGR frames by piping them into an ffmpeg process.
+
+    output may be a file path, any object with a write() method (pipe,
+    socket file, BytesIO...) or None to read the encoded stream from
+    self.process.stdout. Non-path outputs get fragmented MP4 so the stream
+    can be written front to back without seeking.
+    """
+
+    def __init__(self, output, fps, width, height, codec="libx264", crf=23, preset="veryfast", pix_fmt="yuv420p"):
+        binary = get_ffmpeg_binary()
+        if binary is None:
+            raise IOError("❌ ffmpeg was not found, install it or set FFMPEG_BINARY")
+
+        command = [
+            binary, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+            # yuv420p needs even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", codec, "-pix_fmt", pix_fmt,
+        ]
+        if crf is not None:
+            command += ["-crf", str(crf)]
+        if preset is not None:
+            command += ["-preset", preset]
+
+        if isinstance(output, (str, os.PathLike)):
+            command += ["-movflags", "+faststart", os.fspath(output)]
+            stdout = subprocess.DEVNULL
+        else:
+            command += ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
+            stdout = subprocess.PIPE
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=stdout)
+        self._pump = None
+        if output is not None and stdout == subprocess.PIPE:
+            self._pump = threading.Thread(target=self._copy_output, args=(output,), daemon=True)
+            self._pump.start()
+
+    def _copy_output(self, output, chunk_size=1 << 16):
+        for chunk in iter(lambda: self.process.stdout.read(chunk_size), b""):
+            output.write(chunk)
+
+    def isOpened(self):
+        return self.process.poll() is None
+
+    def write(self, frame):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        self.process.stdin.write(memoryview(frame).cast("B"))
+
+    def release(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            self.process.stdin.close()
+        if self._pump is not None:
+            self._pump.join()
+        if self.process.wait() != 0:
+            raise IOError(f"❌ ffmpeg exited with code {self.process.returncode}")
+
+
+def encode_video_chunks(frames, fps=30, chunk_size=1 << 16, **encoder_options):
+    """Yield an MP4 stream as byte chunks while frames are still being produced."""
+    frames = iter(frames)
+    first_frame = next(frames, None)
+    if first_frame is None:
+        return
+
+    height, width = first_frame.shape[:2]
+    writer = FFmpegVideoWriter(None, fps, width, height, **encoder_options)
+    errors = []
+
+    def feed():
+        try:
+            writer.write(first_frame)
+            for frame in frames:
+                writer.write(frame)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            writer.process.stdin.close()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        for chunk in iter(lambda: writer.process.stdout.read(chunk_size), b""):
+            yield chunk
+    finally:
+        if writer.process.poll() is None and feeder.is_alive():
+            writer.process.kill()
+        feeder.join()
+        writer.process.wait()
+
+    if errors and not isinstance(errors[0], BrokenPipeError):
+        raise errors[0]
+    if writer.process.returncode != 0:
+        raise IOError(f"❌ ffmpeg exited with code {writer.process.returncode}")
@@ -0,0 +1,310 @@
+import math
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from pipeline import NullMetrics
+from .video_utils import get_video_info, read_video, open_video_source, get_team_ball_control
+
+
+# Tracker of the current worker process, built once by _init_worker
+_worker_tracker = None
+
+
+def _init_worker(model_path, tracker_options):
+    global _worker_tracker
+    # Imported here because trackers itself imports utils
+    from trackers import Tracker
+
+    cv2.setNumThreads(1)
+    _worker_tracker = Tracker(model_path, **tracker_options)
+
+
+def plan_segments(start_frame, end_frame, skip_frames, num_segments, overlap_frames):
+    """Split [start_frame, end_frame) into num_segments (start, stop) ranges of source frames.
+
+    Every range starts on the skip_frames grid of start_frame and reaches
+    overlap_frames into the next one so tracks can be stitched there.
+    """
+    total = end_frame - start_frame
+    overlap_frames = int(math.ceil(overlap_frames / skip_frames)) * skip_frames
+    length = max(int(math.ceil(total / num_segments / skip_frames)) * skip_frames, 2 * overlap_frames + skip_frames)
+
+    segments = []
+    for start in range(start_frame, end_frame, length):
+        segments.append((start, min(start + length + overlap_frames, end_frame)))
+    return segments
+
+
+def get_track_colors(frames, tracks, color_extractor, sample_every=5):
+    """Median jersey color of every player and referee track, from every nth frame."""
+    from trackers.TrackStore import CLASS_IDS
+
+    crops, track_ids = [], []
+    for frame_num in range(0, len(frames), sample_every):
+        rows = tracks.frame_rows(frame_num)
+        rows = rows[rows["cls"] != CLASS_IDS["ball"]]
+        for row in rows:
+            crops.append(color_extractor.get_crop(frames[frame_num], row["bbox"]))
+            track_ids.append(int(row["track_id"]))
+
+    if not crops:
+        return {}
+    colors = color_extractor.get_crop_colors(crops)
+    track_ids = np.array(track_ids)
+
+    track_colors = {}
+    for track_id in np.unique(track_ids):
+        samples = colors[track_ids == track_id]
+        samples = samples[~np.isnan(samples).any(axis=1)]
+        if len(samples):
+            track_colors[int(track_id)] = np.median(samples, axis=0)
+    return track_colors
+
+
+def _track_segment(args):
+    video_path, start, stop, skip_frames, resize_width, fps = args
+    from TeamAssigner.ColorExtractor import ColorExtractor
+
+    frames, frame_infos = read_video(
+        video_path,
+        max_frames=int(math.ceil((stop - start) / skip_frames)),
+        skip_frames=skip_frames,
+        resize_width=resize_width,
+        start_time=start / fps,
+        return_info=True,
+    )
+    if not frames:
+        return None
+
+    # Each segment starts from a fresh ByteTrack
+    _worker_tracker.reset()
+    tracks = _worker_tracker.get_object_tracks(frames)
+
+    return {
+        "data": np.array(tracks.data),
+        "frame_infos": frame_infos,
+        "track_colors": get_track_colors(frames, tracks, ColorExtractor()),
+    }
+
+
+def box_iou(boxes_a, boxes_b):
+    """IoU of every box in boxes_a (N, 4) with every box in boxes_b (M, 4)."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def match_tracks(rows_a, rows_b, colors_a, colors_b, min_iou=0.3, max_color_distance=60.0):
+    """Match track ids of two segments from their rows in the shared frames.
+
+    Pairs are scored by mean IoU over the frames where both tracks exist,
+    minus a penalty for jersey color distance, and assigned one to one.
+    Returns {track_id_b: track_id_a}.
+    """
+    ids_a = np.unique(rows_a["track_id"])
+    ids_b = np.unique(rows_b["track_id"])
+    if len(ids_a) == 0 or len(ids_b) == 0:
+        return {}
+
+    iou_sum = np.zeros((len(ids_a), len(ids_b)))
+    both_count = np.zeros((len(ids_a), len(ids_b)))
+    for frame_num in np.intersect1d(rows_a["frame"], rows_b["frame"]):
+        frame_a = rows_a[rows_a["frame"] == frame_num]
+        frame_b = rows_b[rows_b["frame"] == frame_num]
+        index_a = np.searchsorted(ids_a, frame_a["track_id"])
+        index_b = np.searchsorted(ids_b, frame_b["track_id"])
+        iou_sum[np.ix_(index_a, index_b)] += box_iou(frame_a["bbox"], frame_b["bbox"])
+        both_count[np.ix_(index_a, index_b)] += 1
+    mean_iou = iou_sum / np.maximum(both_count, 1)
+
+    # Jersey color distance, 0 when either color is unknown
+    color_distance = np.zeros_like(mean_iou)
+    for i, track_id_a in enumerate(ids_a):
+        for j, track_id_b in enumerate(ids_b):
+            if track_id_a in colors_a and track_id_b in colors_b:
+                color_distance[i, j] = np.linalg.norm(colors_a[track_id_a] - colors_b[track_id_b])
+
+    from scipy.optimize import linear_sum_assignment
+
+    cost = (1 - mean_iou) + color_distance / max_color_distance
+    rows, cols = linear_sum_assignment(cost)
+
+    matches = {}
+    for i, j in zip(rows, cols):
+        if mean_iou[i, j] >= min_iou and color_distance[i, j] <= max_color_distance:
+            matches[int(ids_b[j])] = int(ids_a[i])
+    return matches
+
+
+def stitch_segments(results, start_frame, skip_frames):
+    """Merge segment results into one TrackStore with track ids that carry across segments.
+
+    Each overlap is split in half between the two segments. Returns
+    (tracks, frame_infos, track_colors) with colors keyed by the new ids.
+    """
+    from trackers import TrackStore
+    from trackers.TrackStore import CLASS_IDS, TRACK_DTYPE
+
+    merged, frame_infos, track_colors = [], {}, {}
+    next_id = 1
+    previous = None
+
+    for result in results:
+        if result is None:
+            continue
+        data = result["data"].copy()
+        colors = result["track_colors"]
+
+        # Local frame numbers to positions on the skip grid of the whole range
+        source_index = np.array([frame_info.index for frame_info in result["frame_infos"]])
+        global_frames = (source_index - start_frame) // skip_frames
+        data["frame"] = global_frames[data["frame"]]
+
+        id_map = {}
+        if previous is not None:
+            prev_data, prev_frames, prev_id_map, prev_colors = previous
+            shared = np.intersect1d(prev_frames, global_frames)
+            first_owned = shared[len(shared) // 2] if len(shared) else global_frames[0]
+
+            if len(shared):
+                in_prev = np.isin(prev_data["frame"], shared) & (prev_data["cls"] != CLASS_IDS["ball"])
+                in_this = np.isin(data["frame"], shared) & (data["cls"] != CLASS_IDS["ball"])
+                matches = match_tracks(prev_data[in_prev], data[in_this], prev_colors, colors)
+                id_map = {track_id: prev_id_map[prev_id] for track_id, prev_id in matches.items()}
+
+            merged[-1] = merged[-1][merged[-1]["frame"] < first_owned]
+            data = data[data["frame"] >= first_owned]
+
+        # Tracks that started in this segment get fresh ids
+        is_tracked = data["cls"] != CLASS_IDS["ball"]
+        for track_id in np.unique(data["track_id"][is_tracked]):
+            if int(track_id) not in id_map:
+                id_map[int(track_id)] = next_id
+                next_id += 1
+
+        remapped = data.copy()
+        if is_tracked.any():
+            keys = np.array(sorted(id_map))
+            values = np.array([id_map[key] for key in keys])
+            remapped["track_id"][is_tracked] = values[np.searchsorted(keys, data["track_id"][is_tracked])]
+        merged.append(remapped)
+
+        for track_id, color in colors.items():
+            if track_id in id_map:
+                track_colors.setdefault(id_map[track_id], []).append(color)
+        for frame_num, frame_info in zip(global_frames, result["frame_infos"]):
+            frame_infos.setdefault(int(frame_num), frame_info)
+        previous = (data, global_frames, id_map, colors)
+
+    num_frames = max(frame_infos) + 1 if frame_infos else 0
+    data = np.concatenate(merged) if merged else np.zeros(0, dtype=TRACK_DTYPE)
+    tracks = TrackStore.from_data(data, num_frames)
+    track_colors = {track_id: np.mean(colors, axis=0) for track_id, colors in track_colors.items()}
+    return tracks, [frame_infos[frame_num] for frame_num in sorted(frame_infos)], track_colors
+
+
+def process_video_sharded(
+    video_file,
+    tracker,
+    team_assigner,
+    player_ball_assigner,
+    num_workers=None,
+    skip_frames=1,
+    resize_width=None,
+    max_frames=None,
+    start_time=None,
+    end_time=None,
+    overlap_seconds=2.0,
+    metrics=None,
+):
+    """process_video for long videos, with detection and tracking spread over processes.
+
+    The range is split into one overlapping segment per worker. Every worker
+    process builds its own copy of tracker (from tracker.model_path and
+    tracker.options) and returns the segment's tracks and a jersey color per
+    track. Track ids are stitched in the overlaps, teams are fitted on the
+    stitched tracks and the frames are annotated here. Returns
+    (output_frames, tracks) like process_video. With metrics, the workers'
+    decoding, inference and tracking is recorded as one "segments" stage.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    if metrics is None:
+        metrics = NullMetrics()
+
+    with open_video_source(video_file) as video_path:
+        video_info = get_video_info(video_path)
+        fps = video_info["fps"]
+
+        start_frame = int(round(start_time * fps)) if start_time else 0
+        end_frame = video_info["frame_count"]
+        if end_time is not None:
+            end_frame = min(end_frame, int(end_time * fps) + 1)
+        if max_frames:
+            end_frame = min(end_frame, start_frame + max_frames * skip_frames)
+        if end_frame <= start_frame:
+            raise ValueError("No frames could be read from the video file")
+
+        segments = plan_segments(start_frame, end_frame, skip_frames, num_workers, int(round(overlap_seconds * fps)))
+        num_processes = min(num_workers, len(segments))
+
+        # Split the cores between workers so they don't oversubscribe each other
+        options = dict(tracker.options)
+        options.setdefault("threads", max(1, (os.cpu_count() or 1) // num_processes))
+
+        print(f"Processing {len(segments)} segments on {num_processes} processes...")
+        with ProcessPoolExecutor(
+            max_workers=num_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(tracker.model_path, options),
+        ) as executor, metrics.stage("segments") as call:
+            jobs = [(video_path, start, stop, skip_frames, resize_width, fps) for start, stop in segments]
+            results = list(executor.map(_track_segment, jobs))
+
+            tracks, frame_infos, track_colors = stitch_segments(results, start_frame, skip_frames)
+            call["frames"] = len(frame_infos)
+        if not frame_infos:
+            raise ValueError("No frames could be read from the video file")
+        tracks.set_frame_info(frame_infos, fps / skip_frames)
+
+        # Teams from one color per stitched player track
+        with metrics.stage("team_assignment", tracks.num_frames):
+            team_assigner.reset()
+            player_ids = set(tracks.track_ids("players").tolist())
+            player_teams = team_assigner.assign_track_colors(
+                {track_id: color for track_id, color in track_colors.items() if track_id in player_ids}
+            )
+            tracks.set_teams(player_teams)
+            tracks.team_colors = dict(team_assigner.team_colors)
+
+        # Interpolate missing ball positions
+        with metrics.stage("interpolation", tracks.num_frames):
+            tracker.interpolate_ball_tracks(tracks)
+        with metrics.stage("ball_assignment", tracks.num_frames):
+            team_ball_control = get_team_ball_control(tracks, player_ball_assigner)
+
+        # Drawing needs the frames, so the range is decoded once more here
+        with metrics.stage("decode") as call:
+            video_frames = read_video(
+                video_path,
+                max_frames=tracks.num_frames,
+                skip_frames=skip_frames,
+                resize_width=resize_width,
+                start_time=start_frame / fps,
+            )
+            call["frames"] = len(video_frames)
+
+        print("Drawing annotations...")
+        with metrics.stage("drawing", len(video_frames)):
+            output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
+
+        return output_video_frames, tracks
\ No newline at end of file
@@ -2,69 +2,229 @@ import cv2
 import tempfile
 import numpy as np
 import os
+import shutil
+from collections import namedtuple
+from contextlib import contextmanager
+from pipeline import StagedPipeline, NullMetrics
+from .video_encoding import FFmpegVideoWriter, encode_video_chunks, has_ffmpeg
 
 
-def read_video(video_path, max_frames=None, skip_frames=1, resize_width=None):
-    """Read video frames with optional skipping and resizing for efficiency."""
+# Source position of a decoded frame: index in the source video, presentation
+# timestamp in seconds and the source frame rate
+FrameInfo = namedtuple("FrameInfo", ["index", "timestamp", "fps"])
+
+DEFAULT_FPS = 30
+
+# Metrics stage fed by each StagedPipeline stage of process_video_concurrent
+PIPELINE_STAGE_METRICS = {"detect": "inference", "track": "tracking", "interpolate": "interpolation",
+                          "annotate": "drawing", "encode": "encoding"}
+
+
+def get_video_info(video_path):
+    """Frame rate, frame count, size and duration of a video file."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"❌ Could not open video file: {video_path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps != fps:
+            fps = DEFAULT_FPS
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "fps": fps,
+            "frame_count": frame_count,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "duration": frame_count / fps,
+        }
+    finally:
+        cap.release()
+
+
+def get_output_fps(video_path, skip_frames=1):
+    """Frame rate that keeps real-time duration when only every nth frame is kept."""
+    return get_video_info(video_path)["fps"] / skip_frames
+
+
+def estimate_frame_count(video_path, max_frames=None, skip_frames=1, start_time=None, end_time=None):
+    """Number of frames iter_video will yield with these options, from the container header."""
+    video_info = get_video_info(video_path)
+    fps = video_info["fps"]
+
+    start_frame = int(round(start_time * fps)) if start_time else 0
+    end_frame = video_info["frame_count"]
+    if end_time is not None:
+        end_frame = min(end_frame, int(end_time * fps) + 1)
+
+    frame_count = max(-(-(end_frame - start_frame) // skip_frames), 0)
+    if max_frames:
+        frame_count = min(frame_count, max_frames)
+    return frame_count
+
+
+def report_progress(items, stage, progress, total=None):
+    """Pass items through, calling progress(stage, done, total) for each one.
+
+    An exception raised by progress stops the iteration, which is how
+    callers cancel a running pipeline.
+    """
+    for done, item in enumerate(items, 1):
+        progress(stage, done, total)
+        yield item
+
+
+def iter_video(video_path, max_frames=None, skip_frames=1, resize_width=None,
+               start_time=None, end_time=None, with_info=False):
+    """Yield video frames one at a time with optional skipping and resizing.
+
+    start_time/end_time (seconds) restrict decoding to part of the video.
+    With with_info=True, (frame, FrameInfo) pairs are yielded instead.
+    """
     cap = cv2.VideoCapture(video_path)
-    frames = []
     frame_count = 0
+    kept_count = 0
 
     if not cap.isOpened():
         raise IOError(f"❌ Could not open video file: {video_path}")
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps != fps:
+        fps = DEFAULT_FPS
 
-        # Only keep every nth frame
-        if frame_count % skip_frames == 0:
-            if resize_width is not None:
-                h, w = frame.shape[:2]
-                aspect_ratio = h / w
-                target_height = int(resize_width * aspect_ratio)
-                frame = cv2.resize(frame, (resize_width, target_height))
-            frames.append(frame)
+    # Seek to the first requested frame
+    start_index = 0
+    if start_time:
+        start_index = int(round(start_time * fps))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_index)
 
-        frame_count += 1
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            source_index = start_index + frame_count
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if timestamp <= 0 and source_index > 0:
+                timestamp = source_index / fps
+
+            if end_time is not None and timestamp > end_time:
+                break
+
+            # Only keep every nth frame
+            if frame_count % skip_frames == 0:
+                if resize_width is not None:
+                    h, w = frame.shape[:2]
+                    aspect_ratio = h / w
+                    target_height = int(resize_width * aspect_ratio)
+                    frame = cv2.resize(frame, (resize_width, target_height))
+                if with_info:
+                    yield frame, FrameInfo(source_index, timestamp, fps)
+                else:
+                    yield frame
+                kept_count += 1
 
-        # Stop if we reached max_frames
-        if max_frames and len(frames) >= max_frames:
-            break
+            frame_count += 1
 
-    cap.release()
-    return frames
+            # Stop if we reached max_frames
+            if max_frames and kept_count >= max_frames:
+                break
+    finally:
+        cap.release()
 
 
-def frames_to_video_bytes(frames, fps=30):
-    """Convert a list of frames to MP4 video bytes using a temporary file."""
-    if not frames:
-        return None
+def read_video(video_path, max_frames=None, skip_frames=1, resize_width=None,
+               start_time=None, end_time=None, return_info=False):
+    """Read video frames with optional skipping and resizing for efficiency.
 
-    height, width = frames[0].shape[:2]
+    With return_info=True, returns (frames, frame_infos).
+    """
+    items = iter_video(video_path, max_frames, skip_frames, resize_width,
+                       start_time=start_time, end_time=end_time, with_info=return_info)
+    if not return_info:
+        return list(items)
 
-    # Create temporary file
-    tmp_file_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
-            tmp_file_path = tmp_file.name
+    frames, frame_infos = [], []
+    for frame, frame_info in items:
+        frames.append(frame)
+        frame_infos.append(frame_info)
+    return frames, frame_infos
+
+
+def tune_batch_size(video_file, tracker, num_frames=8, skip_frames=1, resize_width=None, start_time=None):
+    """Keep the tracker's fastest batch size, timed on the first num_frames frames of the video.
 
-        # Try H.264, fallback to mp4v
-        fourcc = cv2.VideoWriter_fourcc(*"avc1")
-        out = cv2.VideoWriter(tmp_file_path, fourcc, fps, (width, height))
+    Frames are read the way the analysis will read them. Returns the batch size.
+    """
+    with open_video_source(video_file) as video_path:
+        frames = read_video(video_path, num_frames, skip_frames, resize_width, start_time=start_time)
+    return tracker.tune_batch_size(frames)
 
-        if not out.isOpened():
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            out = cv2.VideoWriter(tmp_file_path, fourcc, fps, (width, height))
 
-        # Write frames
+def open_video_writer(output_path, fps, width, height):
+    """Open a cv2.VideoWriter, trying H.264 first and falling back to mp4v."""
+    fourcc = cv2.VideoWriter_fourcc(*"avc1")
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+    if not out.isOpened():
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+    return out
+
+
+def write_video(frames, output, fps=30, **encoder_options):
+    """Encode frames from any iterable to output as they arrive.
+
+    output is a file path or a writable file-like object (pipe, socket,
+    BytesIO). Encoder options (codec, crf, preset) or a file-like output
+    need ffmpeg; a plain path without options uses cv2.VideoWriter.
+    Returns the number of frames written.
+    """
+    use_ffmpeg = bool(encoder_options) or not isinstance(output, (str, os.PathLike))
+
+    out = None
+    frame_count = 0
+    try:
         for frame in frames:
+            if out is None:
+                height, width = frame.shape[:2]
+                if use_ffmpeg:
+                    out = FFmpegVideoWriter(output, fps, width, height, **encoder_options)
+                else:
+                    out = open_video_writer(os.fspath(output), fps, width, height)
+
             if frame.dtype != "uint8":
                 frame = frame.astype("uint8")
             out.write(frame)
+            frame_count += 1
+    finally:
+        if out is not None:
+            out.release()
+
+    return frame_count
+
+
+def frames_to_video_bytes(frames, fps=30, **encoder_options):
+    """Convert a list of frames to MP4 video bytes.
+
+    With ffmpeg available the stream is encoded in memory; otherwise it goes
+    through a temporary file with cv2.VideoWriter.
+    """
+    if not frames:
+        return None
 
-        out.release()
+    if has_ffmpeg():
+        return b"".join(encode_video_chunks(frames, fps=fps, **encoder_options)) or None
+
+    # Create temporary file
+    tmp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
+            tmp_file_path = tmp_file.name
+
+        write_video(frames, tmp_file_path, fps=fps)
 
         if not os.path.exists(tmp_file_path) or os.path.getsize(tmp_file_path) == 0:
             return None
@@ -79,6 +239,39 @@ def frames_to_video_bytes(frames, fps=30):
             os.remove(tmp_file_path)
 
 
+@contextmanager
+def open_video_source(video_file):
+    """Yield a path cv2.VideoCapture can open, copying the upload only if needed.
+
+    Paths and real files on disk are used in place. In-memory uploads
+    (BytesIO, Streamlit uploads, mmap, bytes) are written to a temporary
+    file straight from their buffer, without an intermediate bytes copy.
+    """
+    if isinstance(video_file, (str, os.PathLike)):
+        yield os.fspath(video_file)
+        return
+
+    name = getattr(video_file, "name", None)
+    if isinstance(name, str) and os.path.isfile(name) and hasattr(video_file, "fileno"):
+        yield name
+        return
+
+    tmp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
+            tmp_file_path = tmp_file.name
+            if hasattr(video_file, "getbuffer"):
+                tmp_file.write(video_file.getbuffer())
+            elif isinstance(video_file, (bytes, bytearray, memoryview)) or hasattr(video_file, "madvise"):
+                tmp_file.write(memoryview(video_file))
+            else:
+                shutil.copyfileobj(video_file, tmp_file, 1024 * 1024)
+        yield tmp_file_path
+    finally:
+        if tmp_file_path and os.path.exists(tmp_file_path):
+            os.unlink(tmp_file_path)
+
+
 def process_video(
     video_file,
     tracker,
@@ -88,24 +281,38 @@ def process_video(
     skip_frames=2,
     resize_width=640,
     fast_mode=True,
+    track_cache=None,
+    start_time=None,
+    end_time=None,
+    metrics=None,
+    view_transformer=None,
 ):
-    """Process a video using cached models and optimizations."""
-    import tempfile, os, numpy as np
-
-    tmp_file_path = None
-    try:
-        # Save uploaded file to temp
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
-            tmp_file.write(video_file.read())
-            tmp_file_path = tmp_file.name
-
+    """Process a video using cached models and optimizations.
+
+    With a track_cache, tracks of a video already processed with the same
+    model and settings are loaded from disk instead of running inference.
+    start_time/end_time (seconds) limit processing to part of the video.
+    The returned tracks carry each frame's source index and timestamp, and
+    tracks.fps is the frame rate to encode the output at. A PipelineMetrics
+    passed as metrics records the time spent in every stage. With a
+    ViewTransformer, ball possession is decided by distances on the pitch.
+    """
+    if metrics is None:
+        metrics = NullMetrics()
+
+    with open_video_source(video_file) as video_path:
         # Read frames
-        video_frames = read_video(
-            tmp_file_path,
-            max_frames=max_frames if fast_mode else None,
-            skip_frames=skip_frames if fast_mode else 1,
-            resize_width=resize_width if fast_mode else None,
-        )
+        with metrics.stage("decode") as call:
+            video_frames, frame_infos = read_video(
+                video_path,
+                max_frames=max_frames if fast_mode else None,
+                skip_frames=skip_frames if fast_mode else 1,
+                resize_width=resize_width if fast_mode else None,
+                start_time=start_time,
+                end_time=end_time,
+                return_info=True,
+            )
+            call["frames"] = len(video_frames)
 
         if not video_frames:
             raise ValueError("No frames could be read from the video file")
@@ -113,79 +320,320 @@ def process_video(
         print(f"Processing {len(video_frames)} frames...")
 
         # Get object tracks
-        tracks = tracker.get_object_tracks(video_frames)
+        tracks = None
+        if track_cache is not None:
+            settings = dict(
+                tracker.detector.get_settings(),
+                max_frames=max_frames if fast_mode else None,
+                skip_frames=skip_frames if fast_mode else 1,
+                resize_width=resize_width if fast_mode else None,
+                start_time=start_time,
+                end_time=end_time,
+            )
+            cache_key = track_cache.make_key(video_path, tracker.detector.model_path, settings)
+            tracks = track_cache.get(cache_key)
+
+        if tracks is None:
+            with metrics.stage("inference", len(video_frames)):
+                detections = tracker.detect_frames(video_frames)
+            with metrics.stage("tracking", len(video_frames)):
+                tracks = tracker.tracker.get_object_tracks(video_frames, detections)
+            if track_cache is not None:
+                track_cache.put(cache_key, tracks)
+        else:
+            print("Loaded tracks from cache")
 
-        # Interpolate missing ball positions
-        ball_tracks = tracker.interpolate_ball_positions(tracks["ball"])
-        tracks["ball"] = ball_tracks
+        tracks.set_frame_info(frame_infos, frame_infos[0].fps / (skip_frames if fast_mode else 1))
 
-        # Reset team assigner state
-        team_assigner.team_colors = {}
-        team_assigner.player_team_dict = {}
+        # Interpolate missing ball positions
+        with metrics.stage("interpolation", len(video_frames)):
+            tracker.interpolate_ball_tracks(tracks)
 
+        # Camera to pitch homography of every frame
+        if view_transformer is not None:
+            with metrics.stage("view_transform", len(video_frames)):
+                view_transformer.reset()
+                view_transformer.process_frames(video_frames)
 
+        # Reset team assigner state
+        team_assigner.reset()
 
-        if "players" in tracks and tracks["players"]:
-            first_players = tracks["players"][0]
 
-            # Assign team colors if players exist
-            if first_players:
-                team_assigner.assign_team_color(video_frames[0], first_players)
 
+        if tracks.class_mask("players").any():
+            with metrics.stage("team_assignment", len(video_frames)):
+                # Team colors are fitted on the first frame with enough players and refined as frames go by
                 frame_step = 3 if fast_mode else 1
 
-                for frame_num in range(0, len(tracks["players"]), frame_step):
-                    player_track = tracks["players"][frame_num]
-                    for player_id, track in player_track.items():
-                        team = team_assigner.get_player_team(
-                            video_frames[frame_num], track["bbox"], player_id
-                        )
-                        tracks["players"][frame_num][player_id]["team"] = team
-                        tracks["players"][frame_num][player_id]["team_color"] = (
-                            team_assigner.team_colors[team]
-                        )
-
-                # Fill skipped frames in fast mode
+                for frame_num in range(0, tracks.num_frames, frame_step):
+                    rows = tracks.frame_indices(frame_num, "players")
+                    player_track = {
+                        int(track_id): {"bbox": bbox.tolist()}
+                        for track_id, bbox in zip(tracks.data["track_id"][rows], tracks.data["bbox"][rows])
+                    }
+                    player_teams = team_assigner.get_player_teams(video_frames[frame_num], player_track)
+                    tracks.set_teams(player_teams, rows)
+
+                # Fill skipped frames in fast mode from the last assigned frame, teams can change
                 if fast_mode and frame_step > 1:
-                    for frame_num, player_track in enumerate(tracks["players"]):
-                        for player_id, track in player_track.items():
-                            if (
-                                "team" not in track
-                                and player_id in team_assigner.player_team_dict
-                            ):
-                                team = team_assigner.player_team_dict[player_id]
-                                tracks["players"][frame_num][player_id]["team"] = team
-                                tracks["players"][frame_num][player_id]["team_color"] = (
-                                    team_assigner.team_colors[team]
-                                )
-
-
-            team_ball_control = []
-            # Ball control assignment
-            for frame_num, player_track in enumerate(tracks["players"]):
-                ball_bbox = tracks["ball"][frame_num][1]["bbox"]
-                assigned_player = player_ball_assigner.assign_ball_to_player(
-                    player_track, ball_bbox
-                )
+                    tracks.carry_teams(frame_step, team_assigner.player_team_dict)
 
-                if assigned_player != -1:
-                    tracks['players'][frame_num][assigned_player]['has_ball'] = True
-                    player_team = tracks['players'][frame_num][assigned_player].get('team', 1)
-                    team_ball_control.append(player_team)
-                else:
-                    team_ball_control.append(team_ball_control[-1] if team_ball_control else 1)
+                for team in np.unique(tracks.data["team"]).tolist():
+                    if team in team_assigner.team_colors:
+                        tracks.team_colors[team] = team_assigner.team_colors[team]
+
+            # Ball control assignment
+            with metrics.stage("ball_assignment", len(video_frames)):
+                team_ball_control = get_team_ball_control(tracks, player_ball_assigner, view_transformer)
 
         else:
             # No players detected → default control to team 1
-            team_ball_control = [1] * len(video_frames)
-
-        team_ball_control = np.array(team_ball_control)
+            team_ball_control = np.array([1] * len(video_frames))
 
         print("Drawing annotations...")
-        output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
+        with metrics.stage("drawing", len(video_frames)):
+            output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
 
         return output_video_frames, tracks
 
-    finally:
-        if tmp_file_path and os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
+
+def get_team_ball_control(tracks, player_ball_assigner, view_transformer=None):
+    """Mark the player with the ball in every frame of a TrackStore and return the team in control per frame.
+
+    The last team in control keeps it over frames where nobody has the ball.
+    """
+    from trackers.TrackStore import NO_TEAM
+
+    holder_rows = player_ball_assigner.assign_tracks(tracks, view_transformer)
+    held = holder_rows != -1
+    if not held.any():
+        return np.ones(len(holder_rows), dtype=np.int64)
+
+    teams = np.where(held, tracks.data["team"][np.maximum(holder_rows, 0)], NO_TEAM).astype(np.int64)
+    teams[held & (teams == NO_TEAM)] = 1
+
+    # Carry the last holder's team forward
+    last_held = np.maximum.accumulate(np.where(held, np.arange(len(teams)), -1))
+    return np.where(last_held >= 0, teams[np.maximum(last_held, 0)], 1)
+
+
+def process_video_stream(
+    video_file,
+    tracker,
+    team_assigner,
+    player_ball_assigner,
+    output,
+    max_frames=None,
+    skip_frames=1,
+    resize_width=None,
+    batch_size=None,
+    max_ball_gap=None,
+    fps=None,
+    start_time=None,
+    end_time=None,
+    encoder_options=None,
+    tracks=None,
+    progress=None,
+    metrics=None,
+    view_transformer=None,
+):
+    """Process a video frame by frame and encode the result to output.
+
+    Every stage consumes and yields frames incrementally, so peak memory is
+    bounded by batch_size (detector) and max_ball_gap (ball interpolation,
+    None uses the tracker's ball_max_gap) instead of the video length.
+    batch_size=None uses the detector's own setting. output and encoder_options are passed to write_video, so the
+    result can go to a path, a pipe or an in-memory buffer as it is
+    encoded. fps=None encodes at the source rate divided by skip_frames so
+    the output keeps real-time duration; start_time/end_time (seconds)
+    process only part of the video. A TrackStore passed as tracks receives
+    every frame's tracks, teams and possession as they are drawn.
+    progress(stage, done, total) is called for every frame leaving the
+    decode, track and annotate stages; raising from it cancels the run.
+    A PipelineMetrics passed as metrics records the time spent in every
+    stage. With a ViewTransformer, ball possession is decided by distances
+    on the pitch. Returns the number of frames written.
+    """
+    if metrics is None:
+        metrics = NullMetrics()
+
+    with open_video_source(video_file) as video_path:
+        team_assigner.reset()
+        if fps is None:
+            fps = get_output_fps(video_path, skip_frames)
+        watch = get_progress_watcher(video_path, progress, max_frames, skip_frames, start_time, end_time)
+
+        frames = watch("decode", metrics.iter_stage("decode", iter_video(
+            video_path,
+            max_frames=max_frames,
+            skip_frames=skip_frames,
+            resize_width=resize_width,
+            start_time=start_time,
+            end_time=end_time,
+            with_info=True,
+        )))
+        detections = metrics.iter_stage("inference", tracker.detector.detect_frames_stream(frames, batch_size, with_info=True))
+        frame_tracks = watch("track", metrics.iter_stage("tracking", tracker.track_detections(detections)))
+        frame_tracks = metrics.iter_stage("interpolation", tracker.interpolate_ball_stream(frame_tracks, max_buffer=max_ball_gap))
+        output_frames = watch("annotate", annotate_stream(
+            frame_tracks, tracker, team_assigner, player_ball_assigner, tracks, fps, metrics, view_transformer
+        ))
+
+        with metrics.stage("encoding") as call:
+            frame_count = write_video(output_frames, output, fps=fps, **(encoder_options or {}))
+            call["frames"] = frame_count
+        if frame_count == 0:
+            raise ValueError("No frames could be read from the video file")
+
+        print(f"Processed {frame_count} frames")
+        return frame_count
+
+
+def process_video_concurrent(
+    video_file,
+    tracker,
+    team_assigner,
+    player_ball_assigner,
+    output,
+    max_frames=None,
+    skip_frames=1,
+    resize_width=None,
+    batch_size=None,
+    max_ball_gap=None,
+    fps=None,
+    start_time=None,
+    end_time=None,
+    encoder_options=None,
+    queue_size=8,
+    tracks=None,
+    progress=None,
+    metrics=None,
+    view_transformer=None,
+):
+    """Streaming pipeline with every stage running in its own thread.
+
+    Decoding, inference, tracking, ball interpolation, drawing and encoding
+    overlap instead of waiting on each other; bounded queues between stages
+    apply backpressure. Takes the same options as process_video_stream;
+    progress is called from the stage threads. Returns (frame_count,
+    pipeline) where pipeline.report() gives per-stage throughput.
+    """
+    if metrics is None:
+        metrics = NullMetrics()
+
+    with open_video_source(video_file) as video_path:
+        team_assigner.reset()
+        if fps is None:
+            fps = get_output_fps(video_path, skip_frames)
+        watch = get_progress_watcher(video_path, progress, max_frames, skip_frames, start_time, end_time)
+
+        def encode(frames):
+            with metrics.stage("encoding") as call:
+                call["frames"] = write_video(metrics.idle(frames), output, fps=fps, **(encoder_options or {}))
+            return call["frames"]
+
+        # idle() keeps the time a stage waits on its input queue out of its own time
+        pipeline = StagedPipeline(queue_size=queue_size)
+        pipeline.add_source("decode", watch("decode", metrics.iter_stage("decode", iter_video(
+            video_path,
+            max_frames=max_frames,
+            skip_frames=skip_frames,
+            resize_width=resize_width,
+            start_time=start_time,
+            end_time=end_time,
+            with_info=True,
+        ))))
+        pipeline.add_stage("detect", lambda frames: watch("detect", metrics.iter_stage(
+            "inference", tracker.detector.detect_frames_stream(metrics.idle(frames), batch_size, with_info=True)
+        )))
+        pipeline.add_stage("track", lambda items: watch("track", metrics.iter_stage(
+            "tracking", tracker.track_detections(metrics.idle(items))
+        )))
+        pipeline.add_stage("interpolate", lambda items: metrics.iter_stage(
+            "interpolation", tracker.interpolate_ball_stream(metrics.idle(items), max_buffer=max_ball_gap)
+        ))
+        pipeline.add_stage("annotate", lambda items: watch("annotate", annotate_stream(
+            metrics.idle(items), tracker, team_assigner, player_ball_assigner, tracks, fps, metrics, view_transformer
+        )))
+        pipeline.add_sink("encode", encode)
+
+        frame_count = pipeline.run()
+        metrics.add_pipeline_stats(pipeline.stats, PIPELINE_STAGE_METRICS)
+        if frame_count == 0:
+            raise ValueError("No frames could be read from the video file")
+
+        print(pipeline.format_report())
+        return frame_count, pipeline
+
+
+def get_progress_watcher(video_path, progress, max_frames=None, skip_frames=1, start_time=None, end_time=None):
+    """watch(stage, items) wrapping items with report_progress, or a pass-through without progress."""
+    if progress is None:
+        return lambda stage, items: items
+
+    total = estimate_frame_count(video_path, max_frames, skip_frames, start_time, end_time)
+    return lambda stage, items: report_progress(items, stage, progress, total)
+
+
+def annotate_stream(frame_tracks, tracker, team_assigner, player_ball_assigner, track_store=None, fps=None, metrics=None,
+                    view_transformer=None):
+    """Assign teams and ball possession and draw annotations one frame at a time.
+
+    With a track_store, every annotated frame's tracks are also appended to it.
+    metrics times team assignment, ball assignment and drawing separately.
+    A view_transformer is updated with every frame and measures ball
+    possession on the pitch.
+    """
+    if metrics is None:
+        metrics = NullMetrics()
+    if view_transformer is not None:
+        view_transformer.reset()
+
+    team_1_num_frames = 0
+    team_2_num_frames = 0
+    controlling_team = 1
+    frame_infos = []
+    player_ball_assigner.reset()
+
+    for frame_num, (frame, tracks) in enumerate(frame_tracks):
+        player_track = tracks["players"]
+        ball_dict = tracks["ball"]
+
+        with metrics.stage("team_assignment"):
+            team_assigner.assign_frame(frame, player_track)
+
+        if view_transformer is not None:
+            with metrics.stage("view_transform"):
+                view_transformer.update(frame)
+
+        # Ball control assignment, smoothed so possession doesn't flicker
+        with metrics.stage("ball_assignment"):
+            assigned_player = -1
+            if 1 in ball_dict:
+                assigned_player = player_ball_assigner.assign_ball_to_player(
+                    player_track, ball_dict[1]["bbox"], view_transformer
+                )
+            assigned_player = player_ball_assigner.update_possession(assigned_player)
+
+        if assigned_player != -1:
+            player_track[assigned_player]["has_ball"] = True
+            controlling_team = player_track[assigned_player].get("team", 1)
+
+        if controlling_team == 1:
+            team_1_num_frames += 1
+        elif controlling_team == 2:
+            team_2_num_frames += 1
+
+        if track_store is not None:
+            track_store.append_tracks(frame_num, tracks)
+            if "frame_info" in tracks:
+                frame_infos.append(tracks["frame_info"])
+
+        with metrics.stage("drawing"):
+            frame = tracker.draw_frame(frame, player_track, ball_dict, tracks["referees"])
+            frame = tracker.draw_ball_control_panel(frame, team_1_num_frames, team_2_num_frames)
+
+        yield frame
+
+    if track_store is not None and frame_infos:
+        track_store.set_frame_info(frame_infos, fps)
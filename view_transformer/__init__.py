@@ -0,0 +1 @@
+from .view_transformer import ViewTransformer
\ No newline at end of file
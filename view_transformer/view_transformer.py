@@ -0,0 +1,210 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+from utils.bbox_utils import get_foot_positions
+
+# Four pitch points of the broadcast camera in the sample footage, as fractions
+# of a 1920x1080 frame, and where they are on the pitch in meters
+DEFAULT_PIXEL_VERTICES = np.array([[110, 1035], [265, 275], [910, 260], [1640, 915]]) / [1920, 1080]
+DEFAULT_PITCH_VERTICES = np.array([[0, 68], [0, 0], [23.32, 0], [23.32, 68]])
+
+
+class ViewTransformer:
+    """Maps image positions to pitch meters with a homography cached per camera shot.
+
+    The homography of a shot comes from four known points (pixel_vertices,
+    as fractions of the frame size, and their pitch_vertices in meters).
+    Within a shot, background corners are followed with sparse optical flow
+    and the homography is only solved again once they moved more than
+    motion_threshold pixels (at analysis_width) since the last solve, so a
+    still camera costs one flow step per frame. A cut (Bhattacharyya
+    distance between the gray histograms of two frames above cut_threshold)
+    starts a new shot; when it looks like one of the
+    last max_shots shots (a return to the main camera), that shot's
+    homography is carried over through the flow between the two.
+    """
+
+    def __init__(self, pixel_vertices=DEFAULT_PIXEL_VERTICES, pitch_vertices=DEFAULT_PITCH_VERTICES,
+                 analysis_width=640, motion_threshold=2.0, cut_threshold=0.3, max_shots=8, max_corners=200,
+                 min_points=20):
+        self.pixel_vertices = np.asarray(pixel_vertices, dtype=np.float64)
+        self.pitch_vertices = np.asarray(pitch_vertices, dtype=np.float64)
+        self.analysis_width = analysis_width
+        self.motion_threshold = motion_threshold
+        self.cut_threshold = cut_threshold
+        self.max_shots = max_shots
+        self.max_corners = max_corners
+        self.min_points = min_points
+        self.lk_params = dict(
+            winSize=(21, 21),
+            maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self.reset()
+
+    def reset(self):
+        """Forget every frame and shot, call between videos."""
+        self.homographies = []
+        self.frame_ids = []
+        self.shots = OrderedDict()
+        self.shot_id = -1
+        self.solves = 0
+        self._gray = None
+        self._hist = None
+
+    @property
+    def homography(self):
+        """Image to pitch homography of the last frame."""
+        return self.homographies[self.frame_ids[-1]]
+
+    def get_calibration(self, frame_shape):
+        h, w = frame_shape[:2]
+        pixel_vertices = (self.pixel_vertices * [w, h]).astype(np.float32)
+        return cv2.getPerspectiveTransform(pixel_vertices, self.pitch_vertices.astype(np.float32))
+
+    def prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.scale = min(self.analysis_width / gray.shape[1], 1.0)
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def get_histogram(self, gray):
+        hist = cv2.calcHist([gray], [0], None, [64], [0, 256])
+        return cv2.normalize(hist, hist).flatten()
+
+    def get_distance(self, hist, other_hist):
+        return cv2.compareHist(hist, other_hist, cv2.HISTCMP_BHATTACHARYYA)
+
+    def find_corners(self, gray):
+        corners = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 10)
+        return np.zeros((0, 1, 2), dtype=np.float32) if corners is None else corners
+
+    def solve(self, points, anchor_points, anchor_homography):
+        """Pitch homography of the current frame from corners matched to the anchor frame, None if it fails."""
+        if len(points) < self.min_points:
+            return None
+        # Corners on moving players are outliers, RANSAC leaves them out
+        to_anchor, inliers = cv2.findHomography(points, anchor_points, cv2.RANSAC, 3.0)
+        if to_anchor is None or inliers.sum() < self.min_points:
+            return None
+        self.solves += 1
+        scale = np.diag([self.scale, self.scale, 1.0])
+        return anchor_homography @ np.linalg.inv(scale) @ to_anchor @ scale
+
+    def track(self, prev_gray, gray, points):
+        """Follow points from prev_gray to gray, returning (moved points, mask of the points kept)."""
+        if len(points) == 0:
+            return points, np.zeros(0, dtype=bool)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **self.lk_params)
+        return moved, status.ravel().astype(bool)
+
+    # Shots
+
+    def start_shot(self, gray, hist, homography):
+        self.shot_id += 1
+        self.shots[self.shot_id] = {"gray": gray, "hist": hist, "homography": homography}
+        while len(self.shots) > self.max_shots:
+            self.shots.popitem(last=False)
+        self.set_anchor(gray, homography)
+
+    def set_anchor(self, gray, homography):
+        # Corners of the anchor frame, whose pitch homography is known
+        self.anchor_homography = homography
+        self.anchor_points = self.find_corners(gray)
+        self.points = self.anchor_points.copy()
+        self.solved_points = self.points.copy()
+        self.add_homography(homography)
+
+    def add_homography(self, homography):
+        self.homographies.append(homography)
+        self.frame_ids.append(len(self.homographies) - 1)
+
+    def find_shot(self, gray, hist):
+        """Homography of the current frame through the most similar earlier shot, None if none is close."""
+        shots = [shot for shot in self.shots.values() if shot["gray"].shape == gray.shape]
+        distances = [self.get_distance(shot["hist"], hist) for shot in shots]
+        for i in np.argsort(distances):
+            if distances[i] > self.cut_threshold:
+                return None
+            shot = shots[i]
+            corners = self.find_corners(shot["gray"])
+            moved, found = self.track(shot["gray"], gray, corners)
+            homography = self.solve(moved[found], corners[found], shot["homography"])
+            if homography is not None:
+                return homography
+        return None
+
+    # Frames
+
+    def update(self, frame):
+        """Add the next frame of the video and return its image to pitch homography."""
+        homography = self.update_shot(frame)
+        # A shot is remembered by its last frame, the camera most likely comes back to it
+        self.shots[self.shot_id].update(gray=self._gray, hist=self._hist, homography=homography)
+        return homography
+
+    def update_shot(self, frame):
+        gray = self.prepare(frame)
+        hist = self.get_histogram(gray)
+        prev_gray, self._gray = self._gray, gray
+        prev_hist, self._hist = self._hist, hist
+
+        if prev_gray is None or prev_gray.shape != gray.shape:
+            self.start_shot(gray, hist, self.get_calibration(frame.shape))
+            return self.homography
+
+        if self.get_distance(prev_hist, hist) > self.cut_threshold:
+            homography = self.find_shot(gray, hist)
+            self.start_shot(gray, hist, self.get_calibration(frame.shape) if homography is None else homography)
+            return self.homography
+
+        moved, found = self.track(prev_gray, gray, self.points)
+        self.points = moved[found]
+        self.anchor_points, self.solved_points = self.anchor_points[found], self.solved_points[found]
+
+        motion = np.linalg.norm(self.points - self.solved_points, axis=-1)
+        if len(motion) and np.median(motion) <= self.motion_threshold:
+            # Camera hasn't moved noticeably, the cached homography still holds
+            self.frame_ids.append(self.frame_ids[-1])
+            return self.homography
+
+        homography = self.solve(self.points, self.anchor_points, self.anchor_homography)
+        if homography is None:
+            # Too few corners left, re-anchor on this frame with the last known homography
+            self.set_anchor(gray, self.homography)
+        else:
+            self.solved_points = self.points.copy()
+            self.add_homography(homography)
+        return self.homography
+
+    def process_frames(self, frames):
+        """Homography id of every frame (indexes self.homographies)."""
+        for frame in frames:
+            self.update(frame)
+        return np.asarray(self.frame_ids)
+
+    # Transforms
+
+    def transform_points(self, points, frames=None):
+        """Pitch positions (N, 2) of image points (N, 2) in one batched transform.
+
+        frames (N,) are indices of processed frames, None uses the last
+        frame's homography for every point.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        homogeneous = np.hstack([points, np.ones((len(points), 1))])
+        if frames is None:
+            mapped = homogeneous @ self.homography.T
+        else:
+            homographies = np.asarray(self.homographies)[np.asarray(self.frame_ids)[np.asarray(frames)]]
+            mapped = np.einsum("nij,nj->ni", homographies, homogeneous)
+        return mapped[:, :2] / mapped[:, 2:]
+
+    def transform_tracks(self, tracks):
+        """Pitch position of every row of a TrackStore: feet of players and referees, center of the ball."""
+        data = tracks.data
+        positions = get_foot_positions(data["bbox"])
+        ball = tracks.class_mask("ball")
+        positions[ball, 1] = (data["bbox"][ball, 1] + data["bbox"][ball, 3]) / 2
+        return self.transform_points(positions, data["frame"])
\ No newline at end of file